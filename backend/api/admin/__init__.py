@@ -4,6 +4,7 @@ from api.models import (
     Factory,
     Image,
     ReportRecord,
+    ExportJob,
 )
 from api.models.factory import RecycledFactory
 from api.models.document import Document, CETNext, CETReportStatus, GovResponseStatus, FollowUp
@@ -12,6 +13,7 @@ from api.models.report_record import RecycledReportRecord
 from .factory import FactoryAdmin, RecycledFactoryAdmin
 from .image import ImageAdmin, RecycledImageAdmin
 from .report_record import ReportRecordAdmin, RecycledReportRecordAdmin
+from .export_job import ExportJobAdmin
 from api.admin.document import (
     DocumentAdmin,
     CETNextAdmin,
@@ -36,3 +38,5 @@ admin.register(CETNext)(CETNextAdmin)
 admin.register(CETReportStatus)(CETReportStatusAdmin)
 admin.register(GovResponseStatus)(GovResponseStatusAdmin)
 admin.register(FollowUp)(FollowUpAdmin)
+
+admin.register(ExportJob)(ExportJobAdmin)
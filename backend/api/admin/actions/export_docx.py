@@ -1,13 +1,23 @@
 import os
+import hashlib
 import logging
+import shutil
+import tempfile
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from urllib.request import urlopen
 import requests
 import datetime
 
-from django.http import HttpResponse
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseRedirect
+from django.urls import reverse
+from django.utils import timezone
+from django_q.tasks import async_task
 
-from api.models import Image
+from api.legislators import get_legislator_name, get_legislator_names
+from api.models import Document as DocumentModel, ExportJob, Image
 from api.utils import set_function_attributes
 
 
@@ -26,7 +36,6 @@ CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 DOC_RESOURCES_PATH = os.path.join(CURRENT_DIR, "..", "..", "..", "doc_resources")
 SEAL_IMAGE_PATH = os.path.join(DOC_RESOURCES_PATH, "seal.png")
 
-FIND_TAIWAN_LEGISLATOR_API = "https://ftl.disfactory.tw"
 DEFAULT_FONT = "標楷體"
 
 UPPER_CASE_NUMBERS = {
@@ -48,20 +57,67 @@ def to_lower_chinese_numbers(number):
     return ''.join(LOWER_CASE_NUMBERS[ch] for ch in str(number))
 
 
-def find_taiwan_legislator_name_by_location(lat, lng):
-    try:
-        resp = requests.get(
-            FIND_TAIWAN_LEGISLATOR_API,
-            params={"lat": lat, "lng": lng},
-        )
-        data = resp.json()
-        return data[0]['name'] if (data and 'name' in data[0]) else "UNKNOWN"
+def _image_cache_path(url):
+    return os.path.join(settings.DOCX_IMAGE_CACHE_ROOT, hashlib.sha256(url.encode("utf8")).hexdigest())
 
+
+def _download_image(url):
+    """Content of the image at `url`, kept on disk since image urls never change."""
+    cache_path = _image_cache_path(url)
+    try:
+        with open(cache_path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    resp = requests.get(url, timeout=settings.DOCX_IMAGE_FETCH_TIMEOUT)
+    resp.raise_for_status()
+    data = resp.content
+
+    os.makedirs(settings.DOCX_IMAGE_CACHE_ROOT, exist_ok=True)
+    # write then rename, so a concurrent export never reads a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=settings.DOCX_IMAGE_CACHE_ROOT)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, cache_path)
+    return data
+
+
+def _prepare_image(data):
+    image_data = PIL.Image.open(BytesIO(data))
+    max_size = settings.DOCX_IMAGE_MAX_SIZE
+    too_large = max_size and max(image_data.size) > max_size
+    if image_data.format != "JPEG" and not too_large:
+        return BytesIO(data)
+
+    # Use PIL to save all jpeg files again to workaround python-docx bug
+    # https://github.com/python-openxml/python-docx/issues/187
+    image_format = image_data.format if image_data.format == "JPEG" else "PNG"
+    if too_large:
+        image_data.thumbnail((max_size, max_size))
+    tmp_image_data = BytesIO()
+    image_data.save(tmp_image_data, format=image_format)
+    return tmp_image_data
+
+
+def _fetch_image(url):
+    try:
+        return _prepare_image(_download_image(url))
     except Exception as e:
-        LOGGER.error(
-            f"Can't get the legislator information from {FIND_TAIWAN_LEGISLATOR_API} - {e}",
-        )
-        return "UNKNOWN"
+        LOGGER.error(f"Can't fetch the image {url} for the document - {e}")
+        return None
+
+
+def fetch_images(urls):
+    """Download and prepare the images of `urls` for the documents, concurrently.
+
+    Returns the image of each url, None for the ones which failed.
+    """
+    urls = list(dict.fromkeys(urls))
+    if not urls:
+        return {}
+    with ThreadPoolExecutor(max_workers=settings.DOCX_IMAGE_FETCH_WORKERS) as executor:
+        return dict(zip(urls, executor.map(_fetch_image, urls)))
 
 
 class Run:
@@ -139,10 +195,13 @@ class ParagraphGenerator:
 
 
 class FactoryReportDocumentWriter:
-    def __init__(self, model, document):
+    def __init__(self, model, document, images=None, legislator_name=None):
         self.document_model = model
         self.factory = model.factory
         self.document = document
+        # prefetched images by url, see `fetch_images`
+        self.images = images
+        self.legislator_name = legislator_name
         self.factory_location = f"{self.factory.townname}{self.factory.sectname} ({self.factory.sectcode}) {self.factory.landcode}"
 
         self._generate_docx()
@@ -163,10 +222,9 @@ class FactoryReportDocumentWriter:
 
     def _generate_docx(self):
         self._init_document()
-        legislator_name = find_taiwan_legislator_name_by_location(
-            lat=self.factory.lat,
-            lng=self.factory.lng,
-        )
+        legislator_name = self.legislator_name
+        if legislator_name is None:
+            legislator_name = get_legislator_name(self.factory.lat, self.factory.lng)
 
         # Cover
         self._original()
@@ -314,21 +372,19 @@ class FactoryReportDocumentWriter:
             .line_spacing(18) \
             .space_after(6)
 
-        images = Image.objects.only("id").filter(factory=self.factory)
-        for index, image in enumerate(images, start=1):
+        image_paths = _get_image_paths([self.factory.id])[self.factory.id]
+        images = self.images
+        if images is None:
+            images = fetch_images(image_paths)
+
+        for index, image_path in enumerate(image_paths, start=1):
             generator.new(self.document, f"附件 {to_lower_chinese_numbers(index)}", 12)
+            image = images.get(image_path)
+            if image is None:
+                continue
             try:
-                data = urlopen(image.image_path).read()
-
-                image_data = PIL.Image.open(BytesIO(data))
-                if image_data.format == "JPEG":
-                    # Use PIL to save all jpeg files again to workaround python-docx bug
-                    # https://github.com/python-openxml/python-docx/issues/187
-                    tmp_image_data = BytesIO()
-                    image_data.save(tmp_image_data, format="jpeg")
-                    self.document.add_picture(tmp_image_data, width=Mm(150))
-                else:
-                    self.document.add_picture(BytesIO(data), width=Mm(150))
+                image.seek(0)
+                self.document.add_picture(image, width=Mm(150))
             except Exception as e:
                 LOGGER.error(e)
 
@@ -343,11 +399,31 @@ def new_document():
     return document
 
 
+def _get_image_paths(factory_ids):
+    # the medium copies are large enough for a page, the originals are larger
+    image_paths = {factory_id: [] for factory_id in factory_ids}
+    for factory_id, image_path, medium_path in Image.objects.filter(
+        factory_id__in=factory_ids
+    ).values_list("factory_id", "image_path", "medium_path"):
+        image_paths[factory_id].append(medium_path or image_path)
+    return image_paths
+
+
 def generate_factories_document(model_list):
+    # fetch the images of every document at once, so the export waits for the
+    # slowest image rather than for all of them one after the other
+    image_paths = _get_image_paths([model.factory_id for model in model_list])
+    images = fetch_images(path for paths in image_paths.values() for path in paths)
+    legislator_names = get_legislator_names(
+        [(model.factory.lat, model.factory.lng) for model in model_list]
+    )
+
     documents = []
-    for model in model_list:
+    for model, legislator_name in zip(model_list, legislator_names):
         document = new_document()
-        FactoryReportDocumentWriter(model, document)
+        FactoryReportDocumentWriter(
+            model, document, images=images, legislator_name=legislator_name
+        )
         documents.append(document)
     return documents
 
@@ -370,10 +446,89 @@ def export_document(document):
     return file
 
 
+EXPORT_JOB_ROOT = "exports"
+
+
+def _export_job_part_path(job_id, index):
+    return os.path.join(settings.MEDIA_ROOT, EXPORT_JOB_ROOT, str(job_id), f"{index}.docx")
+
+
+@contextmanager
+def _fail_export_job_on_error(job_id):
+    try:
+        yield
+    except Exception as e:
+        LOGGER.error(f"Export job {job_id} failed - {e}")
+        ExportJob.objects.filter(pk=job_id).update(
+            status=ExportJob.FAILED, error=str(e), updated_at=timezone.now()
+        )
+        # for django-q to record the task as failed
+        raise
+
+
+def start_export_job(job_id):
+    """Enqueue a task rendering each document of the job, see `render_export_job_document`."""
+    job = ExportJob.objects.get(pk=job_id)
+    job.status = ExportJob.RUNNING
+    job.save(update_fields=["status", "updated_at"])
+    for index in range(job.total):
+        async_task("api.tasks.render_export_document", job_id, index, group=str(job_id))
+
+
+def render_export_job_document(job_id, index):
+    """Render a document of the job to its own docx, the last one to finish composes them."""
+    with _fail_export_job_on_error(job_id):
+        job = ExportJob.objects.get(pk=job_id)
+        # failed, or rendered by a previous delivery of the task
+        if job.status == ExportJob.FAILED or index in job.rendered_indexes:
+            return
+        model = DocumentModel.objects.select_related("factory").get(pk=job.document_ids[index])
+        document = generate_factories_document([model])[0]
+
+        path = _export_job_part_path(job_id, index)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        document.save(path)
+
+        with transaction.atomic():
+            job = ExportJob.objects.select_for_update().get(pk=job_id)
+            if index in job.rendered_indexes:
+                return
+            job.rendered_indexes.append(index)
+            job.save(update_fields=["rendered_indexes", "updated_at"])
+            if job.rendered == job.total:
+                transaction.on_commit(
+                    lambda: async_task("api.tasks.compose_export_job", job_id)
+                )
+
+
+def compose_export_job_docx(job_id):
+    """Merge the rendered documents of the job into its docx, one at a time."""
+    with _fail_export_job_on_error(job_id):
+        job = ExportJob.objects.get(pk=job_id)
+        # done by a previous delivery of the task, the parts are gone
+        if job.status != ExportJob.RUNNING:
+            return
+        composer = Composer(Document(_export_job_part_path(job_id, 0)))
+        for index in range(1, job.total):
+            composer.doc.add_page_break()
+            composer.append(Document(_export_job_part_path(job_id, index)))
+
+        file_path = os.path.join(EXPORT_JOB_ROOT, f"{job_id}.docx")
+        composer.save(os.path.join(settings.MEDIA_ROOT, file_path))
+        shutil.rmtree(os.path.dirname(_export_job_part_path(job_id, 0)), ignore_errors=True)
+
+        job.status = ExportJob.DONE
+        job.file_path = file_path
+        job.save(update_fields=["status", "file_path", "updated_at"])
+
+
 class ExportDocMixin:
 
     @set_function_attributes(short_description="輸出成 docx 檔")
     def export_as_docx(self, request, queryset):
+        if queryset.count() > settings.DOCX_EXPORT_SYNC_MAX_DOCUMENTS:
+            return self._export_as_docx_in_background(request, queryset)
+
         documents = generate_factories_document(list(queryset))
         merged_docment = merge_documents(documents)
         docx_file = export_document(merged_docment)
@@ -388,3 +543,12 @@ class ExportDocMixin:
         response['Content-Disposition'] = 'attachment; filename=api.factory.docx'
         response['Content-Length'] = length
         return response
+
+    def _export_as_docx_in_background(self, request, queryset):
+        job = ExportJob.objects.create(
+            creator=request.user,
+            document_ids=list(queryset.values_list("id", flat=True)),
+        )
+        transaction.on_commit(lambda: async_task("api.tasks.export_docx", job.id))
+        self.message_user(request, f"正在背景產生 {job.total} 份公文的 docx 檔")
+        return HttpResponseRedirect(reverse("admin:api_exportjob_change", args=[job.id]))
@@ -1,9 +1,8 @@
 from api.utils import set_function_attributes
 from django.template.response import TemplateResponse
 from api.models import Image
+from api.legislators import get_legislator_names
 import json
-import requests
-import logging
 
 """
 example
@@ -25,29 +24,16 @@ CET_STAFF_EMAIL = {
     "賴沛蓮": "peii@cet-taiwan.org",
 }
 
-FIND_TAIWAN_LEGISLATOR_API = "https://ftl.disfactory.tw"
-LOGGER = logging.getLogger('django')
-
-def find_taiwan_legislator_name_by_location(lat, lng):
-    try:
-        resp = requests.get(
-            FIND_TAIWAN_LEGISLATOR_API,
-            params={"lat": lat, "lng": lng},
-        )
-        data = resp.json()
-        return data[0]['name'] if (data and 'name' in data[0]) else "UNKNOWN"
-
-    except Exception as e:
-        LOGGER.error(
-            f"Can't get the legislator information from {FIND_TAIWAN_LEGISLATOR_API} - {e}",
-        )
-        return "UNKNOWN"
 
 class ExportDocUsingJSMixin:
     @set_function_attributes(short_description="輸出成 docx 檔(JS)")
     def export_docx_using_js(self, request, queryset):
         data = []
-        for document_model in queryset:
+        document_models = list(queryset.select_related("factory"))
+        legislator_names = get_legislator_names(
+            [(model.factory.lat, model.factory.lng) for model in document_models]
+        )
+        for document_model, legislator_name in zip(document_models, legislator_names):
             sender = document_model.cet_staff
             email = CET_STAFF_EMAIL.get(sender, "cet@cet-taiwan.org")
 
@@ -56,11 +42,10 @@ class ExportDocUsingJSMixin:
             else:
                 townname = "UNKNOWN"
 
-            images = Image.objects.only("id").filter(factory=document_model.factory)
-            image_urls = [image.image_path for image in images]
-            legislator_name = find_taiwan_legislator_name_by_location(
-                lat=document_model.factory.lat,
-                lng=document_model.factory.lng,
+            image_urls = list(
+                Image.objects.filter(factory=document_model.factory).values_list(
+                    "image_path", flat=True
+                )
             )
 
 
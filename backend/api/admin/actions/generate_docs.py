@@ -1,27 +1,23 @@
-import datetime
-from django.db.models import Max
+from django.db import transaction
 
-from api.models import Document, Factory
+from api.models import Document, Factory, allocate_document_codes, refresh_factory_summary
+from api.response_cache import invalidate_responses
+from api.statistics import mark_towns_stale
 from api.utils import set_function_attributes, normalize_townname
 
 
 class GenerateDocsMixin:
     @set_function_attributes(short_description="產生公文")
+    @transaction.atomic
     def generate_docs(self, request, queryset):
         user = request.user
-        taiwan_year = datetime.date.today().year - 1911
-
-        # NOTE: code format YYYXXXX
-        # YYY is taiwan year, XXXX is serial number
-        previous_code = Document.objects.aggregate(Max("code"))["code__max"]
-
-        if not previous_code or previous_code < taiwan_year * (10 ** 4):
-            previous_code = taiwan_year * (10 ** 4)
+        selected_factories = list(queryset)
+        codes = allocate_document_codes(len(selected_factories))
 
         docs = []
         factories = []
 
-        for code, factory in enumerate(queryset, start=previous_code + 1):
+        for code, factory in zip(codes, selected_factories):
             docs.append(
                 Document(
                     factory_id=factory.id,
@@ -36,3 +32,8 @@ class GenerateDocsMixin:
 
         Document.objects.bulk_create(docs)
         Factory.objects.bulk_update(factories, ["cet_review_status"])
+        factory_ids = [factory.id for factory in factories]
+        townnames = [factory.townname for factory in factories]
+        refresh_factory_summary(factory_ids)
+        mark_towns_stale(townnames)
+        invalidate_responses(factory_ids, townnames)
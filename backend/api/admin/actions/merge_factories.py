@@ -1,11 +1,19 @@
 from api.utils import set_function_attributes
-from django.db.models import Max
+from django.db import transaction
 
-from api.models import Factory, Image, ReportRecord, Document, FollowUp
+from api.models import (
+    Image,
+    ReportRecord,
+    Document,
+    FollowUp,
+    allocate_display_numbers,
+    allocate_document_codes,
+)
 
 
 class MergeFactoriesMixin:
     @set_function_attributes(short_description="合併工廠")
+    @transaction.atomic
     def merge_factories(self, request, queryset):
         selected_factories = list(queryset)
         selected_factories.sort(
@@ -29,8 +37,7 @@ class MergeFactoriesMixin:
         # Copy latest factory
         new_factory = selected_factories[-1]
         new_factory.id = None
-        num = Factory.raw_objects.aggregate(Max("display_number"))
-        new_factory.display_number = num["display_number__max"] + 1
+        new_factory.display_number = allocate_display_numbers()[0]
         new_factory.save()
 
         # copy report record
@@ -52,20 +59,15 @@ class MergeFactoriesMixin:
 
         # copy document
 
-        # NOTE: code format YYYXXXX
-        # YYY is taiwan year, XXXX is serial number
-        previous_code = Document.objects.aggregate(Max("code"))["code__max"]
-        for document in documents:
+        for code, document in zip(allocate_document_codes(len(documents)), documents):
             follow_ups = FollowUp.objects.filter(document=document)
 
             document.id = None
             document.factory = new_factory
-            document.code = previous_code + 1
+            document.code = code
             document.save()
 
             for follow_up in follow_ups:
                 follow_up.id = None
                 follow_up.document = document
                 follow_up.save()
-
-            previous_code += 1
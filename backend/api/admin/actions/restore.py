@@ -4,4 +4,6 @@ from api.utils import set_function_attributes
 class RestoreMixin:
     @set_function_attributes(short_description="復原")
     def restore(self, request, queryset):
+        # the summaries, statistics and cached responses follow in
+        # `api.signals.update_factory_summaries_in_bulk`
         queryset.undelete()
@@ -182,12 +182,17 @@ class DocumentAdmin(ImportExportModelAdmin, ExportDocMixin, ExportDocumentCsvMix
         image_html_template = """
             <div class="imgbox">
                 <a href="{image_path}" target='_blank' class="center-fit">
-                    <img src={image_path} class="center-fit" style="width: 100%; max-width: 400px; margin-bottom: 30px;" />
+                    <img src={preview_path} class="center-fit" style="width: 100%; max-width: 400px; margin-bottom: 30px;" />
                 </a>
             </div>
         """
 
-        urls = [image_html_template.format(image_path=img.image_path) for img in images]
+        urls = [
+            image_html_template.format(
+                image_path=img.image_path, preview_path=img.medium_path or img.image_path
+            )
+            for img in images
+        ]
         return format_html("\n".join(urls))
 
     @set_function_attributes(allow_tags=True, short_description="補充敘述")
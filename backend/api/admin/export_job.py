@@ -0,0 +1,76 @@
+import os
+
+from django.conf import settings
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from api.models import ExportJob
+from api.utils import set_function_attributes
+
+
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "created_at",
+        "creator",
+        "job_status",
+        "progress",
+        "download_link",
+    )
+    ordering = ["-created_at"]
+    fields = (
+        "id",
+        "creator",
+        "job_status",
+        "progress",
+        "download_link",
+        "error",
+        "created_at",
+        "updated_at",
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @set_function_attributes(short_description="狀態")
+    def job_status(self, obj):
+        if obj.is_stale:
+            # a task killed by the timeout never marks the job
+            return f"{dict(ExportJob.status_list)[ExportJob.FAILED]} (逾時，請重新輸出)"
+        return obj.get_status_display()
+
+    @set_function_attributes(short_description="進度")
+    def progress(self, obj):
+        return f"{obj.rendered} / {obj.total}"
+
+    @set_function_attributes(short_description="下載")
+    def download_link(self, obj):
+        if obj.status != ExportJob.DONE:
+            return "-"
+        url = reverse("admin:api_exportjob_download", args=[obj.id])
+        return format_html('<a href="{}">下載 docx 檔</a>', url)
+
+    def get_urls(self):
+        return [
+            path(
+                "<uuid:job_id>/download/",
+                self.admin_site.admin_view(self.download),
+                name="api_exportjob_download",
+            ),
+            *super().get_urls(),
+        ]
+
+    def download(self, request, job_id):
+        job = ExportJob.objects.filter(pk=job_id, status=ExportJob.DONE).first()
+        if job is None or not self.has_view_permission(request, job):
+            raise Http404
+        return FileResponse(
+            open(os.path.join(settings.MEDIA_ROOT, job.file_path), "rb"),
+            as_attachment=True,
+            filename="api.factory.docx",
+        )
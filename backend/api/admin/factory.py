@@ -174,7 +174,9 @@ class ImageInlineForFactory(admin.TabularInline):
 
     @set_function_attributes(short_description="Image Preview")
     def image_show(self, obj):
-        return mark_safe(f'<img src="{obj.image_path}" style="max-width:500px; height:auto"/>')
+        return mark_safe(
+            f'<img src="{obj.medium_path or obj.image_path}" style="max-width:500px; height:auto"/>'
+        )
 
 
 class FactoryAdmin(
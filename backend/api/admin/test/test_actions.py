@@ -1,6 +1,9 @@
+from api.admin.document import DocumentAdmin
+from api.admin.factory import FactoryAdmin
 from api.models.factory import Factory
 from api.models.document import Document
 from api.models.image import Image
+import csv
 import datetime
 
 import pytest
@@ -153,3 +156,31 @@ class TestModelAdmin:
             response["Content-Type"]
             == "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
         )
+
+    def test_export_as_csv_streams_in_constant_queries(
+        self, site, factories, django_assert_num_queries
+    ):
+        for code, factory in enumerate(factories, start=1090001):
+            Document.objects.create(factory=factory, code=code)
+        Document.objects.create(factory=None, code=1090003)
+
+        response = DocumentAdmin(Document, site).export_as_csv(
+            request, Document.objects.order_by("code")
+        )
+        with django_assert_num_queries(1):
+            content = b"".join(response.streaming_content).decode("utf8")
+
+        rows = list(csv.reader(content.lstrip("\ufeff").splitlines()))
+        assert rows[0][-3:] == ["factory.townname", "factory.lat", "factory.lng"]
+        assert [row[-3:] for row in rows[1:]] == [
+            ["新北市三峽路中山區", "23.234", "120.1"],
+            ["新北市三峽路中山區", "23.123", "120.2"],
+            ["", "", ""],
+        ]
+
+        response = FactoryAdmin(Factory, site).export_as_csv(
+            request, Factory.objects.filter(pk__in=[factory.pk for factory in factories])
+        )
+        with django_assert_num_queries(1):
+            content = b"".join(response.streaming_content).decode("utf8")
+        assert len(content.splitlines()) == 3
@@ -0,0 +1,145 @@
+import datetime
+from io import BytesIO
+from unittest.mock import patch
+
+import PIL.Image
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from django_q.conf import Conf
+from docx import Document as DocxDocument
+
+from api.admin.actions.export_docx import fetch_images, render_export_job_document
+from api.models import Document, ExportJob, Factory
+
+
+class MockResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+def _png(size):
+    data = BytesIO()
+    PIL.Image.new("RGB", size).save(data, format="PNG")
+    return data.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def image_settings(settings, tmp_path):
+    settings.DOCX_IMAGE_CACHE_ROOT = str(tmp_path)
+    settings.DOCX_IMAGE_MAX_SIZE = 100
+
+
+def test_fetch_images_downscales_and_caches():
+    large, small = "https://i.imgur.com/large.png", "https://i.imgur.com/small.png"
+    contents = {large: _png((400, 200)), small: _png((50, 50))}
+
+    def get(url, timeout):
+        return MockResponse(contents[url])
+
+    with patch("api.admin.actions.export_docx.requests.get", side_effect=get) as mock_get:
+        images = fetch_images([large, small, large])
+    assert mock_get.call_count == 2
+    assert PIL.Image.open(images[large]).size == (100, 50)
+    assert images[small].getvalue() == contents[small]
+
+    with patch("api.admin.actions.export_docx.requests.get") as mock_get:
+        assert PIL.Image.open(fetch_images([large])[large]).size == (100, 50)
+    mock_get.assert_not_called()
+
+
+def test_fetch_images_skips_failures():
+    url = "https://i.imgur.com/broken.png"
+    with patch("api.admin.actions.export_docx.requests.get", return_value=MockResponse(b"oops")):
+        assert fetch_images([url]) == {url: None}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_as_docx_in_background(admin_client, settings, tmp_path, monkeypatch):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.DOCX_EXPORT_SYNC_MAX_DOCUMENTS = 1
+    # run the tasks right away instead of through the cluster
+    monkeypatch.setattr(Conf, "SYNC", True)
+
+    factory = Factory.objects.create(
+        name="test factory", lat=23.234, lng=120.1, townname="臺南市善化區", display_number=666
+    )
+    documents = [Document.objects.create(factory=factory, code=code) for code in [1090001, 1090002]]
+
+    with patch(
+        "api.admin.actions.export_docx.get_legislator_names",
+        side_effect=lambda locations: ["UNKNOWN"] * len(locations),
+    ):
+        response = admin_client.post(
+            "/admin/api/document/",
+            {
+                "action": "export_as_docx",
+                "select_across": 0,
+                "index": 0,
+                "_selected_action": [document.id for document in documents],
+            },
+        )
+
+    job = ExportJob.objects.get()
+    assert response.status_code == 302
+    assert response.url == reverse("admin:api_exportjob_change", args=[job.id])
+    assert sorted(job.document_ids) == [document.id for document in documents]
+    assert (job.status, job.rendered) == (ExportJob.DONE, 2)
+
+    response = admin_client.get(reverse("admin:api_exportjob_download", args=[job.id]))
+    assert response.status_code == 200
+    content = b"".join(response.streaming_content)
+    assert "地球公民違字第 1090002 號" in "\n".join(
+        paragraph.text for paragraph in DocxDocument(BytesIO(content)).paragraphs
+    )
+
+
+@pytest.fixture
+def export_job(db, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    factory = Factory.objects.create(
+        name="test factory", lat=23.234, lng=120.1, townname="臺南市善化區", display_number=666
+    )
+    documents = [Document.objects.create(factory=factory, code=code) for code in [1090001, 1090002]]
+    return ExportJob.objects.create(
+        document_ids=[document.id for document in documents], status=ExportJob.RUNNING
+    )
+
+
+def test_render_delivered_twice_counts_once(export_job):
+    with patch(
+        "api.admin.actions.export_docx.get_legislator_names",
+        side_effect=lambda locations: ["UNKNOWN"] * len(locations),
+    ), patch("api.admin.actions.export_docx.async_task") as mock_async_task, \
+            patch("django.db.transaction.on_commit", side_effect=lambda func: func()):
+        for index in [0, 0, 1, 1]:
+            render_export_job_document(export_job.id, index)
+
+    export_job.refresh_from_db()
+    assert sorted(export_job.rendered_indexes) == [0, 1]
+    mock_async_task.assert_called_once_with("api.tasks.compose_export_job", export_job.id)
+
+
+def test_render_failure_fails_the_task_and_the_job(export_job):
+    with patch(
+        "api.admin.actions.export_docx.generate_factories_document", side_effect=ValueError("oops")
+    ), pytest.raises(ValueError):
+        render_export_job_document(export_job.id, 0)
+
+    export_job.refresh_from_db()
+    assert (export_job.status, export_job.error) == (ExportJob.FAILED, "oops")
+
+
+def test_stale_job_shows_as_failed(export_job, admin_client):
+    url = reverse("admin:api_exportjob_change", args=[export_job.id])
+    assert "產生中" in admin_client.get(url).content.decode()
+
+    ExportJob.objects.filter(pk=export_job.id).update(
+        updated_at=timezone.now() - datetime.timedelta(hours=1)
+    )
+    export_job.refresh_from_db()
+    assert export_job.is_stale
+    assert "失敗 (逾時，請重新輸出)" in admin_client.get(url).content.decode()
@@ -0,0 +1,153 @@
+"""Bulk import of factories from NDJSON or CSV streams.
+
+Rows are validated with the rules of `FactorySerializer`, a chunk at a time,
+and the valid ones of a chunk are inserted with a single `bulk_create`,
+numbered with a block of display numbers. Their towns are found offline
+when easymap has the town boundaries, so the town statistics count them
+right away, and the land codes of the factories missing one are resolved
+afterwards by one `update_landcodes` task per chunk.
+"""
+import codecs
+import csv
+import itertools
+import json
+import logging
+
+from django.db import transaction
+from django_q.tasks import async_task
+from rest_framework.exceptions import ValidationError
+import easymap
+
+from .models import Factory, allocate_display_numbers
+from .response_cache import invalidate_responses
+from .serializers import FactorySerializer
+from .statistics import mark_towns_stale
+
+LOGGER = logging.getLogger("django")
+
+IMPORT_CHUNK_SIZE = 1000
+NDJSON = "ndjson"
+CSV = "csv"
+FORMATS = [NDJSON, CSV]
+
+
+def iter_ndjson_rows(lines):
+    """Parse the lines of a NDJSON stream, bytes or str, skipping the blank ones."""
+    for line_number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode("utf8")
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        if not isinstance(row, dict):
+            raise ValueError(f"line {line_number} should be a JSON object")
+        yield row
+
+
+def iter_csv_rows(lines):
+    """Parse the lines of a CSV stream with a header, bytes or str.
+
+    CSV has no null, empty cells are taken as one.
+    """
+    lines = iter(lines)
+    first_line = next(lines, None)
+    if first_line is None:
+        return
+    lines = itertools.chain([first_line], lines)
+    if isinstance(first_line, bytes):
+        lines = codecs.iterdecode(lines, "utf-8-sig")
+    try:
+        for row in csv.DictReader(lines):
+            yield {key: (value if value != "" else None) for key, value in row.items()}
+    except csv.Error as e:
+        raise ValueError(str(e)) from e
+
+
+def iter_rows(lines, format):
+    if format == NDJSON:
+        return iter_ndjson_rows(lines)
+    elif format == CSV:
+        return iter_csv_rows(lines)
+    raise ValueError(f"format should be one of {', '.join(FORMATS)}, but got {format}")
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _fill_towns(factories):
+    towns = easymap.get_default_client().towns
+    if towns is None:
+        return
+    missing = [factory for factory in factories if not factory.townname]
+    locations = [(factory.lat, factory.lng) for factory in missing]
+    for factory, town in zip(missing, towns.resolve_many(locations)):
+        if town is not None:
+            factory.towncode = town.towncode
+            factory.townname = town.cityname + town.townname
+
+
+def _import_chunk(rows, first_row_number, defaults):
+    # a single serializer for every row, building its fields takes longer
+    # than validating a row
+    serializer = FactorySerializer()
+    factories = []
+    errors = []
+    for row_number, row in enumerate(rows, start=first_row_number):
+        try:
+            validated_data = serializer.run_validation({**defaults, **row})
+        except ValidationError as e:
+            errors.append({"row": row_number, "errors": e.detail})
+            continue
+        factories.append(Factory(**validated_data))
+
+    if not factories:
+        return factories, errors
+
+    _fill_towns(factories)
+    with transaction.atomic():
+        display_numbers = allocate_display_numbers(len(factories))
+        for factory, display_number in zip(factories, display_numbers):
+            factory.display_number = display_number
+        Factory.objects.bulk_create(factories)
+        mark_towns_stale(factory.townname for factory in factories)
+
+        missing_landcode = [str(factory.id) for factory in factories if not factory.landcode]
+        if missing_landcode:
+            transaction.on_commit(lambda: async_task("api.tasks.update_landcodes", missing_landcode))
+    return factories, errors
+
+
+def import_factories(rows, defaults=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Validate and insert the factories of `rows`, dicts of `FactorySerializer` fields.
+
+    `defaults` are the fields of the rows missing them, e.g. `{"source": "G"}`.
+    Invalid rows are skipped, each chunk of valid rows commits on its own, so
+    a malformed line, raising a ValueError, stops the import after the chunks
+    before it.
+    Returns the number of factories created and the errors of the invalid
+    rows, numbered from 1.
+    """
+    defaults = defaults or {}
+    factory_ids = []
+    townnames = set()
+    errors = []
+    try:
+        for idx, chunk in enumerate(_chunks(rows, chunk_size)):
+            factories, chunk_errors = _import_chunk(chunk, idx * chunk_size + 1, defaults)
+            factory_ids.extend(factory.id for factory in factories)
+            townnames.update(factory.townname for factory in factories)
+            errors.extend(chunk_errors)
+            LOGGER.info(f"Imported {len(factory_ids)} factories, {len(errors)} rows rejected")
+    finally:
+        # once for the whole import, the chunks before a failure are kept
+        if factory_ids:
+            invalidate_responses(factory_ids, townnames)
+    return {"created": len(factory_ids), "errors": errors}
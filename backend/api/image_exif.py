@@ -0,0 +1,150 @@
+"""Where and when photos were taken, read from the stored images instead of the clients.
+
+Only the start of an image is fetched, with a range request: the EXIF of
+a JPEG is its APP1 segment, at most 64 KiB and ahead of the image data.
+The location and the time found there replace the missing or different
+orig_lat, orig_lng and orig_time sent by the client. Images stripped of
+their EXIF, like the ones Imgur serves, keep what the client sent.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+
+import PIL.Image
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from .image_upload import local_media_path
+from .models import Image
+
+LOGGER = logging.getLogger("django")
+
+EXIF_HEADER_BYTES = 64 * 1024
+EXIF_WORKERS = 8
+FETCH_TIMEOUT = 30
+# seconds kept for parsing and saving the last round within the django-q timeout
+TASK_MARGIN = 5
+# about a meter
+COORDINATE_TOLERANCE = 1e-5
+
+GPS_IFD = 0x8825
+EXIF_IFD = 0x8769
+DATETIME = 0x0132
+DATETIME_ORIGINAL = 0x9003
+GPS_LATITUDE_REF, GPS_LATITUDE, GPS_LONGITUDE_REF, GPS_LONGITUDE = 1, 2, 3, 4
+
+EXIF_FIELDS = ["orig_lat", "orig_lng", "orig_time"]
+
+
+def _read_header(url):
+    path = local_media_path(url)
+    if path is not None:
+        with open(path, "rb") as f:
+            return f.read(EXIF_HEADER_BYTES)
+    with requests.get(
+        url,
+        headers={"Range": f"bytes=0-{EXIF_HEADER_BYTES - 1}"},
+        stream=True,
+        timeout=FETCH_TIMEOUT,
+    ) as resp:
+        resp.raise_for_status()
+        # a server ignoring the range sends everything, stop after the header
+        return resp.raw.read(EXIF_HEADER_BYTES, decode_content=True)
+
+
+def _degrees(dms, ref):
+    degrees, minutes, seconds = (float(value) for value in dms)
+    value = degrees + minutes / 60 + seconds / 3600
+    return -value if ref in ("S", "W") else value
+
+
+def read_exif(url):
+    """The orig_* fields found in the EXIF of the image at `url`, the ones it has."""
+    exif = PIL.Image.open(BytesIO(_read_header(url))).getexif()
+    fields = {}
+
+    gps = exif.get_ifd(GPS_IFD)
+    if GPS_LATITUDE in gps and GPS_LONGITUDE in gps:
+        lat = _degrees(gps[GPS_LATITUDE], gps.get(GPS_LATITUDE_REF))
+        lng = _degrees(gps[GPS_LONGITUDE], gps.get(GPS_LONGITUDE_REF))
+        # phones without a fix write zeros
+        if lat or lng:
+            fields["orig_lat"], fields["orig_lng"] = lat, lng
+
+    taken_at = exif.get_ifd(EXIF_IFD).get(DATETIME_ORIGINAL) or exif.get(DATETIME)
+    if taken_at:
+        try:
+            fields["orig_time"] = timezone.make_aware(
+                datetime.strptime(taken_at.strip("\x00 "), "%Y:%m:%d %H:%M:%S")
+            )
+        except ValueError:
+            LOGGER.warning(f"Can't parse the EXIF time {taken_at!r} of {url}")
+    return fields
+
+
+def _read_exif(url):
+    try:
+        return read_exif(url)
+    except Exception as e:
+        LOGGER.error(f"Can't read the EXIF of {url} - {e}")
+        return {}
+
+
+def _differs(value, exif_value):
+    if value is None:
+        return True
+    if isinstance(exif_value, float):
+        return abs(value - exif_value) > COORDINATE_TOLERANCE
+    return value != exif_value
+
+
+def task_deadline():
+    """The `time.monotonic()` after which a django-q task starts reading no more images."""
+    budget = settings.Q_CLUSTER["timeout"] - FETCH_TIMEOUT - TASK_MARGIN
+    return time.monotonic() + max(budget, 0)
+
+
+def _save_exifs(images, exifs):
+    now = timezone.now()
+    updated = []
+    for image, exif in zip(images, exifs):
+        changed = {
+            field: value for field, value in exif.items() if _differs(getattr(image, field), value)
+        }
+        if not changed:
+            continue
+        LOGGER.info(f"EXIF of image {image.id} sets {changed}")
+        for field, value in changed.items():
+            setattr(image, field, value)
+        image.updated_at = now
+        updated.append(image)
+
+    if updated:
+        Image.raw_objects.bulk_update(updated, [*EXIF_FIELDS, "updated_at"])
+    return len(updated)
+
+
+def update_images_exif(image_ids, workers=EXIF_WORKERS, deadline=None):
+    """Fill the orig_* fields of the images from their EXIF, a round of `workers` at a time.
+
+    No round but the first starts after `deadline`, a `time.monotonic()`.
+    Returns how many images changed, and the ids of the images not read.
+    """
+    images = list(
+        Image.raw_objects.filter(pk__in=image_ids)
+        .order_by("pk")
+        .only("id", "image_path", *EXIF_FIELDS)
+    )
+
+    updated = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(images), workers):
+            if start and deadline is not None and time.monotonic() > deadline:
+                return updated, [image.id for image in images[start:]]
+            batch = images[start:start + workers]
+            exifs = list(executor.map(_read_exif, [image.image_path for image in batch]))
+            updated += _save_exifs(batch, exifs)
+    return updated, []
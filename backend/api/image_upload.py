@@ -0,0 +1,218 @@
+"""Uploads of the images of factories to where they are served from.
+
+An image is stored once per content: its sha256 is kept on the `Image`,
+so another image with the same bytes gets the URL already stored, and the
+uploads of the same content wait for each other on a database lock. The
+others go to the backend of IMAGE_UPLOAD_BACKEND, retried with exponential
+back-off, and end up in MEDIA_ROOT if it keeps failing, like they used to.
+The retries stop early enough for the fallback to run within the timeout of
+the django-q cluster, where the `upload_image` tasks run.
+
+- imgur: the Imgur API, through a pooled session
+- local: files in MEDIA_ROOT served under MEDIA_URL, a stand-in of an
+  object store for development and self-hosting
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from urllib.parse import urljoin, urlparse
+
+import requests
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .models import Image
+
+LOGGER = logging.getLogger("django")
+
+IMGUR_UPLOAD_API = "https://api.imgur.com/3/image"
+
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_maxsize=settings.IMAGE_UPLOAD_WORKERS))
+
+# arbitrary first key of the postgres advisory locks serializing the uploads
+# of a content, the second one comes from its hash
+_UPLOAD_LOCK_KEY = 4235002
+# seconds of the django-q timeout kept for the fallback and the write of the image
+UPLOAD_MARGIN = 10
+
+
+class UploadError(Exception):
+    pass
+
+
+class ImgurBackend:
+    def __init__(self, client_id):
+        self.client_id = client_id
+
+    def upload(self, content, name):
+        resp = _session.post(
+            IMGUR_UPLOAD_API,
+            data={"image": content},
+            headers={"Authorization": f"Client-ID {self.client_id}"},
+            timeout=settings.IMAGE_UPLOAD_TIMEOUT,
+        )
+        try:
+            link = resp.json()["data"]["link"]
+        except (ValueError, KeyError, TypeError):
+            # the credits left come with every response, no need to ask for them
+            remaining = resp.headers.get("X-RateLimit-ClientRemaining")
+            raise UploadError(
+                f"Imgur answered {resp.status_code}: {resp.text[:200]}, "
+                f"credits remaining: {remaining}"
+            )
+        return link
+
+
+class LocalBackend:
+    def __init__(self, directory=""):
+        # a directory of MEDIA_ROOT, e.g. "variants/"
+        self.directory = directory
+
+    def upload(self, content, name):
+        root = os.path.join(settings.MEDIA_ROOT, self.directory)
+        path = os.path.join(root, name)
+        if not os.path.exists(path):
+            os.makedirs(root, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=root)
+            with os.fdopen(fd, "wb") as fw:
+                fw.write(content)
+            os.replace(tmp_path, path)
+        return urljoin(urljoin(settings.DOMAIN, settings.MEDIA_URL), self.directory + name)
+
+
+def local_media_path(url):
+    """The file of MEDIA_ROOT served at `url`, None if it isn't served from there."""
+    media_url = urljoin(settings.DOMAIN, settings.MEDIA_URL)
+    if url.startswith(media_url):
+        path = os.path.join(settings.MEDIA_ROOT, url[len(media_url):])
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def get_backend(client_id=None):
+    if settings.IMAGE_UPLOAD_BACKEND == "imgur":
+        client_id = client_id or settings.IMGUR_CLIENT_ID
+        if client_id:
+            return ImgurBackend(client_id)
+    return LocalBackend()
+
+
+def _upload_with_retries(backend, content, name):
+    """`backend.upload`, retried until another attempt could outlast the django-q timeout."""
+    deadline = time.monotonic() + settings.Q_CLUSTER["timeout"] - UPLOAD_MARGIN
+    retries = settings.IMAGE_UPLOAD_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            return backend.upload(content, name)
+        except (UploadError, requests.RequestException) as e:
+            delay = settings.IMAGE_UPLOAD_BACKOFF * 2 ** attempt
+            if attempt == retries or (
+                time.monotonic() + delay + settings.IMAGE_UPLOAD_TIMEOUT > deadline
+            ):
+                raise
+            LOGGER.warning(f"Uploading {name} failed, retrying in {delay}s: {e}")
+            time.sleep(delay)
+
+
+def _store(content, content_hash, client_id):
+    """The URL of the stored content, and the error keeping it out of the backend if any."""
+    name = f"{content_hash}.jpg"
+    backend = get_backend(client_id)
+    try:
+        return _upload_with_retries(backend, content, name), None
+    except Exception as e:
+        if isinstance(backend, LocalBackend):
+            raise
+        LOGGER.error(f"Uploading {name} failed, keeping it in {settings.MEDIA_ROOT}: {e}")
+        return LocalBackend().upload(content, name), e
+
+
+def _lock_content(content_hash):
+    """Make the uploads of the content wait for each other, in any process, until commit."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_advisory_xact_lock(%s, %s)",
+            [_UPLOAD_LOCK_KEY, int(content_hash[:8], 16) - 2 ** 31],
+        )
+
+
+def _upload_image_file(image_path, image_id, client_id):
+    """The URL of the image, None if it failed, and the error of the upload if any."""
+    try:
+        with open(image_path, "rb") as f:
+            content = f.read()
+        content_hash = hashlib.sha256(content).hexdigest()
+
+        with transaction.atomic():
+            _lock_content(content_hash)
+            path = (
+                Image.raw_objects.filter(content_hash=content_hash)
+                .values_list("image_path", flat=True)
+                .first()
+            )
+            error = None
+            if path is None:
+                path, error = _store(content, content_hash, client_id)
+            # only what is in the backend is shared, a fallback copy is uploaded again later
+            Image.raw_objects.filter(pk=image_id).update(
+                image_path=path,
+                content_hash=content_hash if error is None else None,
+                upload_status=Image.UPLOADED if error is None else Image.FAILED,
+                updated_at=timezone.now(),
+            )
+    except Exception as e:
+        LOGGER.error(f"Uploading {image_path} of image {image_id} failed: {e}")
+        Image.raw_objects.filter(pk=image_id).update(upload_status=Image.FAILED)
+        return None, e
+
+    # the file may be the one the image is served from
+    if os.path.basename(urlparse(path).path) != os.path.basename(image_path):
+        try:
+            os.remove(image_path)
+        except OSError as e:
+            LOGGER.warning(f"Image {image_id} is uploaded, but removing {image_path} failed: {e}")
+    return path, error
+
+
+def upload_image_file(image_path, image_id, client_id=None):
+    """Store the file as the content of the image and remove it, returning its URL.
+
+    Returns None if it failed, keeping the file.
+    """
+    return _upload_image_file(image_path, image_id, client_id)[0]
+
+
+def upload_image_files(images, client_id=None, workers=None):
+    """`upload_image_file` of (image_path, image_id) `images` in a pool of threads.
+
+    Yields the image ids, their URLs, None for the failed ones, and the
+    errors of the uploads, None for the ones in the backend, as they finish.
+    `images` is consumed as the uploads go, it can be a lazy iterator.
+    """
+    workers = workers or settings.IMAGE_UPLOAD_WORKERS
+
+    def upload(image):
+        image_path, image_id = image
+        try:
+            return (image_id, *_upload_image_file(image_path, image_id, client_id))
+        finally:
+            # the connections of the threads aren't closed by a request cycle
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for image in images:
+            pending.add(executor.submit(upload, image))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
@@ -0,0 +1,120 @@
+"""Downscaled copies of the images of factories, for the pages not needing originals.
+
+The thumbnail is for lists and map popups, the medium copy for the admin
+previews and the exported documents. They are JPEG files kept in the
+variants directory of MEDIA_ROOT, like the images stored by the local
+upload backend, made by the `make_image_variants` task once an image is
+registered. Their URLs are saved on the `Image`.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import PIL.Image
+import PIL.ImageOps
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from .image_upload import LocalBackend, local_media_path
+from .models import Image
+from .response_cache import invalidate_responses
+
+LOGGER = logging.getLogger("django")
+
+VARIANTS_DIRECTORY = "variants/"
+FETCH_TIMEOUT = 30
+JPEG_QUALITY = 85
+# seconds kept for downscaling and saving the last round within the django-q timeout
+TASK_MARGIN = 5
+
+
+def _variant_sizes():
+    return {
+        "thumbnail_path": settings.IMAGE_THUMBNAIL_SIZE,
+        "medium_path": settings.IMAGE_MEDIUM_SIZE,
+    }
+
+
+def _read_original(url):
+    """The content at `url`, read from MEDIA_ROOT when it is served from there."""
+    path = local_media_path(url)
+    if path is not None:
+        with open(path, "rb") as f:
+            return f.read()
+    resp = requests.get(url, timeout=FETCH_TIMEOUT)
+    resp.raise_for_status()
+    return resp.content
+
+
+def _downscale(original, size):
+    image = original.copy()
+    image.thumbnail((size, size))
+    data = BytesIO()
+    image.save(data, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return data.getvalue()
+
+
+def make_variants(image_id, image_path):
+    """The URLs of the variants of an image, by field, or None if they couldn't be made."""
+    try:
+        original = PIL.Image.open(BytesIO(_read_original(image_path)))
+        # phones store the orientation in the EXIF, the copies lose it
+        original = PIL.ImageOps.exif_transpose(original).convert("RGB")
+        backend = LocalBackend(VARIANTS_DIRECTORY)
+        return {
+            field: backend.upload(_downscale(original, size), f"{image_id}-{size}.jpg")
+            for field, size in _variant_sizes().items()
+        }
+    except Exception as e:
+        LOGGER.error(f"Can't make the variants of image {image_id} from {image_path} - {e}")
+        return None
+
+
+def task_deadline():
+    """The `time.monotonic()` after which a django-q task starts no more images."""
+    budget = settings.Q_CLUSTER["timeout"] - FETCH_TIMEOUT - TASK_MARGIN
+    return time.monotonic() + max(budget, 0)
+
+
+def _save_variants(images, variants):
+    now = timezone.now()
+    updated = [
+        Image(id=image_id, updated_at=now, **fields)
+        for (image_id, _, _), fields in zip(images, variants)
+        if fields is not None
+    ]
+    if updated:
+        Image.raw_objects.bulk_update(updated, [*_variant_sizes(), "updated_at"])
+        factory_ids = {
+            factory_id
+            for (_, _, factory_id), fields in zip(images, variants)
+            if fields is not None and factory_id is not None
+        }
+        invalidate_responses(factory_ids)
+    return len(updated)
+
+
+def make_image_variants(image_ids, workers=None, deadline=None):
+    """Make and save the variants of the images, a round of `workers` concurrent ones at a time.
+
+    No round but the first starts after `deadline`, a `time.monotonic()`.
+    Returns how many were made, and the ids of the images not tried.
+    """
+    workers = workers or settings.IMAGE_VARIANT_WORKERS
+    images = list(
+        Image.raw_objects.filter(pk__in=image_ids)
+        .order_by("pk")
+        .values_list("id", "image_path", "factory_id")
+    )
+
+    made = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(images), workers):
+            if start and deadline is not None and time.monotonic() > deadline:
+                return made, [image_id for image_id, _, _ in images[start:]]
+            batch = images[start:start + workers]
+            variants = list(executor.map(lambda image: make_variants(*image[:2]), batch))
+            made += _save_variants(batch, variants)
+    return made, []
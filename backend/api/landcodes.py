@@ -0,0 +1,154 @@
+"""Land codes of factories from easymap, resolved in batches.
+
+The distinct locations of a batch are requested once each, by a bounded
+pool of threads spaced by a rate limit, and the answers are saved with a
+`bulk_update` after every round of requests, so a task killed halfway
+keeps what it found. The factories missing a land code are walked in
+chunks by id, so a backfill stopped halfway resumes from the last id it
+reported.
+
+The django-q tasks stop starting requests once they near the timeout of
+the cluster, with room for the slowest request, and enqueue what is left.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+import easymap
+
+from .models import Factory
+from .response_cache import invalidate_responses
+from .statistics import mark_towns_stale
+
+LOGGER = logging.getLogger("django")
+
+LANDCODE_CHUNK_SIZE = 200
+LANDCODE_FIELDS = ["landcode", "sectcode", "sectname", "towncode", "townname", "updated_at"]
+# seconds a task keeps for saving its last batch before the timeout
+TASK_MARGIN = 5
+
+
+class _RateLimiter:
+    """Spaces the calls of the threads sharing it by 1 / `rate` seconds, no limit if 0."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next_call = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            call_at = max(now, self._next_call)
+            self._next_call = call_at + self.interval
+        time.sleep(call_at - now)
+
+
+def task_deadline():
+    """The `time.monotonic()` after which a django-q task starts no more easymap requests."""
+    budget = settings.Q_CLUSTER["timeout"] - easymap.DEFAULT_TIMEOUT - TASK_MARGIN
+    return time.monotonic() + max(budget, 0)
+
+
+def task_chunk_size(rate=None):
+    """The number of factories a django-q task resolves at `rate` before its deadline."""
+    rate = settings.LANDCODE_RATE_LIMIT if rate is None else rate
+    if not rate:
+        return LANDCODE_CHUNK_SIZE
+    budget = settings.Q_CLUSTER["timeout"] - easymap.DEFAULT_TIMEOUT - TASK_MARGIN
+    return max(int(budget * rate), 1)
+
+
+def _save_land_infos(factories, land_infos):
+    townnames = {factory.townname for factory in factories}
+    now = timezone.now()
+    updated = []
+    for factory in factories:
+        land_info = land_infos[factory.lat, factory.lng]
+        if not land_info.get("sectno"):
+            continue
+        factory.landcode = land_info.get("landno")
+        factory.sectcode = land_info.get("sectno")
+        factory.sectname = land_info.get("sectname")
+        factory.towncode = land_info.get("towncode")
+        factory.townname = land_info.get("townname")
+        factory.updated_at = now
+        updated.append(factory)
+
+    if updated:
+        Factory.raw_objects.bulk_update(updated, LANDCODE_FIELDS)
+        # the factories may have moved from the towns they were counted in
+        townnames.update(factory.townname for factory in updated)
+        mark_towns_stale(townnames)
+        invalidate_responses([factory.id for factory in updated], townnames)
+    return len(updated)
+
+
+def update_landcodes(factories, workers=None, rate=None, deadline=None):
+    """Resolve the land codes of `factories` and save them, a round of requests at a time.
+
+    A factory whose location has no section, because the request failed or
+    it isn't on a land parcel, is left as it is and tried again next time.
+    No round but the first starts after `deadline`, a `time.monotonic()`.
+    Returns how many land codes were found, and the factories not tried.
+    """
+    factories = list(factories)
+    workers = workers or settings.LANDCODE_WORKERS
+    limiter = _RateLimiter(settings.LANDCODE_RATE_LIMIT if rate is None else rate)
+
+    def resolve(location):
+        limiter.wait()
+        lat, lng = location
+        return easymap.get_land_number(lat=lat, lng=lng)
+
+    land_infos = {}
+    found = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(factories), workers):
+            if start and deadline is not None and time.monotonic() > deadline:
+                return found, factories[start:]
+            batch = factories[start:start + workers]
+            # the locations are requested once each, whichever batch they are in
+            locations = [
+                location
+                for location in dict.fromkeys((factory.lat, factory.lng) for factory in batch)
+                if location not in land_infos
+            ]
+            land_infos.update(zip(locations, executor.map(resolve, locations)))
+            found += _save_land_infos(batch, land_infos)
+    return found, []
+
+
+def unresolved_factories():
+    return Factory.objects.filter(
+        Q(landcode__isnull=True) | Q(landcode="") | Q(sectcode__isnull=True) | Q(sectcode="")
+    )
+
+
+def update_unresolved_landcodes(after=None, chunk_size=LANDCODE_CHUNK_SIZE, workers=None,
+                                rate=None, deadline=None):
+    """`update_landcodes` of the next chunk of factories missing a land code.
+
+    The chunk is the factories with an id greater than `after`, the cursor.
+    Returns the number of land codes found and the next cursor, the id of
+    the last factory tried, None once every factory has been tried.
+    """
+    queryset = unresolved_factories().order_by("id")
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    factories = list(queryset[:chunk_size])
+    if not factories:
+        return 0, None
+    updated, remaining = update_landcodes(factories, workers=workers, rate=rate, deadline=deadline)
+    tried = factories[:len(factories) - len(remaining)]
+    LOGGER.info(
+        f"Resolved {updated} of {len(tried)} land codes, easymap cache {easymap.cache_stats()}"
+    )
+    return updated, tried[-1].id if tried else after
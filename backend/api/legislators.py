@@ -0,0 +1,81 @@
+"""Client of the Find Taiwan Legislator API, naming the legislator of a location.
+
+The legislator of a place hardly ever changes, so the answers are kept in
+the Django cache, by coordinates rounded to about a hundred meters: the
+factories of a district share them. The default cache of `CACHES` is a
+table of the database, so the answers survive restarts and are shared by
+the web workers and the django-q cluster, where the large docx exports
+render. LEGISLATOR_CACHE_TIMEOUT expires them, and the cache culls entries
+past its MAX_ENTRIES. With the local-memory cache of development, every
+process starts empty.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+
+LOGGER = logging.getLogger("django")
+
+FIND_TAIWAN_LEGISLATOR_API = "https://ftl.disfactory.tw"
+UNKNOWN_LEGISLATOR = "UNKNOWN"
+# about 100 meters
+COORDINATE_DIGITS = 3
+
+_session = requests.Session()
+_session.mount(
+    "https://", HTTPAdapter(pool_maxsize=settings.LEGISLATOR_API_WORKERS, max_retries=1)
+)
+
+
+def _round_location(lat, lng):
+    return round(lat, COORDINATE_DIGITS), round(lng, COORDINATE_DIGITS)
+
+
+def _cache_key(location):
+    lat, lng = location
+    return f"legislator:{lat:.{COORDINATE_DIGITS}f},{lng:.{COORDINATE_DIGITS}f}"
+
+
+def _fetch_legislator_name(location):
+    """The name from the API, or None if it failed and nothing should be cached."""
+    lat, lng = location
+    try:
+        resp = _session.get(
+            FIND_TAIWAN_LEGISLATOR_API,
+            params={"lat": lat, "lng": lng},
+            timeout=settings.LEGISLATOR_API_TIMEOUT,
+        )
+        data = resp.json()
+        return data[0]["name"] if (data and "name" in data[0]) else UNKNOWN_LEGISLATOR
+    except Exception as e:
+        LOGGER.error(
+            f"Can't get the legislator information from {FIND_TAIWAN_LEGISLATOR_API} - {e}",
+        )
+        return None
+
+
+def get_legislator_names(locations):
+    """Names of the legislators of (lat, lng) `locations`, UNKNOWN for the failed ones.
+
+    Cached locations are read at once, the others are requested concurrently.
+    """
+    locations = [_round_location(lat, lng) for lat, lng in locations]
+    keys = {location: _cache_key(location) for location in locations}
+    cached = cache.get_many(list(keys.values()))
+
+    missing = list({location for location in locations if keys[location] not in cached})
+    if missing:
+        with ThreadPoolExecutor(max_workers=settings.LEGISLATOR_API_WORKERS) as executor:
+            fetched = dict(zip(missing, executor.map(_fetch_legislator_name, missing)))
+        found = {keys[location]: name for location, name in fetched.items() if name is not None}
+        cache.set_many(found, settings.LEGISLATOR_CACHE_TIMEOUT)
+        cached.update(found)
+
+    return [cached.get(keys[location], UNKNOWN_LEGISLATOR) for location in locations]
+
+
+def get_legislator_name(lat, lng):
+    return get_legislator_names([(lat, lng)])[0]
@@ -0,0 +1,74 @@
+"""Helpers shared by the `benchmark_*` management commands.
+
+The seeded rows live in a transaction which is always rolled back, so the
+commands can be pointed at a development database without leaving garbage.
+"""
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from api.models import Factory, allocate_display_numbers
+
+SEED_BATCH_SIZE = 10000
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rollback_afterwards():
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback()
+    except _Rollback:
+        pass
+
+
+def random_taiwan_position(rng):
+    return (
+        rng.uniform(settings.TAIWAN_MIN_LATITUDE, settings.TAIWAN_MAX_LATITUDE),
+        rng.uniform(settings.TAIWAN_MIN_LONGITUDE, settings.TAIWAN_MAX_LONGITUDE),
+    )
+
+
+def seed_factories(n, rng, **fields):
+    """Insert `n` factories uniformly spread over Taiwan and refresh planner statistics."""
+    display_numbers = allocate_display_numbers(n)
+    for offset in range(0, n, SEED_BATCH_SIZE):
+        batch = []
+        for display_number in display_numbers[offset:offset + SEED_BATCH_SIZE]:
+            lat, lng = random_taiwan_position(rng)
+            batch.append(
+                Factory(
+                    lat=lat,
+                    lng=lng,
+                    display_number=display_number,
+                    name=f"benchmark_{display_number}",
+                    **{key: value(rng) if callable(value) else value for key, value in fields.items()},
+                )
+            )
+        Factory.objects.bulk_create(batch)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {Factory._meta.db_table}")
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def timed(func, repeat):
+    """Return the sorted latencies (ms) of calling `func` `repeat` times."""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return sorted(latencies)
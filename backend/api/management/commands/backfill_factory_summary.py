@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import Factory, refresh_factory_summary
+
+
+class Command(BaseCommand):
+    help = "recompute the report, image and document summary columns of every factory"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="number of factories updated per transaction",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        factory_ids = list(Factory.raw_objects.order_by("pk").values_list("pk", flat=True))
+
+        for start in range(0, len(factory_ids), batch_size):
+            with transaction.atomic():
+                refresh_factory_summary(factory_ids[start:start + batch_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully refreshed summary of {len(factory_ids)} factories")
+        )
@@ -0,0 +1,38 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from api.views.utils import _get_nearby_factories
+from ._benchmark import rollback_afterwards, seed_factories, percentile, timed, random_taiwan_position
+
+
+class Command(BaseCommand):
+    help = "measure p50/p99 latency of the nearby factories lookup on seeded tables (rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+        parser.add_argument("--radius", type=float, nargs="+", default=[1, 5])
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+
+        for size in options["sizes"]:
+            with rollback_afterwards():
+                self.stdout.write(f"seeding {size} factories ...")
+                seed_factories(size, rng, source="U")
+
+                for radius in options["radius"]:
+                    def query():
+                        lat, lng = random_taiwan_position(rng)
+                        list(_get_nearby_factories(lat, lng, radius, source="U"))
+
+                    latencies = timed(query, options["queries"])
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f"factories={size} range={radius}km "
+                            f"p50={percentile(latencies, 50):.1f}ms "
+                            f"p99={percentile(latencies, 99):.1f}ms"
+                        )
+                    )
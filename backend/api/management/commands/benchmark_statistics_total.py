@@ -0,0 +1,133 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
+
+from api.models import Factory, Document, ReportRecord, DocumentDisplayStatusEnum, refresh_factory_summary
+from api.models.const import DocumentDisplayStatusConst
+from api.statistics import count_factories_by_city
+from api.utils import normalize_townname
+from api.views.zipcode import ZIP_CODE
+from ._benchmark import rollback_afterwards, seed_factories, percentile, timed
+
+
+def _legacy_statistics_total():
+    """`get_statistics_total` as it was before the single grouped query, to compare with."""
+    result = {}
+    for city in ZIP_CODE.keys():
+        city = city.replace("台", "臺")
+        result[city] = {}
+
+        factories = Factory.objects.filter(
+            Q(townname__startswith=city) | Q(townname__startswith=f"臺灣省{city}")
+        )
+        result[city]["factories"] = factories.count()
+
+        factory_id_list = factories.values_list("id", flat=True)
+        report_records = (
+            ReportRecord.objects.prefetch_related("factory")
+            .filter(factory__id__in=factory_id_list)
+            .distinct("factory_id")
+        )
+        result[city]["report_records"] = report_records.count()
+
+        docs = (
+            Document.objects.prefetch_related("factory")
+            .order_by("factory__id", "-created_at")
+            .distinct("factory__id")
+            .filter(factory__id__in=factory_id_list)
+        )
+        result[city]["documents"] = docs.count()
+
+        for name in [
+            DocumentDisplayStatusConst.OPEN,
+            DocumentDisplayStatusConst.IN_PROGRESS,
+            DocumentDisplayStatusConst.POWER_OUTED,
+            DocumentDisplayStatusConst.DEMOLISHED,
+        ]:
+            result[city][name] = 0
+
+        for doc in docs:
+            status = DocumentDisplayStatusEnum.CHOICES[doc.display_status][1]
+            if status == DocumentDisplayStatusConst.REPORTED:
+                result[city][DocumentDisplayStatusConst.OPEN] += 1
+            elif status in [
+                DocumentDisplayStatusConst.AUDIT_SCHEDULED,
+                DocumentDisplayStatusConst.COMMUNICATION_PERIOD,
+                DocumentDisplayStatusConst.WORK_STOPPED,
+                DocumentDisplayStatusConst.DEMOLITION_SCHEDULED,
+            ]:
+                result[city][DocumentDisplayStatusConst.IN_PROGRESS] += 1
+            elif status == DocumentDisplayStatusConst.POWER_OUTING:
+                result[city][DocumentDisplayStatusConst.POWER_OUTED] += 1
+            elif status == DocumentDisplayStatusConst.DEMOLISHED:
+                result[city][DocumentDisplayStatusConst.DEMOLISHED] += 1
+    return result
+
+
+def _random_townname(rng):
+    city = rng.choice(list(ZIP_CODE))
+    return f"{city}{rng.choice(list(ZIP_CODE[city]))}"
+
+
+def _seed_relations(rng, document_ratio, report_ratio):
+    documents, report_records = [], []
+    for factory_id in Factory.objects.values_list("id", flat=True).iterator():
+        if rng.random() < document_ratio:
+            documents.append(Document(
+                factory_id=factory_id,
+                code=1090000,
+                display_status=rng.randrange(len(DocumentDisplayStatusEnum.CHOICES)),
+            ))
+        if rng.random() < report_ratio:
+            report_records.append(ReportRecord(factory_id=factory_id, action_type="POST", action_body={}))
+    Document.objects.bulk_create(documents, batch_size=10000)
+    ReportRecord.objects.bulk_create(report_records, batch_size=10000)
+    refresh_factory_summary()
+
+    with connection.cursor() as cursor:
+        for model in [Factory, Document, ReportRecord]:
+            cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+
+class Command(BaseCommand):
+    help = "compare query count and latency of /api/statistics/total with the per-city loop (rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+        parser.add_argument("--document-ratio", type=float, default=0.2)
+        parser.add_argument("--report-ratio", type=float, default=0.5)
+        parser.add_argument("--queries", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        cities = [normalize_townname(city) for city in ZIP_CODE.keys()]
+        implementations = [
+            ("per-city loop", _legacy_statistics_total),
+            ("grouped query", lambda: count_factories_by_city(cities)),
+        ]
+
+        for size in options["sizes"]:
+            with rollback_afterwards():
+                self.stdout.write(f"seeding {size} factories ...")
+                seed_factories(size, rng, source="U", townname=_random_townname)
+                _seed_relations(rng, options["document_ratio"], options["report_ratio"])
+
+                results = []
+                for name, func in implementations:
+                    with CaptureQueriesContext(connection) as ctx:
+                        results.append(func())
+                    latencies = timed(func, options["queries"])
+                    self.stdout.write(
+                        self.style.SUCCESS(
+                            f"factories={size} {name}: queries={len(ctx.captured_queries)} "
+                            f"p50={percentile(latencies, 50):.1f}ms "
+                            f"p99={percentile(latencies, 99):.1f}ms"
+                        )
+                    )
+
+                if results[0] != results[1]:
+                    self.stderr.write(self.style.ERROR("the implementations disagree"))
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.tiles import VECTOR_TILE_MIN_ZOOM, export_vector_tiles
+
+
+class Command(BaseCommand):
+    help = (
+        "render factories into Mapbox Vector Tiles under VECTOR_TILE_ROOT, "
+        "only the tiles changed since the last export unless --full is given"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-zoom", type=int, default=VECTOR_TILE_MIN_ZOOM)
+        parser.add_argument("--max-zoom", type=int, default=settings.FACTORY_TILE_POINT_ZOOM)
+        parser.add_argument("--full", action="store_true", help="render every tile again")
+
+    def handle(self, *args, **options):
+        zooms = list(range(options["min_zoom"], options["max_zoom"] + 1))
+        n_tiles = export_vector_tiles(zooms, full=options["full"])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully exporting {n_tiles} vector tiles of zoom {zooms}")
+        )
@@ -0,0 +1,57 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.factory_import import CSV, FORMATS, IMPORT_CHUNK_SIZE, NDJSON, import_factories, iter_rows
+
+
+class Command(BaseCommand):
+    help = "import factories from a NDJSON or CSV file, e.g. a government dataset"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="file to import, - for stdin")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="format of the file, guessed from its extension by default",
+        )
+        parser.add_argument(
+            "--source",
+            choices=["G", "U"],
+            help="source of the factories without a source column",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help="number of rows validated and inserted per transaction",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"]
+        if format is None:
+            format = CSV if path.lower().endswith(".csv") else NDJSON
+        defaults = {"source": options["source"]} if options["source"] else {}
+
+        stream = sys.stdin.buffer if path == "-" else open(path, "rb")
+        try:
+            result = import_factories(
+                iter_rows(stream, format),
+                defaults=defaults,
+                chunk_size=options["chunk_size"],
+            )
+        except ValueError as e:
+            raise CommandError(f"malformed {format} file: {e}")
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+
+        for error in result["errors"]:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully imported {result['created']} factories, "
+                f"{len(result['errors'])} rows rejected"
+            )
+        )
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.image_variants import make_image_variants
+from api.models import Image
+
+
+class Command(BaseCommand):
+    help = "make the thumbnail and medium copies of the images missing them"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=100,
+            help="number of images made and saved at once",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.IMAGE_VARIANT_WORKERS,
+            help="number of images downloaded and downscaled concurrently",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        image_ids = list(
+            Image.objects.filter(thumbnail_path__isnull=True)
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+
+        made = 0
+        for start in range(0, len(image_ids), chunk_size):
+            chunk_made, _ = make_image_variants(
+                image_ids[start:start + chunk_size], workers=options["workers"]
+            )
+            made += chunk_made
+            done = min(start + chunk_size, len(image_ids))
+            self.stdout.write(f"{done}/{len(image_ids)} images, {made} made")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully made the copies of {made} of {len(image_ids)} images")
+        )
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from api.image_exif import EXIF_WORKERS, update_images_exif
+from api.models import Image
+
+
+class Command(BaseCommand):
+    help = "fill the photo location and time of the images from their EXIF"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="check every image, not only the ones missing a location or a time",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=200,
+            help="number of images read and saved at once",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=EXIF_WORKERS,
+            help="number of images read concurrently",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        queryset = Image.objects.all()
+        if not options["all"]:
+            queryset = queryset.filter(
+                Q(orig_lat__isnull=True) | Q(orig_lng__isnull=True) | Q(orig_time__isnull=True)
+            )
+        image_ids = list(queryset.order_by("pk").values_list("pk", flat=True))
+
+        updated = 0
+        for start in range(0, len(image_ids), chunk_size):
+            chunk_updated, _ = update_images_exif(
+                image_ids[start:start + chunk_size], workers=options["workers"]
+            )
+            updated += chunk_updated
+            done = min(start + chunk_size, len(image_ids))
+            self.stdout.write(f"{done}/{len(image_ids)} images, {updated} updated")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully updated {updated} of {len(image_ids)} images")
+        )
@@ -1,28 +1,82 @@
 import os
+import time
+from collections import Counter
 
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
 
+from api.image_upload import upload_image_files
 from api.models import Image
-from api.tasks import upload_image
+
+# rows fetched per round trip of the server-side cursor
+REUPLOAD_CHUNK_SIZE = 500
+# failed image ids listed at the end of a run
+MAX_LISTED_FAILURES = 20
 
 
 class Command(BaseCommand):
-    help = "re-upload images that don't have a Imgur uri"
+    help = (
+        "re-upload the images kept in MEDIA_ROOT to the upload backend, "
+        "an interrupted run resumes with the images not uploaded yet"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.IMAGE_UPLOAD_WORKERS,
+            help="number of concurrent uploads",
+        )
+        parser.add_argument(
+            "--skip-failed",
+            action="store_true",
+            help="only upload the images never tried, not the ones which failed before",
+        )
+        parser.add_argument(
+            "--progress-every",
+            type=int,
+            default=100,
+            help="number of images between progress reports",
+        )
 
     def handle(self, *args, **options):
-        for img in Image.objects.all():
-            if "https://i.imgur.com" not in img.image_path:
-                image_path_on_server = os.path.join(
-                    settings.MEDIA_ROOT,
-                    img.image_path.split("/")[-1],
-                )
-                success = upload_image(
-                    image_path_on_server,
-                    settings.IMGUR_CLIENT_ID,
-                    img.id,
-                )
-                if not success:
-                    raise CommandError(f"Uploading image {img.id} failed.")
-
-        self.stdout.write(self.style.SUCCESS("Successfully uploading all images to imgur"))
+        statuses = [Image.PENDING] if options["skip_failed"] else [Image.PENDING, Image.FAILED]
+        queryset = Image.objects.filter(upload_status__in=statuses)
+        total = queryset.count()
+        images = (
+            (os.path.join(settings.MEDIA_ROOT, image_path.split("/")[-1]), image_id)
+            for image_id, image_path in queryset.values_list("id", "image_path").iterator(
+                chunk_size=REUPLOAD_CHUNK_SIZE
+            )
+        )
+
+        started_at = time.monotonic()
+        done = 0
+        failed = []
+        errors = Counter()
+        for image_id, _, error in upload_image_files(
+            images, settings.IMGUR_CLIENT_ID, workers=options["workers"]
+        ):
+            done += 1
+            if error is not None:
+                failed.append(image_id)
+                errors[type(error).__name__] += 1
+            if done % options["progress_every"] == 0:
+                self.stdout.write(self._progress(done, total, len(failed), started_at))
+
+        self.stdout.write(self._progress(done, total, len(failed), started_at))
+        if failed:
+            for error, count in errors.most_common():
+                self.stderr.write(f"{error}: {count} images")
+            listed = ", ".join(map(str, failed[:MAX_LISTED_FAILURES]))
+            more = f" and {len(failed) - MAX_LISTED_FAILURES} more" if (
+                len(failed) > MAX_LISTED_FAILURES
+            ) else ""
+            raise CommandError(f"Uploading images {listed}{more} failed.")
+
+        self.stdout.write(self.style.SUCCESS(f"Successfully uploaded {done} images"))
+
+    @staticmethod
+    def _progress(done, total, failed, started_at):
+        elapsed = max(time.monotonic() - started_at, 1e-6)
+        return f"{done}/{total} images, {done / elapsed:.1f} images/s, {failed} failed"
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django_q.tasks import async_task
+
+from api.landcodes import LANDCODE_CHUNK_SIZE, unresolved_factories, update_unresolved_landcodes
+
+
+class Command(BaseCommand):
+    help = "resolve the land codes of the factories missing one through easymap"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--after",
+            help="id of the last factory done by a previous run, to resume from it",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=LANDCODE_CHUNK_SIZE,
+            help="number of factories between progress reports",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.LANDCODE_WORKERS,
+            help="number of concurrent easymap requests",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=settings.LANDCODE_RATE_LIMIT,
+            help="easymap requests per second, 0 for no limit",
+        )
+        parser.add_argument(
+            "--background",
+            action="store_true",
+            help="enqueue the chunks as django-q tasks instead of running them here",
+        )
+
+    def handle(self, *args, **options):
+        cursor = options["after"]
+        if options["background"]:
+            async_task("api.tasks.update_unresolved_landcodes", cursor)
+            self.stdout.write(self.style.SUCCESS("Enqueued the land code backfill"))
+            return
+
+        queryset = unresolved_factories()
+        if cursor is not None:
+            queryset = queryset.filter(id__gt=cursor)
+        total = queryset.count()
+
+        done = 0
+        resolved = 0
+        while True:
+            updated, next_cursor = update_unresolved_landcodes(
+                cursor,
+                chunk_size=options["chunk_size"],
+                workers=options["workers"],
+                rate=options["rate"],
+            )
+            if next_cursor is None:
+                break
+            cursor = next_cursor
+            done = total - unresolved_factories().filter(id__gt=cursor).count()
+            resolved += updated
+            self.stdout.write(
+                f"{done}/{total} factories tried, {resolved} land codes found, "
+                f"resume with --after {cursor}"
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully resolved {resolved} of {total} land codes")
+        )
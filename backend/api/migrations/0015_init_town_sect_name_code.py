@@ -2,15 +2,39 @@
 import os
 import csv
 
+import logging
+
 from django.db import migrations
 from django.conf import settings
+from django.utils import timezone
+import easymap
 
-from api.tasks import update_landcode_with_custom_factory_model
 
+LOGGER = logging.getLogger("django")
 
 SEED_DATA_PATH = os.path.join(settings.BASE_DIR, "fixtures/full-info.csv")
 
 
+def update_landcode_with_custom_factory_model(factory_id, factory_model):
+    factory = factory_model.objects.get(pk=factory_id)
+    try:
+        landinfo = easymap.get_land_number(lng=factory.lng, lat=factory.lat)
+        landcode = landinfo.get("landno")
+
+        LOGGER.info(f"Factory {factory_id} retrieved land number {landcode}")
+        factory_model.objects.filter(pk=factory_id).update(
+            landcode=landcode,
+            sectcode=landinfo.get("sectno"),
+            sectname=landinfo.get("sectname"),
+            towncode=landinfo.get("towncode"),
+            townname=landinfo.get("townname"),
+            updated_at=timezone.now(),
+        )
+    except Exception as e:
+        LOGGER.error(f"update_landcode task failed.")
+        LOGGER.error(e)
+
+
 def forward_func(apps, schema_editor):
     Factory = apps.get_model("api", "Factory")
 
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.27 on 2026-10-18 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0039_remove_reportrecord_user_ip'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='factory',
+            index=models.Index(fields=['lat', 'lng'], name='api_factory_lat_lng_idx'),
+        ),
+    ]
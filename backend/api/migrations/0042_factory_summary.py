@@ -0,0 +1,50 @@
+# Generated by Django 2.2.27 on 2026-10-18 18:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from api.models.factory_summary import refresh_factory_summary_with_custom_models
+
+
+def forward_func(apps, schema_editor):
+    Factory = apps.get_model("api", "Factory")
+    refresh_factory_summary_with_custom_models(
+        Factory._base_manager.all(),
+        apps.get_model("api", "ReportRecord"),
+        apps.get_model("api", "Image"),
+        apps.get_model("api", "Document"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0041_document_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='factory',
+            name='image_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='factory',
+            name='latest_document',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.Document'),
+        ),
+        migrations.AddField(
+            model_name='factory',
+            name='latest_document_display_status',
+            field=models.IntegerField(blank=True, choices=[(0, '已檢舉'), (1, '已排程稽查'), (2, '陳述意見期'), (3, '已勒令停工'), (4, '已發函斷電'), (5, '已排程拆除'), (6, '已拆除'), (7, '等待新事證')], editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='factory',
+            name='latest_report_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(
+            code=forward_func,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 2.2.27 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+from api.statistics import refresh_town_statistics_with_custom_models
+
+
+def forward_func(apps, schema_editor):
+    refresh_town_statistics_with_custom_models(
+        apps.get_model("api", "TownStatistics"),
+        apps.get_model("api", "Factory"),
+        apps.get_model("api", "ReportRecord"),
+        apps.get_model("api", "Document"),
+    )
+
+    # catches what the signals miss, see api/statistics.py
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.update_or_create(
+        func="api.tasks.update_town_statistics",
+        defaults={"name": "update town statistics", "schedule_type": "I", "minutes": 10},
+    )
+
+
+def backward_func(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(func="api.tasks.update_town_statistics").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0042_factory_summary'),
+        ('django_q', '0009_auto_20171009_0915'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TownStatistics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(blank=True, max_length=50)),
+                ('town', models.CharField(blank=True, max_length=50)),
+                ('source', models.CharField(choices=[('G', '政府'), ('U', '使用者')], max_length=1)),
+                ('display_status', models.IntegerField(blank=True, choices=[(0, '已檢舉'), (1, '已排程稽查'), (2, '陳述意見期'), (3, '已勒令停工'), (4, '已發函斷電'), (5, '已排程拆除'), (6, '已拆除'), (7, '等待新事證'), (8, '處理中')], null=True)),
+                ('factories', models.IntegerField(default=0)),
+                ('documents', models.IntegerField(default=0)),
+                ('report_records', models.IntegerField(default=0)),
+                ('images', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='townstatistics',
+            index=models.Index(fields=['city', 'town'], name='api_townstatistics_town_idx'),
+        ),
+        migrations.RunPython(
+            code=forward_func,
+            reverse_code=backward_func,
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.27 on 2026-10-18 18:26
+
+from django.db import migrations, models
+from django.db.models import Max
+
+from api.models.counter import DISPLAY_NUMBER_COUNTER
+
+
+def forward_func(apps, schema_editor):
+    Factory = apps.get_model("api", "Factory")
+    Counter = apps.get_model("api", "Counter")
+    last = Factory._base_manager.aggregate(Max("display_number"))["display_number__max"]
+    if last is not None:
+        Counter.objects.create(name=DISPLAY_NUMBER_COUNTER, value=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0044_image_followup_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(forward_func, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 2.2.27 on 2026-10-18 18:50
+
+from django.db import migrations, models
+
+
+def forward_func(apps, schema_editor):
+    Image = apps.get_model("api", "Image")
+    # what `reupload` used to pick
+    Image._base_manager.exclude(image_path__contains="https://i.imgur.com").update(
+        upload_status="P"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0047_image_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='upload_status',
+            field=models.CharField(choices=[('U', '已上傳'), ('P', '待上傳'), ('F', '上傳失敗')], db_index=True, default='U', max_length=1),
+        ),
+        migrations.RunPython(forward_func, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.27 on 2026-10-18 18:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0048_image_upload_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='medium_path',
+            field=models.URLField(blank=True, max_length=256, null=True),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='thumbnail_path',
+            field=models.URLField(blank=True, max_length=256, null=True),
+        ),
+    ]
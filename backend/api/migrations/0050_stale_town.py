@@ -0,0 +1,43 @@
+# Generated by Django 2.2.27 on 2026-10-18 19:06
+
+from django.db import migrations, models
+
+
+def forward_func(apps, schema_editor):
+    # recounts the towns marked by the writes, see api/statistics.py
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.update_or_create(
+        func="api.tasks.update_stale_town_statistics",
+        defaults={"name": "update stale town statistics", "schedule_type": "I", "minutes": 1},
+    )
+
+
+def backward_func(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(func="api.tasks.update_stale_town_statistics").delete()
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0049_image_variants'),
+        ('django_q', '0009_auto_20171009_0915'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaleTown',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(blank=True, max_length=50)),
+                ('town', models.CharField(blank=True, max_length=50)),
+                ('version', models.IntegerField(default=1)),
+            ],
+            options={
+                'unique_together': {('city', 'town')},
+            },
+        ),
+        migrations.RunPython(
+            code=forward_func,
+            reverse_code=backward_func,
+        ),
+    ]
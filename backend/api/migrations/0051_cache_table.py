@@ -0,0 +1,18 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+def forward_func(apps, schema_editor):
+    # the table of the database cache, nothing for the other backends
+    call_command("createcachetable", database=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0050_stale_town'),
+    ]
+
+    operations = [
+        migrations.RunPython(forward_func, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.27 on 2026-10-18 20:05
+
+from django.db import migrations, models
+
+
+def forward_func(apps, schema_editor):
+    # keeps the exported vector tiles up to date, see api/tiles.py
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.update_or_create(
+        func="api.tasks.export_vector_tiles",
+        defaults={"name": "export changed vector tiles", "schedule_type": "I", "minutes": 10},
+    )
+
+
+def backward_func(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(func="api.tasks.export_vector_tiles").delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0051_cache_table'),
+        ('django_q', '0009_auto_20171009_0915'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VacatedPosition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lat', models.FloatField()),
+                ('lng', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.RunPython(
+            code=forward_func,
+            reverse_code=backward_func,
+        ),
+    ]
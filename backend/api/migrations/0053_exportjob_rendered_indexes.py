@@ -0,0 +1,23 @@
+# Generated by Django 2.2.27 on 2026-10-18 21:40
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0052_vacated_position'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='exportjob',
+            name='rendered',
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='rendered_indexes',
+            field=django.contrib.postgres.fields.jsonb.JSONField(default=list),
+        ),
+    ]
@@ -4,3 +4,8 @@ from .image import Image
 from .document import Document, DocumentDisplayStatusEnum, FollowUp
 from .review import Review
 from .gov_agency import GovAgency
+from .factory_summary import refresh_factory_summary
+from .town_statistics import TownStatistics, StaleTown
+from .counter import Counter, allocate_display_numbers, allocate_document_codes
+from .export_job import ExportJob
+from .vacated_position import VacatedPosition
@@ -21,3 +21,9 @@ class DocumentDisplayStatusConst:
                    WAITING_FOR_NEW_EVIDENCE]
 
     STATUS_LIST_ENRICHMENT = STATUS_LIST + [IN_PROGRESS]
+
+
+class DocumentDisplayStatusEnum:
+
+    CHOICES = list(enumerate(DocumentDisplayStatusConst.STATUS_LIST))
+    INDICES = {val: idx for idx, val in CHOICES}
@@ -0,0 +1,83 @@
+import datetime
+
+from django.db import connection, models, transaction
+from django.db.models import Max
+
+from .factory import Factory
+from .document import Document
+
+DISPLAY_NUMBER_COUNTER = "factory_display_number"
+DOCUMENT_CODE_SERIAL_DIGITS = 4
+
+
+class Counter(models.Model):
+    """Last number handed out by a named counter, see `allocate_numbers`."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+def _increment(cursor, table, name, count):
+    cursor.execute(
+        f"UPDATE {table} SET value = value + %s WHERE name = %s RETURNING value",
+        [count, name],
+    )
+    row = cursor.fetchone()
+    return None if row is None else row[0]
+
+
+def allocate_numbers(name, count=1, get_last=lambda: 0):
+    """Take the next `count` numbers of a counter, as a range.
+
+    The row of the counter stays locked until the surrounding transaction
+    ends, so concurrent allocations wait for each other instead of taking the
+    same numbers, and a rolled back transaction gives its numbers back.
+    Allocate inside the transaction saving the rows which use the numbers,
+    and as late as possible in it. A counter is created on first use, counting
+    from `get_last()`.
+    """
+    table = Counter._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        value = _increment(cursor, table, name, count)
+        if value is None:
+            cursor.execute(
+                f"INSERT INTO {table} (name, value) VALUES (%s, %s) ON CONFLICT (name) DO NOTHING",
+                [name, get_last()],
+            )
+            value = _increment(cursor, table, name, count)
+    return range(value - count + 1, value + 1)
+
+
+def _get_last_display_number():
+    return Factory.raw_objects.aggregate(Max("display_number"))["display_number__max"] or 0
+
+
+def allocate_display_numbers(count=1):
+    """Take the next `count` factory display numbers, see `allocate_numbers`."""
+    return allocate_numbers(DISPLAY_NUMBER_COUNTER, count, _get_last_display_number)
+
+
+def _document_code_counter(taiwan_year):
+    return f"document_code:{taiwan_year}"
+
+
+def allocate_document_codes(count=1):
+    """Take a block of `count` consecutive document codes, see `allocate_numbers`.
+
+    Codes are formatted YYYXXXX: YYY is the taiwan year, XXXX a serial
+    number restarting every year, so each year has its own counter.
+    """
+    taiwan_year = datetime.date.today().year - 1911
+    first_code = taiwan_year * (10 ** DOCUMENT_CODE_SERIAL_DIGITS)
+
+    def get_last():
+        last = Document.raw_objects.filter(
+            code__gte=first_code,
+            code__lt=first_code + 10 ** DOCUMENT_CODE_SERIAL_DIGITS,
+        ).aggregate(Max("code"))["code__max"]
+        return last or first_code
+
+    return allocate_numbers(_document_code_counter(taiwan_year), count, get_last)
@@ -4,13 +4,7 @@ from .mixins import SoftDeleteMixin
 from .factory import Factory
 
 from users.models import CustomUser
-from .const import DocumentDisplayStatusConst
-
-
-class DocumentDisplayStatusEnum:
-
-    CHOICES = list(enumerate(DocumentDisplayStatusConst.STATUS_LIST))
-    INDICES = {val: idx for idx, val in CHOICES}
+from .const import DocumentDisplayStatusConst, DocumentDisplayStatusEnum
 
 
 class CETReportStatus(models.Model):
@@ -66,6 +60,7 @@ class Document(SoftDeleteMixin):
     )
 
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     display_status = models.IntegerField(
         default=DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.REPORTED],
         choices=DocumentDisplayStatusEnum.CHOICES,
@@ -93,6 +88,7 @@ class FollowUp(SoftDeleteMixin):
     )
     note = models.TextField(help_text="此次進度追蹤備註")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     for_user = models.BooleanField(default=False)
 
     def __unicode__(self):
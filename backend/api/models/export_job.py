@@ -0,0 +1,68 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.fields import JSONField
+from django.utils import timezone
+
+CustomUser = get_user_model()
+
+
+class ExportJob(models.Model):
+    """A docx of documents built in the background, see `api.tasks.export_docx`.
+
+    Every document is rendered by its own task, the last one to finish
+    enqueues the task composing them into `file_path`, relative to MEDIA_ROOT.
+    The indexes of the rendered documents are kept rather than a count, so a
+    task delivered twice counts once.
+    """
+
+    PENDING = "P"
+    RUNNING = "R"
+    DONE = "D"
+    FAILED = "F"
+    status_list = [
+        (PENDING, "等待中"),
+        (RUNNING, "產生中"),
+        (DONE, "完成"),
+        (FAILED, "失敗"),
+    ]
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False,
+        verbose_name="ID",
+    )
+    creator = models.ForeignKey(
+        CustomUser,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="export_jobs",
+    )
+    document_ids = JSONField()  # in the order of the docx
+    status = models.CharField(max_length=1, choices=status_list, default=PENDING)
+    rendered_indexes = JSONField(default=list)
+    file_path = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def total(self):
+        return len(self.document_ids)
+
+    @property
+    def rendered(self):
+        return len(self.rendered_indexes)
+
+    @property
+    def is_stale(self):
+        """Whether the job stopped making progress, e.g. a task was killed by the timeout."""
+        return self.status in (self.PENDING, self.RUNNING) and (
+            self.updated_at < timezone.now() - timedelta(seconds=settings.DOCX_EXPORT_STALE_AFTER)
+        )
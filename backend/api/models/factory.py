@@ -4,6 +4,7 @@ from django.db import models
 from django.contrib.auth import get_user_model
 
 from .mixins import SoftDeleteMixin
+from .const import DocumentDisplayStatusEnum
 
 CustomUser = get_user_model()
 
@@ -137,6 +138,32 @@ class Factory(SoftDeleteMixin):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Summary of the related report records, images and documents, kept up to
+    # date by `refresh_factory_summary` so listing factories doesn't need to
+    # load them.
+    latest_report_at = models.DateTimeField(null=True, blank=True, editable=False)
+    image_count = models.IntegerField(default=0, editable=False)
+    latest_document = models.ForeignKey(
+        to="Document",
+        on_delete=models.SET_NULL,
+        related_name="+",
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    latest_document_display_status = models.IntegerField(
+        choices=DocumentDisplayStatusEnum.CHOICES,
+        blank=True,
+        null=True,
+        editable=False,
+    )
+
+    class Meta:
+        indexes = [
+            # bounding-box prefilter of `_get_nearby_factories`
+            models.Index(fields=["lat", "lng"], name="api_factory_lat_lng_idx"),
+        ]
+
 
 class RecycledFactory(Factory):
     class Meta:
@@ -0,0 +1,44 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .factory import Factory
+from .report_record import ReportRecord
+from .image import Image
+from .document import Document
+
+
+def refresh_factory_summary_with_custom_models(
+    factories, report_record_model, image_model, document_model
+):
+    """Recompute the summary columns of `factories` with a single UPDATE.
+
+    The models are passed in so migrations can call it with their historical
+    models, which only have the plain manager, hence the explicit
+    `deleted_at` filters.
+    """
+
+    def alive(model):
+        return model._base_manager.filter(factory=OuterRef("pk"), deleted_at__isnull=True)
+
+    latest_report_records = alive(report_record_model).order_by("-created_at")
+    image_counts = (
+        alive(image_model).order_by().values("factory").annotate(count=Count("pk")).values("count")
+    )
+    latest_documents = alive(document_model).order_by("-created_at", "-pk")
+
+    factories.update(
+        latest_report_at=Subquery(latest_report_records.values("created_at")[:1]),
+        image_count=Coalesce(
+            Subquery(image_counts, output_field=IntegerField()), Value(0)
+        ),
+        latest_document=Subquery(latest_documents.values("pk")[:1]),
+        latest_document_display_status=Subquery(latest_documents.values("display_status")[:1]),
+    )
+
+
+def refresh_factory_summary(factory_ids=None):
+    """Recompute the summary columns of the given factories, or of every factory."""
+    factories = Factory.raw_objects.all()
+    if factory_ids is not None:
+        factories = factories.filter(pk__in=factory_ids)
+    refresh_factory_summary_with_custom_models(factories, ReportRecord, Image, Document)
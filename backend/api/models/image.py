@@ -10,6 +10,15 @@ from .report_record import ReportRecord
 class Image(SoftDeleteMixin):
     """Images of factories that are uploaded by user."""
 
+    UPLOADED = "U"
+    PENDING = "P"
+    FAILED = "F"
+    upload_status_list = [
+        (UPLOADED, "已上傳"),
+        (PENDING, "待上傳"),
+        (FAILED, "上傳失敗"),
+    ]
+
     id = models.UUIDField(
         primary_key=True,
         default=uuid.uuid4,
@@ -30,9 +39,19 @@ class Image(SoftDeleteMixin):
         null=True,
     )
     image_path = models.URLField(max_length=256)  # get from Imgur
+    # downscaled copies made by `api.image_variants`, empty until they are
+    thumbnail_path = models.URLField(max_length=256, blank=True, null=True)
+    medium_path = models.URLField(max_length=256, blank=True, null=True)
     deletehash = models.TextField(help_text="delete hash", blank=True, null=True)
+    # sha256 of the content uploaded by `api.image_upload`, shared by its copies
+    content_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    # whether image_path is in the upload backend, or still kept in MEDIA_ROOT
+    upload_status = models.CharField(
+        max_length=1, choices=upload_status_list, default=UPLOADED, db_index=True
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     # the DB saving time
+    updated_at = models.DateTimeField(auto_now=True)
 
     orig_time = models.DateTimeField(blank=True, null=True)
     orig_lat = models.FloatField(blank=True, null=True)
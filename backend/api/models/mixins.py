@@ -1,16 +1,31 @@
 from django.db import models
 from django.db.models import query
+from django.dispatch import Signal
 from django.utils import timezone
 
+# Sent with the `pks` of the rows the queryset `delete()` or `undelete()`
+# changed, as `update()` sends no model signal.
+bulk_deleted_at_changed = Signal()
+
+
+def _update_deleted_at(queryset, deleted_at):
+    fields = {"deleted_at": deleted_at}
+    # like `save()` does, the incremental vector tile export goes by it
+    if any(field.name == "updated_at" for field in queryset.model._meta.fields):
+        fields["updated_at"] = timezone.now()
+    pks = list(queryset.values_list("pk", flat=True))
+    queryset.model._base_manager.filter(pk__in=pks).update(**fields)
+    bulk_deleted_at_changed.send(sender=queryset.model, pks=pks)
+
 
 class SoftDeleteQuerySet(query.QuerySet):
     def delete(self):
-        self.update(deleted_at=timezone.now())
+        _update_deleted_at(self, timezone.now())
 
 
 class RecycleBinQuerySet(query.QuerySet):
     def undelete(self):
-        self.update(deleted_at=None)
+        _update_deleted_at(self, None)
 
 
 class SoftDeleteManager(models.Manager):
@@ -0,0 +1,115 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import connection, transaction
+from django.test import Client
+from freezegun import freeze_time
+
+from ..counter import (
+    Counter,
+    DISPLAY_NUMBER_COUNTER,
+    allocate_numbers,
+    allocate_display_numbers,
+    allocate_document_codes,
+)
+from ..factory import Factory
+from ..document import Document
+
+
+def _create_factory(display_number):
+    return Factory.objects.create(
+        name="test factory",
+        lat=23.234,
+        lng=120.1,
+        display_number=display_number,
+    )
+
+
+@pytest.mark.django_db
+def test_allocate_numbers():
+    assert allocate_numbers("test", get_last=lambda: 41) == range(42, 43)
+    assert allocate_numbers("test", 3, get_last=lambda: 0) == range(43, 46)
+    assert Counter.objects.get(name="test").value == 45
+
+
+@pytest.mark.django_db
+def test_rolled_back_numbers_are_reused():
+    try:
+        with transaction.atomic():
+            display_number = allocate_display_numbers()[0]
+            _create_factory(display_number)
+            raise ValueError()
+    except ValueError:
+        pass
+
+    assert allocate_display_numbers()[0] == display_number
+    assert Counter.objects.get(name=DISPLAY_NUMBER_COUNTER).value == display_number
+
+
+@pytest.mark.django_db
+def test_display_number_counter_starts_from_existing_factories():
+    Counter.objects.filter(name=DISPLAY_NUMBER_COUNTER).delete()
+    _create_factory(666)
+
+    assert allocate_display_numbers(2) == range(667, 669)
+
+
+@pytest.mark.django_db
+def test_document_codes_restart_every_year():
+    factory = _create_factory(666)
+    Document.objects.create(factory=factory, code=1090041)
+
+    with freeze_time("2020-12-31"):
+        assert allocate_document_codes(2) == range(1090042, 1090044)
+    with freeze_time("2021-01-01"):
+        assert allocate_document_codes() == range(1100001, 1100002)
+    with freeze_time("2020-12-31"):
+        assert allocate_document_codes() == range(1090044, 1090045)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_allocate_document_codes_concurrently():
+
+    def allocate(count):
+        try:
+            with transaction.atomic():
+                return list(allocate_document_codes(count))
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        blocks = list(executor.map(allocate, [3] * 20))
+
+    codes = sorted(code for block in blocks for code in block)
+    assert codes == list(range(codes[0], codes[0] + 60))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_create_factories_concurrently():
+    existing = set(Factory.raw_objects.values_list("display_number", flat=True))
+
+    def create_factory(idx):
+        try:
+            return Client().post(
+                "/api/factories",
+                data={
+                    "name": f"factory {idx}",
+                    "type": "2-3",
+                    "images": [],
+                    "lat": 23.234,
+                    "lng": 120.1,
+                },
+                content_type="application/json",
+            ).status_code
+        finally:
+            connection.close()
+
+    n = 20
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        status_codes = list(executor.map(create_factory, range(n)))
+
+    assert status_codes == [200] * n
+    display_numbers = sorted(
+        set(Factory.raw_objects.values_list("display_number", flat=True)) - existing
+    )
+    assert display_numbers == list(range(display_numbers[0], display_numbers[0] + n))
@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from freezegun import freeze_time
+
+from ..factory import Factory
+from ..report_record import ReportRecord
+from ..image import Image
+from ..document import Document, DocumentDisplayStatusEnum
+from ..factory_summary import refresh_factory_summary
+from ..const import DocumentDisplayStatusConst
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def factory():
+    return Factory.objects.create(
+        name="test factory",
+        lat=23,
+        lng=121,
+        display_number=666,
+    )
+
+
+def test_summary_follows_report_records_and_images(factory):
+    report_time = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    with freeze_time(report_time):
+        report_record = ReportRecord.objects.create(
+            factory=factory,
+            action_type="POST",
+            action_body={},
+        )
+    image = Image.objects.create(
+        image_path="https://i.imgur.com/RxArJUc.png",
+        factory=factory,
+        report_record=report_record,
+    )
+    Image.objects.create(image_path="https://i.imgur.com/RxArJUc.png", factory=factory)
+
+    factory.refresh_from_db()
+    assert factory.latest_report_at == report_time
+    assert factory.image_count == 2
+
+    image.delete()
+    report_record.delete()
+
+    factory.refresh_from_db()
+    assert factory.latest_report_at is None
+    assert factory.image_count == 1
+
+
+def test_summary_follows_latest_document(factory):
+    Document.objects.create(factory=factory, code=1090001)
+    latest_document = Document.objects.create(
+        factory=factory,
+        code=1090002,
+        display_status=DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.DEMOLISHED],
+    )
+
+    factory.refresh_from_db()
+    assert factory.latest_document_id == latest_document.id
+    assert factory.get_latest_document_display_status_display() == DocumentDisplayStatusConst.DEMOLISHED
+
+    latest_document.display_status = DocumentDisplayStatusEnum.INDICES[
+        DocumentDisplayStatusConst.WORK_STOPPED
+    ]
+    latest_document.save()
+
+    factory.refresh_from_db()
+    assert factory.get_latest_document_display_status_display() == DocumentDisplayStatusConst.WORK_STOPPED
+
+
+def test_refresh_factory_summary_after_bulk_writes(factory):
+    report_time = datetime.now(timezone.utc) - timedelta(days=1)
+    with freeze_time(report_time):
+        report_record = ReportRecord.objects.bulk_create([
+            ReportRecord(factory=factory, action_type="POST", action_body={}),
+        ])[0]
+    Image.objects.bulk_create([
+        Image(image_path="https://i.imgur.com/RxArJUc.png", factory=factory, report_record=report_record),
+    ])
+
+    factory.refresh_from_db()
+    assert factory.image_count == 0
+
+    refresh_factory_summary([factory.id])
+
+    factory.refresh_from_db()
+    assert factory.latest_report_at == report_time
+    assert factory.image_count == 1
+
+
+def test_summary_follows_moves_to_another_factory(factory):
+    other_factory = Factory.objects.create(name="other factory", lat=23, lng=121, display_number=667)
+    image = Image.objects.create(image_path="https://i.imgur.com/RxArJUc.png", factory=factory)
+    document = Document.objects.create(factory=factory, code=1090001)
+
+    image.factory = other_factory
+    image.save()
+    document.factory = other_factory
+    document.save()
+
+    factory.refresh_from_db()
+    assert factory.image_count == 0
+    assert factory.latest_document_id is None
+    other_factory.refresh_from_db()
+    assert other_factory.image_count == 1
+    assert other_factory.latest_document_id == document.id
+
+
+def test_summary_follows_bulk_deletes_and_restores(factory):
+    image = Image.objects.create(image_path="https://i.imgur.com/RxArJUc.png", factory=factory)
+    document = Document.objects.create(factory=factory, code=1090001)
+
+    # what the admin delete and restore actions run
+    Image.objects.filter(pk=image.pk).delete()
+    Document.objects.filter(pk=document.pk).delete()
+    factory.refresh_from_db()
+    assert factory.image_count == 0
+    assert factory.latest_document_id is None
+
+    Image.recycle_objects.filter(pk=image.pk).undelete()
+    Document.recycle_objects.filter(pk=document.pk).undelete()
+    factory.refresh_from_db()
+    assert factory.image_count == 1
+    assert factory.latest_document_id == document.id
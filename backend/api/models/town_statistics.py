@@ -0,0 +1,56 @@
+from django.db import models
+
+from .factory import Factory
+from .const import DocumentDisplayStatusConst
+
+
+class TownStatistics(models.Model):
+    """Counts of the factories in a town, rolled up for `/api/statistics/*`.
+
+    One row per (city, town, source, display_status). The rows with a null
+    display_status count every factory, the others count the factories having
+    a document in that display_status, so a factory may be counted in several
+    of them. Factories without a townname are counted under an empty city and
+    town. Maintained by `api.statistics`.
+    """
+
+    # the document display statuses, plus IN_PROGRESS which groups some of them
+    DISPLAY_STATUS_CHOICES = list(enumerate(DocumentDisplayStatusConst.STATUS_LIST_ENRICHMENT))
+    DISPLAY_STATUS_INDICES = {val: idx for idx, val in DISPLAY_STATUS_CHOICES}
+
+    city = models.CharField(max_length=50, blank=True)
+    town = models.CharField(max_length=50, blank=True)
+    source = models.CharField(max_length=1, choices=Factory.source_list)
+    display_status = models.IntegerField(
+        choices=DISPLAY_STATUS_CHOICES,
+        blank=True,
+        null=True,
+    )
+
+    factories = models.IntegerField(default=0)
+    documents = models.IntegerField(default=0)
+    report_records = models.IntegerField(default=0)
+    images = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["city", "town"], name="api_townstatistics_town_idx"),
+        ]
+
+
+class StaleTown(models.Model):
+    """A town whose `TownStatistics` rows wait for a recount.
+
+    Writes mark their towns instead of recounting them, see
+    `api.statistics.mark_towns_stale`. Every mark bumps `version`, so a
+    recount only clears the marks it has seen.
+    """
+
+    city = models.CharField(max_length=50, blank=True)
+    town = models.CharField(max_length=50, blank=True)
+    version = models.IntegerField(default=1)
+
+    class Meta:
+        unique_together = [("city", "town")]
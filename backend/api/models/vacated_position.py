@@ -0,0 +1,13 @@
+from django.db import models
+
+
+class VacatedPosition(models.Model):
+    """A position a factory moved away from, or was deleted at.
+
+    The vector tiles exported before still draw the factory there, so the
+    incremental export renders them again, see `api.tiles`.
+    """
+
+    lat = models.FloatField()
+    lng = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
@@ -0,0 +1,97 @@
+"""Minimal Mapbox Vector Tile (v2) encoder for point layers.
+
+Only the subset of https://github.com/mapbox/vector-tile-spec needed to
+publish factory locations is implemented: point features with string,
+integer and boolean properties. It writes the protobuf wire format by hand
+so the project does not need a protobuf runtime.
+"""
+
+EXTENT = 4096
+
+_POINT = 1
+_MOVE_TO = 1
+
+_VARINT = 0
+_LENGTH_DELIMITED = 2
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _key(field, wire_type):
+    return _varint((field << 3) | wire_type)
+
+
+def _varint_field(field, value):
+    return _key(field, _VARINT) + _varint(value)
+
+
+def _bytes_field(field, value):
+    return _key(field, _LENGTH_DELIMITED) + _varint(len(value)) + value
+
+
+def _packed_field(field, values):
+    return _bytes_field(field, b"".join(_varint(value) for value in values))
+
+
+def _encode_value(value):
+    if isinstance(value, bool):
+        return _varint_field(7, int(value))
+    if isinstance(value, int):
+        # sint_value, so negative numbers stay small
+        return _varint_field(6, _zigzag(value))
+    return _bytes_field(1, str(value).encode("utf8"))
+
+
+def encode_point_layer(name, features, extent=EXTENT):
+    """Encode a tile with a single layer of point features.
+
+    `features` is an iterable of (feature_id, (x, y), properties) in tile
+    pixel coordinates. Properties whose value is None are left out.
+    """
+    keys, key_indices = [], {}
+    values, value_indices = [], {}
+
+    encoded_features = []
+    for feature_id, (x, y), properties in features:
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            if key not in key_indices:
+                key_indices[key] = len(keys)
+                keys.append(key)
+            value_key = (type(value), value)
+            if value_key not in value_indices:
+                value_indices[value_key] = len(values)
+                values.append(value)
+            tags.extend([key_indices[key], value_indices[value_key]])
+
+        feature = b""
+        if feature_id is not None:
+            feature += _varint_field(1, feature_id)
+        feature += _packed_field(2, tags)
+        feature += _varint_field(3, _POINT)
+        feature += _packed_field(4, [(1 << 3) | _MOVE_TO, _zigzag(x), _zigzag(y)])
+        encoded_features.append(_bytes_field(2, feature))
+
+    layer = _varint_field(15, 2) + _bytes_field(1, name.encode("utf8"))
+    layer += b"".join(encoded_features)
+    layer += b"".join(_bytes_field(3, key.encode("utf8")) for key in keys)
+    layer += b"".join(_bytes_field(4, _encode_value(value)) for value in values)
+    layer += _varint_field(5, extent)
+
+    return _bytes_field(3, layer)
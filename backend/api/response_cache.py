@@ -0,0 +1,154 @@
+"""Caching of read endpoint responses, invalidated by writes.
+
+A cached response is stored under a key made of the request path and query
+and of the current version of every scope it depends on: a factory, a
+region (city) or everything. A write bumps the versions of the scopes it
+touches, so the entries built on them are never read again and expire on
+their own. Responses carry an ETag and Last-Modified, and conditional
+requests are answered with 304.
+
+The cache has to be shared by all the processes, the web workers and the
+django-q cluster, for their writes to reach each other, like the default
+database cache, see `CACHES` in the settings.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .statistics import split_townname
+from .utils import normalize_townname
+
+GLOBAL_SCOPE = "global"
+
+
+def factory_scope(factory_id):
+    return f"factory:{factory_id}"
+
+
+def region_scope(townname):
+    city, _ = split_townname(townname)
+    return f"region:{city}"
+
+
+def get_factory_scopes(request, factory_id):
+    return [factory_scope(factory_id)]
+
+
+def get_global_scopes(request):
+    return [GLOBAL_SCOPE]
+
+
+def get_townname_scopes(request):
+    """Responses for a `townname` only change with its region, the others with everything."""
+    townname = request.GET.get("townname")
+    if townname:
+        return [region_scope(normalize_townname(townname))]
+    return [GLOBAL_SCOPE]
+
+
+def _version_key(scope):
+    return f"response_version:{scope}"
+
+
+def _get_versions(scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        # a lost version must not fall back to one used before, hence the clock
+        for key, version in missing.items():
+            cache.add(key, version, timeout=None)
+        versions.update(cache.get_many(list(missing)))
+    return [versions.get(key, 0) for key in keys]
+
+
+def versioned_key(key, scopes):
+    """`key` for the current versions of `scopes`, for caches kept outside the views."""
+    return f"{key}:{'.'.join(str(version) for version in _get_versions(scopes))}"
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def _bump_versions(scopes):
+    for scope in scopes:
+        key = _version_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _new_version(), timeout=None)
+
+
+def invalidate_responses(factory_ids=(), townnames=()):
+    """Drop the cached responses of the given factories, of their regions and the global ones.
+
+    The versions are bumped right away and once more after the transaction
+    commits, so a response cached from data read in between doesn't survive.
+    """
+    scopes = {GLOBAL_SCOPE}
+    scopes.update(factory_scope(factory_id) for factory_id in factory_ids)
+    scopes.update(region_scope(townname) for townname in townnames)
+
+    _bump_versions(scopes)
+    transaction.on_commit(lambda: _bump_versions(scopes))
+
+
+def _response_key(request, scopes):
+    url = hashlib.md5(request.get_full_path().encode("utf8")).hexdigest()
+    return versioned_key(f"response:{url}", scopes)
+
+
+def cache_response(get_scopes, conditional=True):
+    """Cache the successful GET responses of a view.
+
+    `get_scopes(request, *args, **kwargs)` returns the scopes the response
+    depends on, see `invalidate_responses`. Views answering conditional
+    requests on their own, e.g. with `condition`, pass `conditional=False`
+    so the cache doesn't add a second ETag of its own.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "GET":
+                return view(request, *args, **kwargs)
+
+            key = _response_key(request, get_scopes(request, *args, **kwargs))
+            cached = cache.get(key)
+            if cached is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming:
+                    return response
+                cached = {
+                    "content": response.content,
+                    "content_type": response["Content-Type"],
+                    "etag": quote_etag(hashlib.md5(response.content).hexdigest()),
+                    "last_modified": int(time.time()),
+                }
+                cache.set(key, cached, settings.RESPONSE_CACHE_TIMEOUT)
+
+            response = None
+            if conditional:
+                response = get_conditional_response(
+                    request, etag=cached["etag"], last_modified=cached["last_modified"]
+                )
+            if response is None:
+                response = HttpResponse(cached["content"], content_type=cached["content_type"])
+            if conditional:
+                response["ETag"] = cached["etag"]
+                response["Last-Modified"] = http_date(cached["last_modified"])
+            # let clients and proxies keep it, but always revalidate
+            patch_cache_control(response, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -15,20 +15,22 @@ from .models import Factory, Image, ReportRecord, FollowUp
 VALID_FACTORY_TYPES = [t[0] for t in Factory.factory_type_list]
 
 
-def _get_latest_time_or_none(objs):
-    return max(
-        (obj.created_at for obj in objs),
-        default=None,
-    )
-
-
 class ImageSerializer(ModelSerializer):
 
     url = CharField(source="image_path")
+    # the original until the copies are made
+    thumbnail_url = SerializerMethodField()
+    medium_url = SerializerMethodField()
 
     class Meta:
         model = Image
-        fields = ["id", "image_path", "url"]
+        fields = ["id", "image_path", "url", "thumbnail_url", "medium_url"]
+
+    def get_thumbnail_url(self, obj):
+        return obj.thumbnail_path or obj.image_path
+
+    def get_medium_url(self, obj):
+        return obj.medium_path or obj.image_path
 
 
 class FactoryLocationSerializer(ModelSerializer):
@@ -87,14 +89,13 @@ class FactorySerializer(ModelSerializer):
         return obj.cet_report_status
 
     def get_reported_at(self, obj):
-        report_records = obj.report_records.all()
-        return _get_latest_time_or_none(report_records)
+        return obj.latest_report_at
 
     def get_data_complete(self, obj):
         # has_photo and reported_within_1_year and (not before_release or has_type)
-        if len(obj.images.all()) == 0:
+        if obj.image_count == 0:
             return False  # no photo
-        latest_record_time = _get_latest_time_or_none(obj.report_records.all())
+        latest_record_time = obj.latest_report_at
         if not (latest_record_time and latest_record_time > timezone.now() - timedelta(days=365)):
             return False  # not reported or outdated
 
@@ -104,17 +105,19 @@ class FactorySerializer(ModelSerializer):
             return True
 
     def get_document_display_status(self, obj):
-        documents = obj.documents.all()
-        if len(documents) > 0:
-            latest_document = max(documents, key=lambda d: d.created_at)
-            return latest_document.get_display_status_display()
-        return None
+        if obj.latest_document_display_status is None:
+            return None
+        return obj.get_latest_document_display_status_display()
 
     def get_follow_ups_for_user(self, obj):
         follow_up_query_set = []
         for document in obj.documents.all():
-            follow_up_query_set.extend(
-                document.follow_ups.filter(for_user=True))
+            if hasattr(document, "follow_ups_for_user"):
+                # prefetched by `_prefetch_factory_relations`
+                follow_up_query_set.extend(document.follow_ups_for_user)
+            else:
+                follow_up_query_set.extend(
+                    document.follow_ups.filter(for_user=True).order_by("created_at"))
 
         note_list = list(map(lambda item: {
             "note": item.note,
@@ -129,6 +132,7 @@ class FactorySerializer(ModelSerializer):
                 f"latitude should be within {settings.TAIWAN_MIN_LATITUDE} "
                 f"~ {settings.TAIWAN_MAX_LATITUDE}, but got {value}"
             )
+        return value
 
     def validate_lng(self, value):
         if not (settings.TAIWAN_MIN_LONGITUDE <= value <= settings.TAIWAN_MAX_LONGITUDE):
@@ -136,6 +140,7 @@ class FactorySerializer(ModelSerializer):
                 f"longitude should be within {settings.TAIWAN_MIN_LONGITUDE} "
                 f"~ {settings.TAIWAN_MAX_LONGITUDE}, but got {value}"
             )
+        return value
 
     def validate_type(self, value):
         if (value is not None) and (value not in VALID_FACTORY_TYPES):
@@ -143,6 +148,7 @@ class FactorySerializer(ModelSerializer):
             raise ValidationError(
                 f'Factory Type "{value}" is not one of the permitted values: {valid_type_msg}',
             )
+        return value
 
 
 class ReportRecordSerializer(ModelSerializer):
@@ -0,0 +1,106 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import (
+    Factory,
+    ReportRecord,
+    VacatedPosition,
+    Image,
+    Document,
+    FollowUp,
+    refresh_factory_summary,
+)
+from .models.mixins import bulk_deleted_at_changed
+from .response_cache import invalidate_responses
+from .statistics import mark_towns_stale
+
+
+# Covers the proxy models of the admin recycle bin as well, which send the
+# signals with their own class as the sender.
+_SUMMARY_SOURCES = (ReportRecord, Image, Document)
+
+
+def _previous_values(instance, *fields):
+    """The `fields` stored before the write of `instance`, empty for a new one."""
+    if instance._state.adding:
+        return {}
+    return type(instance)._base_manager.filter(pk=instance.pk).values(*fields).first() or {}
+
+
+def _factories_changed(factory_ids):
+    townnames = list(
+        Factory.raw_objects.filter(pk__in=factory_ids).values_list("townname", flat=True)
+    )
+    mark_towns_stale(townnames)
+    invalidate_responses(factory_ids, townnames)
+
+
+@receiver(pre_save)
+def remember_previous_values(sender, instance, **kwargs):
+    # a report record, image or document moved to another factory, or a
+    # factory moved to another town or position, leaves the previous one
+    # stale as well
+    if isinstance(instance, _SUMMARY_SOURCES):
+        instance._previous = _previous_values(instance, "factory_id")
+    elif isinstance(instance, Factory):
+        instance._previous = _previous_values(instance, "townname", "lat", "lng")
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def update_factory_summary(sender, instance, created=False, **kwargs):
+    """Keep the summaries of factories in step with any ORM write of them or their relations.
+
+    That is the summary columns of Factory, the cached responses, and the
+    marks of the towns whose statistics need a recount. Queryset `update()`
+    and `bulk_create()` don't send signals, so callers that use them have to
+    refresh on their own.
+    """
+    previous = getattr(instance, "_previous", {})
+    if isinstance(instance, _SUMMARY_SOURCES):
+        factory_ids = {instance.factory_id, previous.get("factory_id")}
+        factory_ids.discard(None)
+        if not factory_ids:
+            return
+        refresh_factory_summary(factory_ids)
+        _factories_changed(factory_ids)
+    elif isinstance(instance, Factory):
+        if not created:
+            # `save()` writes back whatever summary the instance was loaded with
+            refresh_factory_summary([instance.pk])
+        townnames = {instance.townname}
+        if "townname" in previous:
+            townnames.add(previous["townname"])
+        mark_towns_stale(townnames)
+        invalidate_responses([instance.pk], townnames)
+        # the exported vector tiles still draw it there
+        position = (previous.get("lat", instance.lat), previous.get("lng", instance.lng))
+        if kwargs.get("signal") is post_delete:
+            VacatedPosition.objects.create(lat=instance.lat, lng=instance.lng)
+        elif position != (instance.lat, instance.lng):
+            VacatedPosition.objects.create(lat=position[0], lng=position[1])
+    elif isinstance(instance, FollowUp):
+        # follow-ups for users are part of the factory detail
+        factory_ids = Document.raw_objects.filter(pk=instance.document_id).values_list(
+            "factory_id", flat=True
+        )
+        invalidate_responses([factory_id for factory_id in factory_ids if factory_id])
+
+
+@receiver(bulk_deleted_at_changed)
+def update_factory_summaries_in_bulk(sender, pks, **kwargs):
+    """The same upkeep for the queryset `delete()` and `undelete()` of the admin actions."""
+    if issubclass(sender, _SUMMARY_SOURCES):
+        factory_ids = set(
+            sender._base_manager.filter(pk__in=pks).values_list("factory_id", flat=True)
+        )
+        factory_ids.discard(None)
+        refresh_factory_summary(factory_ids)
+        _factories_changed(factory_ids)
+    elif issubclass(sender, Factory):
+        _factories_changed(pks)
+    elif issubclass(sender, FollowUp):
+        factory_ids = Document.raw_objects.filter(
+            follow_ups__in=pks
+        ).values_list("factory_id", flat=True)
+        invalidate_responses([factory_id for factory_id in factory_ids if factory_id])
@@ -0,0 +1,292 @@
+"""Rollup of factory, document, report record and image counts per town.
+
+`/api/statistics/*` reads `TownStatistics` instead of counting the base
+tables for every city and town of a request. Writes only mark their towns
+stale (see `api.signals`), a django-q schedule recounts the marked towns
+every minute, and another one recomputes all of them periodically to catch
+writes that bypass the ORM signals. Recounting in the writes themselves
+would serialize them behind a count of the whole town.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Case, CharField, Count, Q, Value, When
+from django.db.models.functions import Coalesce, Substr
+
+from .models import (
+    Factory,
+    ReportRecord,
+    Document,
+    DocumentDisplayStatusEnum,
+    StaleTown,
+    TownStatistics,
+)
+from .models.const import DocumentDisplayStatusConst
+
+TAIWAN_PROVINCE = "臺灣省"
+CITY_NAME_LENGTH = 3
+
+_COUNT_FIELDS = ["factories", "documents", "report_records", "images"]
+# arbitrary key of the postgres advisory lock serializing the refreshes
+_REFRESH_LOCK_KEY = 4235001
+
+
+def split_townname(townname):
+    """Split a townname like (臺灣省)臺南市善化區 into its city and town."""
+    if not townname:
+        return "", ""
+    if townname.startswith(TAIWAN_PROVINCE):
+        townname = townname[len(TAIWAN_PROVINCE):]
+    return townname[:CITY_NAME_LENGTH], townname[CITY_NAME_LENGTH:]
+
+
+def _city_and_town(townname_field):
+    """Database side `split_townname`, as (city, town) expressions."""
+    townname = Case(
+        When(
+            **{f"{townname_field}__startswith": TAIWAN_PROVINCE},
+            then=Substr(townname_field, len(TAIWAN_PROVINCE) + 1),
+        ),
+        default=Coalesce(townname_field, Value("")),
+        output_field=CharField(),
+    )
+    return (
+        Substr(townname, 1, CITY_NAME_LENGTH),
+        Substr(townname, CITY_NAME_LENGTH + 1),
+    )
+
+
+def _in_towns(towns, townname_field):
+    q = Q()
+    for city, town in towns:
+        if city:
+            q |= Q(**{f"{townname_field}__in": [f"{city}{town}", f"{TAIWAN_PROVINCE}{city}{town}"]})
+        else:
+            q |= Q(**{f"{townname_field}__isnull": True}) | Q(**{townname_field: ""})
+    return q
+
+
+IN_PROGRESS = TownStatistics.DISPLAY_STATUS_INDICES[DocumentDisplayStatusConst.IN_PROGRESS]
+IN_PROGRESS_DISPLAY_STATUSES = {
+    DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.AUDIT_SCHEDULED],
+    DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.COMMUNICATION_PERIOD],
+    DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.WORK_STOPPED],
+    DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.DEMOLITION_SCHEDULED],
+}
+
+
+def _alive(model, factory_prefix, towns):
+    rows = model._base_manager.filter(**{f"{factory_prefix}deleted_at__isnull": True})
+    if factory_prefix:
+        rows = rows.filter(deleted_at__isnull=True)
+    if towns is not None:
+        rows = rows.filter(_in_towns(towns, f"{factory_prefix}townname"))
+    return rows.order_by()
+
+
+def _count_by_town(factory_model, report_record_model, document_model, towns):
+    city, town = _city_and_town("townname")
+    factories = (
+        _alive(factory_model, "", towns)
+        .annotate(stat_city=city, stat_town=town)
+        .values_list("pk", "stat_city", "stat_town", "source", "image_count")
+    )
+    report_records = dict(
+        _alive(report_record_model, "factory__", towns)
+        .values("factory_id")
+        .annotate(n=Count("pk"))
+        .values_list("factory_id", "n")
+    )
+    documents = defaultdict(dict)
+    for factory_id, display_status, n in (
+        _alive(document_model, "factory__", towns)
+        .values("factory_id", "display_status")
+        .annotate(n=Count("pk"))
+        .values_list("factory_id", "display_status", "n")
+    ):
+        documents[factory_id][display_status] = n
+
+    counts = defaultdict(lambda: dict.fromkeys(_COUNT_FIELDS, 0))
+    for factory_id, city, town, source, n_images in factories.iterator():
+        n_documents = documents[factory_id]
+        n_report_records = report_records.get(factory_id, 0)
+
+        display_statuses = set(n_documents)
+        if display_statuses & IN_PROGRESS_DISPLAY_STATUSES:
+            display_statuses.add(IN_PROGRESS)
+        # all the factories, then the factories having a document in each status
+        for display_status in [None, *display_statuses]:
+            count = counts[(city, town, source, display_status)]
+            count["factories"] += 1
+            count["documents"] += (
+                sum(n_documents.values()) if display_status is None else 1
+            )
+            count["report_records"] += n_report_records
+            count["images"] += n_images
+
+    return counts
+
+
+def _lock_refreshes():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", [_REFRESH_LOCK_KEY])
+
+
+def refresh_town_statistics_with_custom_models(
+    statistics_model, factory_model, report_record_model, document_model, towns=None
+):
+    """Recompute the rows of the given (city, town) pairs, or of every town.
+
+    The models are passed in so migrations can call it with their historical
+    models, which is why deleted rows are filtered out explicitly. Returns
+    the (city, town) pairs whose counts changed.
+    """
+    with transaction.atomic():
+        # count and write under the lock, so a refresh never overwrites a
+        # newer one with counts it made before the other committed
+        _lock_refreshes()
+
+        counts = _count_by_town(factory_model, report_record_model, document_model, towns)
+
+        rows = statistics_model.objects.all()
+        if towns is not None:
+            q = Q()
+            for city, town in towns:
+                q |= Q(city=city, town=town)
+            rows = rows.filter(q)
+        previous_counts = {
+            (row.pop("city"), row.pop("town"), row.pop("source"), row.pop("display_status")): row
+            for row in rows.values(
+                "city", "town", "source", "display_status", *_COUNT_FIELDS
+            )
+        }
+        rows.delete()
+
+        statistics_model.objects.bulk_create(
+            statistics_model(
+                city=city,
+                town=town,
+                source=source,
+                display_status=display_status,
+                **count,
+            )
+            for (city, town, source, display_status), count in counts.items()
+        )
+    # keyed by (city, town, source, display_status)
+    return {
+        key[:2]
+        for key in set(counts) | set(previous_counts)
+        if counts.get(key) != previous_counts.get(key)
+    }
+
+
+def refresh_town_statistics(townnames=None):
+    """Recompute the rollup of the towns of the given townnames, or of every town.
+
+    Returns the (city, town) pairs whose counts changed.
+    """
+    towns = None if townnames is None else {split_townname(townname) for townname in townnames}
+    if towns == set():
+        return set()
+    return refresh_town_statistics_with_custom_models(
+        TownStatistics, Factory, ReportRecord, Document, towns=towns
+    )
+
+
+def mark_towns_stale(townnames):
+    """Mark the towns of the given townnames for `refresh_stale_town_statistics`.
+
+    A single upsert, cheap enough for every write. The marks stay locked
+    until the surrounding transaction ends, which only makes the writes of
+    the same town wait for each other.
+    """
+    towns = sorted({split_townname(townname) for townname in townnames})
+    if not towns:
+        return
+    table = StaleTown._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} (city, town, version) "
+            f"VALUES {', '.join(['(%s, %s, 1)'] * len(towns))} "
+            f"ON CONFLICT (city, town) DO UPDATE SET version = {table}.version + 1",
+            [value for town in towns for value in town],
+        )
+
+
+def refresh_stale_town_statistics():
+    """Recount the towns marked stale, returning them as (city, town) pairs."""
+    with transaction.atomic():
+        _lock_refreshes()
+        marks = list(StaleTown.objects.values_list("city", "town", "version"))
+        if not marks:
+            return []
+        towns = {(city, town) for city, town, _ in marks}
+        refresh_town_statistics_with_custom_models(
+            TownStatistics, Factory, ReportRecord, Document, towns=towns
+        )
+
+        # the towns marked again since were bumped to a newer version, they
+        # wait for the next recount
+        q = Q()
+        for city, town, version in marks:
+            q |= Q(city=city, town=town, version=version)
+        StaleTown.objects.filter(q).delete()
+    return sorted(towns)
+
+
+# buckets of `/api/statistics/total`, by the display_status of the latest document
+TOTAL_DISPLAY_STATUS_BUCKETS = [
+    (DocumentDisplayStatusConst.OPEN, {
+        DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.REPORTED],
+    }),
+    (DocumentDisplayStatusConst.IN_PROGRESS, IN_PROGRESS_DISPLAY_STATUSES),
+    (DocumentDisplayStatusConst.POWER_OUTED, {
+        DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.POWER_OUTING],
+    }),
+    (DocumentDisplayStatusConst.DEMOLISHED, {
+        DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.DEMOLISHED],
+    }),
+]
+
+
+def count_factories_by_city(cities):
+    """Count the factories, reported factories, factories with documents and the
+    display status buckets of every city with a single grouped query.
+
+    It relies on the summary columns of Factory, which already hold the latest
+    report time and latest document display status of each factory.
+    """
+    city, _ = _city_and_town("townname")
+    buckets = {
+        f"bucket_{idx}": Count("pk", filter=Q(latest_document_display_status__in=display_statuses))
+        for idx, (_, display_statuses) in enumerate(TOTAL_DISPLAY_STATUS_BUCKETS)
+    }
+    rows = (
+        Factory.objects.annotate(stat_city=city)
+        .filter(stat_city__in=cities)
+        .order_by()
+        .values("stat_city")
+        .annotate(
+            factories=Count("pk"),
+            report_records=Count("pk", filter=Q(latest_report_at__isnull=False)),
+            documents=Count("pk", filter=Q(latest_document_display_status__isnull=False)),
+            **buckets,
+        )
+    )
+
+    result = {
+        city: {
+            "factories": 0,
+            "report_records": 0,
+            "documents": 0,
+            **{name: 0 for name, _ in TOTAL_DISPLAY_STATUS_BUCKETS},
+        }
+        for city in cities
+    }
+    for row in rows:
+        data = result[row["stat_city"]]
+        for key in ["factories", "report_records", "documents"]:
+            data[key] = row[key]
+        for idx, (name, _) in enumerate(TOTAL_DISPLAY_STATUS_BUCKETS):
+            data[name] = row[f"bucket_{idx}"]
+    return result
@@ -1,99 +1,107 @@
-import os
 import logging
-from urllib.parse import urljoin
-from uuid import uuid4
 
-from django.conf import settings
-import requests
-import easymap
+from django_q.tasks import async_task
 
-from .models import Factory, Image
+from . import image_exif, image_variants, landcodes, tiles
+from .admin.actions.export_docx import (
+    compose_export_job_docx,
+    render_export_job_document,
+    start_export_job,
+)
+from .image_upload import upload_image_file
+from .models import Factory
+from .response_cache import invalidate_responses
+from .statistics import refresh_stale_town_statistics, refresh_town_statistics
 
 LOGGER = logging.getLogger("django")
 
 
-def _upload_image_to_imgur(image_buffer, client_id):
-    tmp_path = os.path.join(settings.MEDIA_ROOT, f"{uuid4()}.jpg")
-    with open(tmp_path, "wb") as fw:
-        fw.write(image_buffer)
-    headers = {"Authorization": f"Client-ID {client_id}"}
-    resp = requests.post(
-        "https://api.imgur.com/3/image",
-        data={"image": image_buffer},
-        headers=headers,
+def update_landcode(factory_id):
+    update_landcodes([factory_id])
+
+
+def update_landcodes(factory_ids):
+    """Land codes of the factories, the ones left at the deadline go to another task."""
+    _, remaining = landcodes.update_landcodes(
+        Factory.raw_objects.filter(pk__in=factory_ids).order_by("id"),
+        deadline=landcodes.task_deadline(),
     )
-    try:
-        resp_data = resp.json()
-        if "errors" in resp_data:
-            credit_resp = requests.get(
-                "https://api.imgur.com/3/credits",
-                headers=headers,
-            )
-            LOGGER.error(f"Error upload to imgur. The credits remaining: {credit_resp.json()}")
-            path = urljoin(
-                urljoin(settings.DOMAIN, settings.MEDIA_URL), os.path.basename(tmp_path)
-            )
-        else:
-            path = resp_data["data"]["link"]
-    except Exception:
-        LOGGER.error(f"Error parsing imgur response data: {resp_data}")
-        path = urljoin(urljoin(settings.DOMAIN, settings.MEDIA_URL), os.path.basename(tmp_path))
-    return path
+    if remaining:
+        LOGGER.info(f"{len(remaining)} land codes left for another task")
+        async_task("api.tasks.update_landcodes", [str(factory.id) for factory in remaining])
 
 
-def update_landcode(factory_id):
-    update_landcode_with_custom_factory_model(factory_id, Factory)
+def update_unresolved_landcodes(after=None):
+    """A chunk of the backfill of the missing land codes, enqueuing the next one until done."""
+    updated, cursor = landcodes.update_unresolved_landcodes(
+        after, chunk_size=landcodes.task_chunk_size(), deadline=landcodes.task_deadline()
+    )
+    if cursor is None:
+        LOGGER.info("Every factory missing a land code has been tried")
+        return
+    remaining = landcodes.unresolved_factories().filter(id__gt=cursor).count()
+    LOGGER.info(f"Land codes resolved up to factory {cursor}, {remaining} factories left")
+    async_task("api.tasks.update_unresolved_landcodes", str(cursor))
+
 
+def _invalidate_town_responses(towns):
+    invalidate_responses(townnames=[f"{city}{town}" for city, town in towns])
 
-def update_landcode_with_custom_factory_model(factory_id, factory_model):
-    factory = factory_model.objects.get(pk=factory_id)
-    try:
-        landinfo = easymap.get_land_number(lng=factory.lng, lat=factory.lat)
-        landcode = landinfo.get("landno")
 
-        LOGGER.info(f"Factory {factory_id} retrieved land number {landcode}")
-        factory_model.objects.filter(pk=factory_id).update(
-            landcode=landcode,
-            sectcode=landinfo.get("sectno"),
-            sectname=landinfo.get("sectname"),
-            towncode=landinfo.get("towncode"),
-            townname=landinfo.get("townname"),
-        )
-    except Exception as e:
-        LOGGER.error(f"update_landcode task failed.")
-        LOGGER.error(e)
+def update_town_statistics():
+    """The full recount, catching the drift of writes the marks missed."""
+    towns = refresh_town_statistics()
+    if towns:
+        LOGGER.info(f"The full recount corrected the statistics of {len(towns)} towns")
+        _invalidate_town_responses(towns)
+
+
+def update_stale_town_statistics():
+    towns = refresh_stale_town_statistics()
+    if towns:
+        LOGGER.info(f"Recounted the statistics of {len(towns)} towns")
+        _invalidate_town_responses(towns)
+
+
+def export_vector_tiles():
+    # the full export is too long for a task, it's left to the command
+    if tiles.vector_tiles_exported_at() is None:
+        LOGGER.info("No vector tiles exported yet, run the export_vector_tiles command")
+        return
+    n_tiles = tiles.export_vector_tiles(tiles.vector_tile_export_zooms())
+    LOGGER.info(f"Exported {n_tiles} changed vector tiles")
 
 
 def upload_image(image_path, client_id, image_id):
     LOGGER.info(f"Upload {image_id}: {image_path} with {client_id}")
-    try:
-        with open(image_path, "rb") as f:
-            image_buffer = f.read()
-
-        path = _upload_image_to_imgur(image_buffer, client_id)
-        try:
-            Image.objects.filter(pk=image_id).update(image_path=path)
-        except Exception:
-            LOGGER.error(
-                f"""
-                Upload success and get imgur url {path},
-                but other error happened when update image {image_id}
-            """
-            )
-            return False
-    except Exception as e:
-        LOGGER.error(f"Upload {image_path} to Imgur with client ID {client_id} failed {e}")
-        return False
-
-    try:
-        os.remove(image_path)
-    except Exception:
-        LOGGER.warning(
-            f"""
-            {image_id} upload and write to DB success,
-            but other error happened when removing tempfile {image_path}.
-        """
-        )
-        return True
-
-    return True
+    return upload_image_file(image_path, image_id, client_id) is not None
+
+
+def make_image_variants(image_ids):
+    """Variants of the images, the ones left at the deadline go to another task."""
+    _, remaining = image_variants.make_image_variants(
+        image_ids, deadline=image_variants.task_deadline()
+    )
+    if remaining:
+        LOGGER.info(f"{len(remaining)} image variants left for another task")
+        async_task("api.tasks.make_image_variants", remaining)
+
+
+def update_images_exif(image_ids):
+    """EXIF of the images, the ones left at the deadline go to another task."""
+    _, remaining = image_exif.update_images_exif(image_ids, deadline=image_exif.task_deadline())
+    if remaining:
+        LOGGER.info(f"{len(remaining)} image EXIFs left for another task")
+        async_task("api.tasks.update_images_exif", remaining)
+
+
+def export_docx(job_id):
+    start_export_job(job_id)
+
+
+def render_export_document(job_id, index):
+    render_export_job_document(job_id, index)
+
+
+def compose_export_job(job_id):
+    compose_export_job_docx(job_id)
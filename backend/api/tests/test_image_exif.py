@@ -0,0 +1,118 @@
+import datetime
+from io import BytesIO
+from unittest.mock import patch
+
+import PIL.Image
+import pytest
+from django.utils import timezone
+
+from .. import tasks
+from ..image_exif import EXIF_HEADER_BYTES, update_images_exif
+from ..models import Image
+
+pytestmark = pytest.mark.django_db
+
+
+class MockRaw:
+    def __init__(self, content):
+        self.stream = BytesIO(content)
+
+    def read(self, amount, decode_content=False):
+        return self.stream.read(amount)
+
+
+class MockResponse:
+    def __init__(self, content):
+        self.raw = MockRaw(content)
+
+    def raise_for_status(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def _jpeg(gps=None, taken_at=None):
+    exif = PIL.Image.Exif()
+    if gps is not None:
+        exif[0x8825] = gps
+    if taken_at is not None:
+        exif[0x8769] = {0x9003: taken_at}
+    data = BytesIO()
+    # noise keeps the image data well past the header
+    PIL.Image.effect_noise((1000, 1000), 50).convert("RGB").save(
+        data, format="JPEG", exif=exif.tobytes()
+    )
+    return data.getvalue()
+
+
+TAKEN = _jpeg(
+    gps={1: "N", 2: (23.0, 14.0, 6.0), 3: "E", 4: (120.0, 6.0, 0.0)},
+    taken_at="2020:01:02 03:04:05",
+)
+
+
+def test_update_images_exif_reads_the_header_only():
+    missing = Image.objects.create(image_path="https://example.com/missing.jpg")
+    consistent = Image.objects.create(
+        image_path="https://example.com/consistent.jpg",
+        orig_lat=23.235,
+        orig_lng=120.1,
+        orig_time=timezone.make_aware(datetime.datetime(2020, 1, 2, 3, 4, 5)),
+    )
+    wrong = Image.objects.create(
+        image_path="https://example.com/wrong.jpg", orig_lat=25.0, orig_lng=121.5
+    )
+    stripped = Image.objects.create(image_path="https://i.imgur.com/stripped.jpg", orig_lat=25.0)
+
+    def get(url, headers, stream, timeout):
+        assert headers == {"Range": f"bytes=0-{EXIF_HEADER_BYTES - 1}"}
+        return MockResponse(_jpeg() if "imgur" in url else TAKEN)
+
+    with patch("api.image_exif.requests.get", side_effect=get):
+        assert update_images_exif([missing.id, consistent.id, wrong.id, stripped.id]) == (2, [])
+
+    for image in [missing, wrong]:
+        image.refresh_from_db()
+        assert image.orig_lat == pytest.approx(23.235)
+        assert image.orig_lng == pytest.approx(120.1)
+        assert image.orig_time == timezone.make_aware(datetime.datetime(2020, 1, 2, 3, 4, 5))
+    assert Image.objects.get(pk=stripped.id).orig_lat == 25.0
+    assert len(TAKEN) > EXIF_HEADER_BYTES
+
+
+def test_update_images_exif_skips_failures():
+    image = Image.objects.create(image_path="https://example.com/broken.jpg")
+    with patch("api.image_exif.requests.get", return_value=MockResponse(b"oops")):
+        assert update_images_exif([image.id]) == (0, [])
+
+
+def _get_taken(url, **kwargs):
+    return MockResponse(TAKEN)
+
+
+def test_update_images_exif_saves_each_round_until_the_deadline():
+    images = sorted(
+        (Image.objects.create(image_path=f"https://example.com/{idx}.jpg") for idx in range(3)),
+        key=lambda image: image.id,
+    )
+    with patch("api.image_exif.requests.get", side_effect=_get_taken):
+        assert update_images_exif([image.id for image in images], workers=2, deadline=0) == (
+            2, [images[2].id],
+        )
+    assert Image.objects.filter(orig_lat__isnull=False).count() == 2
+
+
+def test_task_enqueues_the_images_left_at_the_deadline():
+    images = [Image.objects.create(image_path="https://example.com/taken.jpg") for _ in range(9)]
+    with patch("api.image_exif.requests.get", side_effect=_get_taken), \
+            patch("api.image_exif.task_deadline", return_value=0), \
+            patch("api.tasks.async_task") as mock_async_task:
+        tasks.update_images_exif([image.id for image in images])
+    # the first round is the EXIF_WORKERS first images
+    mock_async_task.assert_called_once_with(
+        "api.tasks.update_images_exif", sorted(image.id for image in images)[8:]
+    )
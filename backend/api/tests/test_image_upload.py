@@ -0,0 +1,173 @@
+import hashlib
+import os
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+import requests
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from ..image_upload import upload_image_file, upload_image_files
+from ..models import Image
+
+pytestmark = pytest.mark.django_db
+
+FAKE_IMAGE_URI = "https://i.imgur.com/12i34uhoi2.jpg"
+
+
+class MockResponse:
+    headers = {"X-RateLimit-ClientRemaining": "42"}
+
+    def __init__(self, json_data, status_code=200):
+        self.json_data = json_data
+        self.status_code = status_code
+        self.text = str(json_data)
+
+    def json(self):
+        return self.json_data
+
+
+UPLOADED = MockResponse({"data": {"link": FAKE_IMAGE_URI}, "success": True})
+REJECTED = MockResponse({"data": {"error": "Too Many Requests"}, "success": False}, 429)
+
+
+@pytest.fixture(autouse=True)
+def upload_settings(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.IMAGE_UPLOAD_BACKEND = "imgur"
+    settings.IMAGE_UPLOAD_RETRIES = 2
+    settings.IMAGE_UPLOAD_BACKOFF = 0
+
+
+def _image_file(tmp_path, content, name="upload.jpg"):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_upload_image_file_posts_to_imgur(tmp_path):
+    image = Image.objects.create(image_path="")
+    path = _image_file(tmp_path, b"1234567890")
+    with patch("api.image_upload._session.post", return_value=UPLOADED) as mock_post:
+        assert upload_image_file(path, image.id, "1234") == FAKE_IMAGE_URI
+    mock_post.assert_called_once_with(
+        "https://api.imgur.com/3/image",
+        data={"image": b"1234567890"},
+        headers={"Authorization": "Client-ID 1234"},
+        timeout=30,
+    )
+    image.refresh_from_db()
+    assert image.image_path == FAKE_IMAGE_URI
+    assert image.content_hash == hashlib.sha256(b"1234567890").hexdigest()
+    assert not os.path.exists(path)
+
+
+def test_upload_image_file_retries(tmp_path):
+    image = Image.objects.create(image_path="")
+    path = _image_file(tmp_path, b"1234567890")
+    with patch(
+        "api.image_upload._session.post",
+        side_effect=[requests.ConnectionError(), REJECTED, UPLOADED],
+    ) as mock_post:
+        assert upload_image_file(path, image.id, "1234") == FAKE_IMAGE_URI
+    assert mock_post.call_count == 3
+
+
+def test_upload_image_file_falls_back_to_media_root(settings, tmp_path):
+    settings.DOMAIN = "https://api.disfactory.tw/"
+    image = Image.objects.create(image_path="")
+    path = _image_file(tmp_path, b"1234567890")
+    with patch("api.image_upload._session.post", return_value=REJECTED) as mock_post:
+        url = upload_image_file(path, image.id, "1234")
+    assert mock_post.call_count == 3
+
+    name = f"{hashlib.sha256(b'1234567890').hexdigest()}.jpg"
+    assert url == f"https://api.disfactory.tw/media/{name}"
+    assert (tmp_path / name).read_bytes() == b"1234567890"
+    image.refresh_from_db()
+    assert (image.image_path, image.content_hash, image.upload_status) == (
+        url, None, Image.FAILED,
+    )
+
+
+def test_upload_image_file_stops_retrying_before_the_task_timeout(settings, tmp_path):
+    settings.Q_CLUSTER = {**settings.Q_CLUSTER, "timeout": 60}
+    settings.IMAGE_UPLOAD_TIMEOUT = 30
+    settings.IMAGE_UPLOAD_RETRIES = 3
+    settings.IMAGE_UPLOAD_BACKOFF = 1
+    clock = [0]
+
+    def hang(*args, **kwargs):
+        clock[0] += settings.IMAGE_UPLOAD_TIMEOUT
+        raise requests.Timeout()
+
+    def sleep(seconds):
+        clock[0] += seconds
+
+    image = Image.objects.create(image_path="")
+    path = _image_file(tmp_path, b"1234567890")
+    with patch("api.image_upload.time.monotonic", side_effect=lambda: clock[0]), \
+            patch("api.image_upload.time.sleep", side_effect=sleep), \
+            patch("api.image_upload._session.post", side_effect=hang) as mock_post:
+        assert upload_image_file(path, image.id, "1234") is not None
+    # a second attempt could end past the 60 s of the task, the image is kept instead
+    assert mock_post.call_count == 1
+    assert clock[0] < 60
+    image.refresh_from_db()
+    assert image.upload_status == Image.FAILED
+
+
+@pytest.mark.django_db(transaction=True)
+def test_upload_image_files_stores_a_content_once(tmp_path):
+    images = [Image.objects.create(image_path="") for _ in range(4)]
+    paths = [_image_file(tmp_path, b"same photo", f"{idx}.jpg") for idx in range(3)]
+    paths.append(_image_file(tmp_path, b"other photo", "3.jpg"))
+    with patch("api.image_upload._session.post", return_value=UPLOADED) as mock_post:
+        results = list(upload_image_files(zip(paths, [image.id for image in images]), "1234"))
+    assert mock_post.call_count == 2
+    assert sorted(results) == sorted((image.id, FAKE_IMAGE_URI, None) for image in images)
+
+
+def test_local_backend(settings, tmp_path):
+    settings.IMAGE_UPLOAD_BACKEND = "local"
+    image = Image.objects.create(image_path="")
+    path = _image_file(tmp_path, b"1234567890")
+    with patch("api.image_upload._session.post") as mock_post:
+        url = upload_image_file(path, image.id)
+    mock_post.assert_not_called()
+    name = f"{hashlib.sha256(b'1234567890').hexdigest()}.jpg"
+    assert url.endswith(f"/media/{name}")
+    assert Image.objects.get(pk=image.id).content_hash is not None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reupload_resumes_with_the_images_left(settings, tmp_path):
+    settings.IMGUR_CLIENT_ID = "1234"
+    pending = [
+        Image.objects.create(
+            image_path=f"https://api.disfactory.tw/media/{idx}.jpg", upload_status=Image.PENDING
+        )
+        for idx in range(3)
+    ]
+    for idx in range(2):
+        _image_file(tmp_path, f"photo {idx}".encode(), f"{idx}.jpg")
+    uploaded = Image.objects.create(image_path=FAKE_IMAGE_URI)
+
+    stdout, stderr = StringIO(), StringIO()
+    with patch("api.image_upload._session.post", return_value=UPLOADED) as mock_post:
+        with pytest.raises(CommandError, match=str(pending[2].id)):
+            call_command("reupload", stdout=stdout, stderr=stderr)
+    assert mock_post.call_count == 2
+    assert "3/3 images" in stdout.getvalue()
+    assert "FileNotFoundError: 1 images" in stderr.getvalue()
+    assert [Image.objects.get(pk=image.id).upload_status for image in pending] == [
+        Image.UPLOADED, Image.UPLOADED, Image.FAILED,
+    ]
+    assert Image.objects.get(pk=uploaded.id).upload_status == Image.UPLOADED
+
+    stdout = StringIO()
+    with patch("api.image_upload._session.post") as mock_post:
+        call_command("reupload", "--skip-failed", stdout=stdout)
+    mock_post.assert_not_called()
+    assert "Successfully uploaded 0 images" in stdout.getvalue()
@@ -0,0 +1,94 @@
+from io import BytesIO
+from unittest.mock import patch
+
+import PIL.Image
+import pytest
+
+from .. import tasks
+from ..image_variants import make_image_variants
+from ..models import Image
+from ..serializers import ImageSerializer
+
+pytestmark = pytest.mark.django_db
+
+
+class MockResponse:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+def _jpeg(size):
+    data = BytesIO()
+    PIL.Image.new("RGB", size).save(data, format="JPEG")
+    return data.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def variant_settings(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.DOMAIN = "https://api.disfactory.tw/"
+    settings.IMAGE_THUMBNAIL_SIZE = 100
+    settings.IMAGE_MEDIUM_SIZE = 400
+
+
+def test_make_image_variants(tmp_path):
+    remote = Image.objects.create(image_path="https://i.imgur.com/RxArJUc.jpg")
+    # stored by the local upload backend, read from the disk
+    (tmp_path / "local.jpg").write_bytes(_jpeg((300, 600)))
+    local = Image.objects.create(image_path="https://api.disfactory.tw/media/local.jpg")
+
+    with patch(
+        "api.image_variants.requests.get", return_value=MockResponse(_jpeg((1600, 1200)))
+    ) as mock_get:
+        assert make_image_variants([remote.id, local.id]) == (2, [])
+    mock_get.assert_called_once_with("https://i.imgur.com/RxArJUc.jpg", timeout=30)
+
+    remote.refresh_from_db()
+    assert remote.thumbnail_path == (
+        f"https://api.disfactory.tw/media/variants/{remote.id}-100.jpg"
+    )
+    assert PIL.Image.open(tmp_path / "variants" / f"{remote.id}-100.jpg").size == (100, 75)
+    assert PIL.Image.open(tmp_path / "variants" / f"{remote.id}-400.jpg").size == (400, 300)
+    assert PIL.Image.open(tmp_path / "variants" / f"{local.id}-400.jpg").size == (200, 400)
+
+    data = ImageSerializer(remote).data
+    assert data["thumbnail_url"] == remote.thumbnail_path
+    assert data["medium_url"] == remote.medium_path
+
+
+def test_make_image_variants_skips_failures():
+    image = Image.objects.create(image_path="https://i.imgur.com/broken.jpg")
+    with patch("api.image_variants.requests.get", return_value=MockResponse(b"oops")):
+        assert make_image_variants([image.id]) == (0, [])
+
+    image.refresh_from_db()
+    assert image.thumbnail_path is None
+    assert ImageSerializer(image).data["thumbnail_url"] == image.image_path
+
+
+def test_make_image_variants_saves_each_round_until_the_deadline():
+    images = sorted(
+        (Image.objects.create(image_path=f"https://i.imgur.com/{idx}.jpg") for idx in range(3)),
+        key=lambda image: image.id,
+    )
+    with patch("api.image_variants.requests.get", return_value=MockResponse(_jpeg((800, 600)))):
+        assert make_image_variants([image.id for image in images], workers=2, deadline=0) == (
+            2, [images[2].id],
+        )
+    assert Image.objects.filter(thumbnail_path__isnull=False).count() == 2
+
+
+def test_task_enqueues_the_images_left_at_the_deadline(settings):
+    settings.IMAGE_VARIANT_WORKERS = 1
+    images = sorted(
+        (Image.objects.create(image_path=f"https://i.imgur.com/{idx}.jpg") for idx in range(2)),
+        key=lambda image: image.id,
+    )
+    with patch("api.image_variants.requests.get", return_value=MockResponse(_jpeg((800, 600)))), \
+            patch("api.image_variants.task_deadline", return_value=0), \
+            patch("api.tasks.async_task") as mock_async_task:
+        tasks.make_image_variants([image.id for image in images])
+    mock_async_task.assert_called_once_with("api.tasks.make_image_variants", [images[1].id])
@@ -0,0 +1,85 @@
+from unittest.mock import patch
+
+import requests
+from freezegun import freeze_time
+
+import easymap
+from towninfo.boundaries import TownBoundaries
+
+
+class MockResponse:
+    status_code = 200
+
+    def __init__(self, json_data):
+        self.json_data = json_data
+
+    def json(self):
+        return self.json_data
+
+
+def _mock_get(url, params, timeout):
+    if url.endswith("/api/town"):
+        return MockResponse({"cityname": "臺南市", "townname": "北門區", "towncode": "D24"})
+    return MockResponse({
+        "features": [{"properties": {"section": "(5404)溪底寮段三寮灣小段", "land_number": "1681"}}],
+    })
+
+
+def test_client_caches_land_number(tmp_path):
+    client = easymap.EasymapClient(cache=easymap.LandInfoCache(str(tmp_path / "cache.sqlite3")))
+    with patch.object(client.session, "get", side_effect=_mock_get) as mock_get:
+        result = client.get_land_number(lng=120.1074406, lat=23.2353021)
+        assert client.get_land_number(lng=120.1074441, lat=23.2353011) == result
+    assert mock_get.call_count == 2
+    assert result == {
+        "landno": "1681",
+        "sectno": "5404",
+        "sectname": "溪底寮段三寮灣小段",
+        "towncode": "D24",
+        "townno": "D24",
+        "townname": "臺南市北門區",
+    }
+    assert client.cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_client_does_not_cache_failures(tmp_path):
+    client = easymap.EasymapClient(cache=easymap.LandInfoCache(str(tmp_path / "cache.sqlite3")))
+    with patch.object(client.session, "get", side_effect=requests.Timeout()):
+        assert client.get_land_number(lng=120.1, lat=23.2)["landno"] == ""
+    with patch.object(client.session, "get", side_effect=_mock_get):
+        assert client.get_land_number(lng=120.1, lat=23.2)["landno"] == "1681"
+
+
+def test_land_info_cache_expires_and_evicts(tmp_path):
+    cache = easymap.LandInfoCache(str(tmp_path / "cache.sqlite3"), ttl=60, max_entries=2)
+    with freeze_time("2020-01-01 00:00:00"):
+        cache.set("a", {"landno": "1"})
+    with freeze_time("2020-01-01 00:00:10"):
+        cache.set("b", {"landno": "2"})
+    with freeze_time("2020-01-01 00:00:20"):
+        assert cache.get("a") == {"landno": "1"}
+    with freeze_time("2020-01-01 00:00:30"):
+        cache.set("c", {"landno": "3"})
+        # b is the least recently used
+        assert cache.get("b") is None
+        assert cache.get("a") == {"landno": "1"}
+    with freeze_time("2020-01-01 00:01:10"):
+        assert cache.get("a") is None
+        assert cache.get("c") == {"landno": "3"}
+
+
+def test_client_resolves_towns_offline():
+    towns = TownBoundaries([{
+        "type": "Feature",
+        "properties": {"TOWNCODE": "67000170"},
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [[[120.0, 23.2], [120.2, 23.2], [120.2, 23.3], [120.0, 23.3], [120.0, 23.2]]],
+        },
+    }])
+    client = easymap.EasymapClient(towns=towns)
+    with patch.object(client.session, "get", side_effect=_mock_get) as mock_get:
+        result = client.get_land_number(lng=120.1074406, lat=23.2353021)
+    mock_get.assert_called_once()
+    assert mock_get.call_args[0][0].endswith("/api/sectland")
+    assert (result["towncode"], result["townname"], result["landno"]) == ("D24", "臺南市北門區", "1681")
@@ -0,0 +1,118 @@
+import time
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+
+from ..landcodes import _RateLimiter, task_chunk_size, unresolved_factories, update_landcodes
+from ..models import Factory, TownStatistics
+from ..statistics import refresh_stale_town_statistics
+from ..tasks import update_unresolved_landcodes
+from .. import tasks
+
+pytestmark = pytest.mark.django_db
+
+
+def _get_land_number(lat, lng):
+    if lat > 25:
+        # easymap failed
+        return {"landno": "", "sectno": "", "sectname": "", "towncode": "", "townname": ""}
+    return {
+        "landno": "1681",
+        "sectno": "5404",
+        "sectname": "溪底寮段三寮灣小段",
+        "towncode": "V10",
+        "townname": "臺灣省臺東縣池上鄉",
+    }
+
+
+def _create_factories(locations):
+    return [
+        Factory.objects.create(
+            name=f"工廠 {idx}", lat=lat, lng=lng, source="G", display_number=1000 + idx
+        )
+        for idx, (lat, lng) in enumerate(locations)
+    ]
+
+
+def test_update_landcodes_requests_each_location_once():
+    factories = _create_factories([(23.1, 121.2), (23.1, 121.2), (23.2, 121.2), (26, 121.2)])
+    with patch("api.landcodes.easymap.get_land_number", side_effect=_get_land_number) as mock_get:
+        assert update_landcodes(Factory.objects.filter(pk__in=[f.id for f in factories])) == (3, [])
+    assert mock_get.call_count == 3
+
+    assert list(unresolved_factories().filter(name__startswith="工廠")) == [factories[3]]
+    factory = Factory.objects.get(pk=factories[0].id)
+    assert (factory.landcode, factory.sectcode, factory.townname) == (
+        "1681", "5404", "臺灣省臺東縣池上鄉",
+    )
+    refresh_stale_town_statistics()
+    row = TownStatistics.objects.get(city="臺東縣", town="池上鄉", source="G", display_status=None)
+    assert row.factories == 3
+
+
+def test_update_landcodes_saves_each_round_until_the_deadline():
+    factories = _create_factories([(23.1, 121.2), (23.2, 121.2), (23.3, 121.2)])
+    with patch("api.landcodes.easymap.get_land_number", side_effect=_get_land_number):
+        found, remaining = update_landcodes(factories, workers=2, rate=0, deadline=0)
+    assert found == 2
+    assert remaining == factories[2:]
+    assert list(unresolved_factories()) == factories[2:]
+
+
+def test_task_enqueues_the_factories_left_at_the_deadline(settings):
+    settings.LANDCODE_WORKERS = 2
+    factories = sorted(
+        _create_factories([(23.1, 121.2), (23.2, 121.2), (23.3, 121.2)]), key=lambda f: f.id
+    )
+    with patch("api.landcodes.easymap.get_land_number", side_effect=_get_land_number), \
+            patch("api.landcodes.task_deadline", return_value=0), \
+            patch("api.tasks.async_task") as mock_async_task:
+        tasks.update_landcodes([factory.id for factory in factories])
+    mock_async_task.assert_called_once_with("api.tasks.update_landcodes", [str(factories[2].id)])
+
+
+def test_task_chunk_fits_in_the_timeout(settings):
+    settings.Q_CLUSTER = {**settings.Q_CLUSTER, "timeout": 60}
+    # 25 seconds of requests, the slowest one and the margin are kept
+    assert task_chunk_size(rate=10) == 250
+    assert task_chunk_size(rate=0.01) == 1
+
+
+def test_update_unresolved_landcodes_enqueues_the_next_chunk():
+    factory = _create_factories([(23.1, 121.2)])[0]
+    with patch("api.landcodes.easymap.get_land_number", side_effect=_get_land_number), \
+            patch("api.tasks.async_task") as mock_async_task:
+        update_unresolved_landcodes()
+        mock_async_task.assert_called_once_with(
+            "api.tasks.update_unresolved_landcodes", str(factory.id)
+        )
+
+        mock_async_task.reset_mock()
+        update_unresolved_landcodes(str(factory.id))
+    mock_async_task.assert_not_called()
+
+
+def test_command_resumes_after_cursor():
+    factories = sorted(
+        _create_factories([(23.1, 121.2), (23.2, 121.2), (23.3, 121.2)]), key=lambda f: f.id
+    )
+    stdout = StringIO()
+    with patch("api.landcodes.easymap.get_land_number", side_effect=_get_land_number) as mock_get:
+        call_command("update_landcodes", "--after", str(factories[0].id), "--chunk-size", "1",
+                     "--rate", "0", stdout=stdout)
+    assert mock_get.call_count == 2
+    assert list(unresolved_factories()) == [factories[0]]
+    assert f"1/2 factories tried, 1 land codes found, resume with --after {factories[1].id}" in (
+        stdout.getvalue()
+    )
+    assert "Successfully resolved 2 of 2 land codes" in stdout.getvalue()
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = _RateLimiter(50)
+    started_at = time.monotonic()
+    for _ in range(6):
+        limiter.wait()
+    assert time.monotonic() - started_at >= 0.1
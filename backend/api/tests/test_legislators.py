@@ -0,0 +1,36 @@
+from unittest.mock import patch
+
+from ..legislators import get_legislator_name, get_legislator_names
+
+
+class MockResponse:
+    def __init__(self, json_data):
+        self.json_data = json_data
+
+    def json(self):
+        return self.json_data
+
+
+def test_get_legislator_names_in_one_round():
+    def get(url, params, timeout):
+        return MockResponse([{"name": f"委員 {params['lng']}"}])
+
+    with patch("api.legislators._session.get", side_effect=get) as mock_get:
+        names = get_legislator_names([(23.2341, 120.1001), (23.2342, 120.1002), (24, 121)])
+    # the first two are the same place once rounded
+    assert mock_get.call_count == 2
+    assert names == ["委員 120.1", "委員 120.1", "委員 121"]
+
+    with patch("api.legislators._session.get") as mock_get:
+        assert get_legislator_name(23.2343, 120.1) == "委員 120.1"
+    mock_get.assert_not_called()
+
+
+def test_failures_are_not_cached():
+    with patch("api.legislators._session.get", side_effect=ValueError("timeout")):
+        assert get_legislator_name(23, 121) == "UNKNOWN"
+
+    with patch("api.legislators._session.get", return_value=MockResponse([])) as mock_get:
+        assert get_legislator_name(23, 121) == "UNKNOWN"
+        assert get_legislator_name(23, 121) == "UNKNOWN"
+    assert mock_get.call_count == 1
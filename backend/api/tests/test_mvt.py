@@ -0,0 +1,15 @@
+from api.mvt import encode_point_layer
+
+
+def test_encode_point_layer():
+    # verified with the reference decoder of mapbox-vector-tile
+    assert encode_point_layer(
+        "factories",
+        [(5, (100, -20), {"source": "U", "display_number": 5, "townname": None})],
+    ) == (
+        b'\x1aCx\x02\n\tfactories'
+        b'\x12\x10\x08\x05\x12\x04\x00\x00\x01\x01\x18\x01"\x04\t\xc8\x01\''
+        b'\x1a\x06source\x1a\x0edisplay_number'
+        b'"\x03\n\x01U"\x020\n'
+        b'(\x80 '
+    )
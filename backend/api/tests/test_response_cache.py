@@ -0,0 +1,80 @@
+import pytest
+
+from ..models import Factory, ReportRecord
+from ..tasks import update_stale_town_statistics, update_town_statistics
+
+
+pytestmark = pytest.mark.django_db
+
+
+def _create_factory(display_number, townname):
+    return Factory.objects.create(
+        name="test factory",
+        lat=23.234,
+        lng=120.1,
+        townname=townname,
+        display_number=display_number,
+    )
+
+
+def test_cached_response_with_etag(client, django_assert_num_queries):
+    factory = _create_factory(666, "臺南市善化區")
+    url = f"/api/factories/{factory.id}/location"
+
+    resp = client.get(url)
+    assert resp.status_code == 200
+    assert resp["ETag"]
+    assert resp["Last-Modified"]
+
+    with django_assert_num_queries(0):
+        cached_resp = client.get(url)
+    assert cached_resp.content == resp.content
+    assert cached_resp["ETag"] == resp["ETag"]
+
+    not_modified_resp = client.get(url, HTTP_IF_NONE_MATCH=resp["ETag"])
+    assert not_modified_resp.status_code == 304
+    assert not_modified_resp.content == b""
+
+
+def test_write_invalidates_factory(client):
+    factory = _create_factory(666, "臺南市善化區")
+    url = f"/api/factories/{factory.id}"
+
+    assert client.get(url).json()["reported_at"] is None
+
+    ReportRecord.objects.create(factory=factory, action_type="POST", action_body={})
+
+    assert client.get(url).json()["reported_at"] is not None
+
+
+def test_write_only_invalidates_its_region(client, django_assert_num_queries):
+    factory = _create_factory(666, "臺南市善化區")
+    other_factory = _create_factory(667, "臺北市中山區")
+    url = "/api/statistics/report_records?townname=臺南市"
+    update_stale_town_statistics()
+    client.get(url)
+
+    ReportRecord.objects.create(factory=other_factory, action_type="POST", action_body={})
+    update_stale_town_statistics()
+    with django_assert_num_queries(0):
+        assert client.get(url).json()["count"] == 0
+
+    ReportRecord.objects.create(factory=factory, action_type="POST", action_body={})
+    # the statistics follow once the town is recounted
+    assert client.get(url).json()["count"] == 0
+    update_stale_town_statistics()
+    assert client.get(url).json()["count"] == 1
+
+
+def test_full_recount_invalidates_the_corrected_regions(client):
+    factory = _create_factory(666, "臺南市善化區")
+    ReportRecord.objects.create(factory=factory, action_type="POST", action_body={})
+    url = "/api/statistics/report_records?townname=臺南市"
+    update_stale_town_statistics()
+    assert client.get(url).json()["count"] == 1
+
+    # a write the marks missed
+    Factory.objects.filter(pk=factory.pk).update(townname="臺北市中山區")
+    assert client.get(url).json()["count"] == 1
+    update_town_statistics()
+    assert client.get(url).json()["count"] == 0
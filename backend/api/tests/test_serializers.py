@@ -150,6 +150,7 @@ class TestFactorySerializers:
             report_record=report_record2,
             deletehash="qwerasdfzxcv;"
         )
+        factory.refresh_from_db()
         serializer = FactorySerializer(factory)
         assert not serializer.data["data_complete"]
 
@@ -174,6 +175,7 @@ class TestFactorySerializers:
             others="HI",
             created_at=factory.created_at + timedelta(days=1),
         )
+        factory.refresh_from_db()
         serializer = FactorySerializer(factory)
         assert not serializer.data["data_complete"]
 
@@ -204,6 +206,7 @@ class TestFactorySerializers:
                 deletehash="qwerasdfzxcv;",
                 report_record=report_record,
             )
+        factory.refresh_from_db()
         serializer = FactorySerializer(factory)
         assert not serializer.data["data_complete"]
 
@@ -235,6 +238,7 @@ class TestFactorySerializers:
                 deletehash="qwerasdfzxcv;",
                 report_record=report_record,
             )
+        factory.refresh_from_db()
         serializer = FactorySerializer(factory)
         assert serializer.data["data_complete"]
 
@@ -266,6 +270,7 @@ class TestFactorySerializers:
                 report_record=report_record,
                 deletehash="qwerasdfzxcv;",
             )
+        factory.refresh_from_db()
         serializer = FactorySerializer(factory)
         assert serializer.data["data_complete"]
 
@@ -291,6 +296,7 @@ class TestFactorySerializers:
                 contact="07-7533967",
                 others="昨天在這裡辦演唱會，但旁邊居然在蓋工廠。不錄了不錄了！",
             )
+        factory.refresh_from_db()
         serializer = FactorySerializer(factory)
         assert not serializer.data["data_complete"]
 
@@ -322,6 +328,7 @@ class TestFactorySerializers:
                 report_record=report_record,
                 deletehash="qwerasdfzxcv;",
             )
+        factory.refresh_from_db()
         serializer = FactorySerializer(factory)
         assert not serializer.data["data_complete"]
 
@@ -0,0 +1,106 @@
+import pytest
+
+from ..models import Factory, Document, ReportRecord, StaleTown, TownStatistics
+from ..models.const import DocumentDisplayStatusConst
+from ..models.document import DocumentDisplayStatusEnum
+from ..statistics import (
+    mark_towns_stale,
+    refresh_stale_town_statistics,
+    refresh_town_statistics,
+    split_townname,
+)
+
+
+def test_split_townname():
+    assert split_townname("臺南市善化區") == ("臺南市", "善化區")
+    assert split_townname("臺灣省彰化縣鹿港鎮") == ("彰化縣", "鹿港鎮")
+    assert split_townname("臺南市") == ("臺南市", "")
+    assert split_townname(None) == ("", "")
+
+
+@pytest.mark.django_db
+class TestRefreshTownStatistics:
+
+    @pytest.fixture(autouse=True)
+    def setUp(self):
+        self.factory = Factory.objects.create(
+            name="test factory",
+            lat=23,
+            lng=121,
+            townname="臺灣省彰化縣鹿港鎮",
+            source="U",
+            display_number=666,
+        )
+
+    def _get_row(self, display_status=None):
+        return TownStatistics.objects.get(
+            city="彰化縣",
+            town="鹿港鎮",
+            source="U",
+            display_status=TownStatistics.DISPLAY_STATUS_INDICES.get(display_status),
+        )
+
+    def test_follow_writes_of_relations(self):
+        ReportRecord.objects.create(factory=self.factory, action_type="POST", action_body={})
+        for display_status in [
+            DocumentDisplayStatusConst.REPORTED,
+            DocumentDisplayStatusConst.AUDIT_SCHEDULED,
+            DocumentDisplayStatusConst.WORK_STOPPED,
+        ]:
+            Document.objects.create(
+                factory=self.factory,
+                code=1090001,
+                display_status=DocumentDisplayStatusEnum.INDICES[display_status],
+            )
+        assert refresh_stale_town_statistics() == [("彰化縣", "鹿港鎮")]
+
+        row = self._get_row()
+        assert (row.factories, row.documents, row.report_records) == (1, 3, 1)
+
+        # counted once in each status it has a document in
+        assert self._get_row(DocumentDisplayStatusConst.REPORTED).factories == 1
+        assert self._get_row(DocumentDisplayStatusConst.AUDIT_SCHEDULED).factories == 1
+        in_progress = self._get_row(DocumentDisplayStatusConst.IN_PROGRESS)
+        assert (in_progress.factories, in_progress.documents) == (1, 1)
+
+        self.factory.delete()
+        refresh_stale_town_statistics()
+        assert not TownStatistics.objects.filter(city="彰化縣", town="鹿港鎮").exists()
+
+    def test_move_factory_to_another_town(self):
+        Factory.objects.filter(pk=self.factory.pk).update(townname="臺南市善化區")
+        refresh_town_statistics(["臺灣省彰化縣鹿港鎮", "臺南市善化區"])
+
+        assert not TownStatistics.objects.filter(city="彰化縣").exists()
+        row = TownStatistics.objects.get(city="臺南市", town="善化區", source="U", display_status=None)
+        assert row.factories == 1
+
+    def test_full_recount_returns_the_corrected_towns(self):
+        refresh_town_statistics()
+        assert refresh_town_statistics() == set()
+
+        # a write the marks missed
+        Factory.objects.filter(pk=self.factory.pk).update(townname="臺南市善化區")
+        assert refresh_town_statistics() == {("彰化縣", "鹿港鎮"), ("臺南市", "善化區")}
+
+    def test_save_factory_in_another_town(self):
+        self.factory.townname = "臺南市善化區"
+        self.factory.save()
+        assert refresh_stale_town_statistics() == [("彰化縣", "鹿港鎮"), ("臺南市", "善化區")]
+
+        assert not TownStatistics.objects.filter(city="彰化縣").exists()
+        row = TownStatistics.objects.get(city="臺南市", town="善化區", source="U", display_status=None)
+        assert row.factories == 1
+
+    def test_writes_only_mark_towns(self, django_assert_num_queries):
+        refresh_stale_town_statistics()
+        with django_assert_num_queries(1):
+            mark_towns_stale(["臺灣省彰化縣鹿港鎮", "臺南市善化區", "臺南市善化區"])
+        assert StaleTown.objects.filter(city="臺南市", town="善化區").exists()
+
+        ReportRecord.objects.create(factory=self.factory, action_type="POST", action_body={})
+        assert self._get_row().report_records == 0
+
+        refresh_stale_town_statistics()
+        assert self._get_row().report_records == 1
+        assert not StaleTown.objects.exists()
@@ -0,0 +1,414 @@
+"""Slippy map tiles of factories.
+
+At low zoom levels a tile is split into a grid and every cell carries an
+aggregate of the factories inside it, at high zoom levels the tile lists the
+factories themselves. Either way a tile costs a single grouped query, and the
+result is kept in the cache so panning the map only hits the database once
+per tile, until a write drops it like the cached responses of
+`api.response_cache`.
+
+The same tiles are also exported as Mapbox Vector Tiles under
+`VECTOR_TILE_ROOT`, so they can be served as static files from a CDN, from
+zoom VECTOR_TILE_MIN_ZOOM on, with the grid cells as points below
+FACTORY_TILE_POINT_ZOOM. A
+django-q schedule renders again the exported tiles holding factories and
+documents changed since the last export, and the positions factories left,
+whether the tiles were exported or stored on demand.
+"""
+import math
+import os
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Floor
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Factory, Document, DocumentDisplayStatusEnum, VacatedPosition
+from . import mvt
+from .response_cache import GLOBAL_SCOPE, versioned_key
+
+MAX_ZOOM = 22
+
+
+def is_valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_bounds(z, x, y):
+    """Return (min_lat, max_lat, min_lng, max_lng) of a web mercator tile."""
+    n = 2 ** z
+
+    def lat_of(tile_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    return (
+        lat_of(y + 1),
+        lat_of(y),
+        x / n * 360 - 180,
+        (x + 1) / n * 360 - 180,
+    )
+
+
+def lat_lng_to_tile(lat, lng, z):
+    n = 2 ** z
+    x = int((lng + 180) / 360 * n)
+    lat_rad = math.radians(lat)
+    y = int((1 - math.asinh(math.tan(lat_rad)) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_covering_taiwan(z):
+    min_x, min_y = lat_lng_to_tile(settings.TAIWAN_MAX_LATITUDE, settings.TAIWAN_MIN_LONGITUDE, z)
+    max_x, max_y = lat_lng_to_tile(settings.TAIWAN_MIN_LATITUDE, settings.TAIWAN_MAX_LONGITUDE, z)
+    for x in range(min_x, max_x + 1):
+        for y in range(min_y, max_y + 1):
+            yield x, y
+
+
+def _to_tile_pixel(lat, lng, z, x, y, extent=mvt.EXTENT):
+    n = 2 ** z
+    world_x = (lng + 180) / 360 * n
+    world_y = (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n
+    return round((world_x - x) * extent), round((world_y - y) * extent)
+
+
+def _get_factories_in_tile(z, x, y, source):
+    min_lat, max_lat, min_lng, max_lng = tile_bounds(z, x, y)
+    # half-open ranges, so a factory on a tile edge belongs to exactly one tile
+    factories = Factory.objects.filter(
+        lat__gte=min_lat, lat__lt=max_lat, lng__gte=min_lng, lng__lt=max_lng
+    )
+    if source:
+        factories = factories.filter(source=source)
+    return factories
+
+
+def _get_points(z, x, y, source):
+    factories = (
+        _get_factories_in_tile(z, x, y, source)
+        .annotate(document_display_status=F("latest_document_display_status"))
+        .order_by("display_number")
+        .values(
+            "id",
+            "display_number",
+            "lat",
+            "lng",
+            "source",
+            "factory_type",
+            "cet_report_status",
+            "document_display_status",
+        )
+    )
+
+    points = []
+    for factory in factories:
+        status = factory["document_display_status"]
+        points.append({
+            **factory,
+            "id": str(factory["id"]),
+            "document_display_status": (
+                None if status is None else DocumentDisplayStatusEnum.CHOICES[status][1]
+            ),
+        })
+    return points
+
+
+def _get_cells(z, x, y, source):
+    grid_size = settings.FACTORY_TILE_GRID_SIZE
+    min_lat, max_lat, min_lng, max_lng = tile_bounds(z, x, y)
+    cell_height = (max_lat - min_lat) / grid_size
+    cell_width = (max_lng - min_lng) / grid_size
+
+    # one row per (cell, factory_type, display_status), folded into cells below
+    rows = (
+        _get_factories_in_tile(z, x, y, source)
+        .annotate(
+            cell_x=Floor((F("lng") - min_lng) / cell_width),
+            cell_y=Floor((max_lat - F("lat")) / cell_height),
+            document_display_status=F("latest_document_display_status"),
+        )
+        .order_by()
+        .values("cell_x", "cell_y", "factory_type", "document_display_status")
+        .annotate(count=Count("id"), lat_sum=Sum("lat"), lng_sum=Sum("lng"))
+    )
+    return _fold_cells(rows)
+
+
+def _cell_row(factory, z, x, y):
+    """The row `_get_cells` reads for a single factory, computed in Python."""
+    grid_size = settings.FACTORY_TILE_GRID_SIZE
+    min_lat, max_lat, min_lng, max_lng = tile_bounds(z, x, y)
+    return {
+        "cell_x": math.floor((factory["lng"] - min_lng) / ((max_lng - min_lng) / grid_size)),
+        "cell_y": math.floor((max_lat - factory["lat"]) / ((max_lat - min_lat) / grid_size)),
+        "factory_type": factory["factory_type"],
+        "document_display_status": factory["document_display_status"],
+        "count": 1,
+        "lat_sum": factory["lat"],
+        "lng_sum": factory["lng"],
+    }
+
+
+def _fold_cells(rows):
+    cells = {}
+    for row in rows:
+        key = (int(row["cell_x"]), int(row["cell_y"]))
+        cell = cells.setdefault(key, {
+            "count": 0,
+            "lat_sum": 0.0,
+            "lng_sum": 0.0,
+            "factory_types": Counter(),
+            "document_display_status": Counter(),
+        })
+        cell["count"] += row["count"]
+        cell["lat_sum"] += row["lat_sum"]
+        cell["lng_sum"] += row["lng_sum"]
+        cell["factory_types"][row["factory_type"]] += row["count"]
+        status = row["document_display_status"]
+        if status is not None:
+            cell["document_display_status"][DocumentDisplayStatusEnum.CHOICES[status][1]] += row["count"]
+
+    return [
+        {
+            "x": cell_x,
+            "y": cell_y,
+            "lat": cell["lat_sum"] / cell["count"],
+            "lng": cell["lng_sum"] / cell["count"],
+            "count": cell["count"],
+            "factory_type": cell["factory_types"].most_common(1)[0][0],
+            "document_display_status": dict(cell["document_display_status"]),
+        }
+        for (cell_x, cell_y), cell in sorted(cells.items())
+    ]
+
+
+def _tile_cache_key(z, x, y, source):
+    # a tile may cover several regions, so any write drops it
+    return versioned_key(f"factory_tile:{z}:{x}:{y}:{source or ''}", [GLOBAL_SCOPE])
+
+
+def compute_factory_tile(z, x, y, source=None):
+    if z >= settings.FACTORY_TILE_POINT_ZOOM:
+        tile = {"type": "points", "points": _get_points(z, x, y, source)}
+    else:
+        tile = {
+            "type": "cells",
+            "grid_size": settings.FACTORY_TILE_GRID_SIZE,
+            "cells": _get_cells(z, x, y, source),
+        }
+    tile.update({"z": z, "x": x, "y": y})
+    cache.set(_tile_cache_key(z, x, y, source), tile, settings.FACTORY_TILE_CACHE_TIMEOUT)
+    return tile
+
+
+def get_factory_tile(z, x, y, source=None):
+    tile = cache.get(_tile_cache_key(z, x, y, source))
+    if tile is None:
+        tile = compute_factory_tile(z, x, y, source)
+    return tile
+
+
+VECTOR_TILE_LAYER = "factories"
+VECTOR_TILE_CELL_LAYER = "cells"
+EXPORTED_AT_FILENAME = ".exported_at"
+VECTOR_TILE_MIN_ZOOM = 6
+VECTOR_TILE_FIELDS = [
+    "id",
+    "display_number",
+    "lat",
+    "lng",
+    "source",
+    "factory_type",
+    "cet_report_status",
+    "document_display_status",
+]
+
+
+def _vector_tile_factories(factories):
+    return factories.annotate(
+        document_display_status=F("latest_document_display_status")
+    ).values(*VECTOR_TILE_FIELDS)
+
+
+def _vector_tile_feature(factory, z, x, y):
+    status = factory["document_display_status"]
+    properties = {
+        "id": str(factory["id"]),
+        "display_number": factory["display_number"],
+        "source": factory["source"],
+        "cet_report_status": factory["cet_report_status"],
+        "document_display_status": (
+            None if status is None else DocumentDisplayStatusEnum.CHOICES[status][1]
+        ),
+    }
+    pixel = _to_tile_pixel(factory["lat"], factory["lng"], z, x, y)
+    return factory["display_number"], pixel, properties
+
+
+def _vector_tile_cell_features(cells, z, x, y):
+    return [
+        (
+            None,
+            _to_tile_pixel(cell["lat"], cell["lng"], z, x, y),
+            {"count": cell["count"], "factory_type": cell["factory_type"]},
+        )
+        for cell in cells
+    ]
+
+
+def _encode_vector_tile(z, features):
+    if z < settings.FACTORY_TILE_POINT_ZOOM:
+        return mvt.encode_point_layer(VECTOR_TILE_CELL_LAYER, features)
+    return mvt.encode_point_layer(VECTOR_TILE_LAYER, features)
+
+
+def render_vector_tile(z, x, y):
+    """Return the encoded vector tile, or None if there is no factory in it.
+
+    Below FACTORY_TILE_POINT_ZOOM the tile holds the grid cells of
+    `get_factory_tile` instead of the factories.
+    """
+    if z < settings.FACTORY_TILE_POINT_ZOOM:
+        features = _vector_tile_cell_features(_get_cells(z, x, y, None), z, x, y)
+    else:
+        factories = _vector_tile_factories(_get_factories_in_tile(z, x, y, None)).order_by(
+            "display_number"
+        )
+        features = [_vector_tile_feature(factory, z, x, y) for factory in factories]
+    if not features:
+        return None
+    return _encode_vector_tile(z, features)
+
+
+def vector_tile_export_zooms():
+    return list(range(VECTOR_TILE_MIN_ZOOM, settings.FACTORY_TILE_POINT_ZOOM + 1))
+
+
+def vector_tile_path(z, x, y):
+    return os.path.join(settings.VECTOR_TILE_ROOT, str(z), str(x), f"{y}.mvt")
+
+
+def _write_vector_tile(z, x, y, content):
+    path = vector_tile_path(z, x, y)
+    if content is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as fw:
+        fw.write(content)
+    os.replace(tmp_path, path)
+
+
+def vector_tiles_exported_at():
+    """When the last export started, None if the tiles were never exported or stored."""
+    path = os.path.join(settings.VECTOR_TILE_ROOT, EXPORTED_AT_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return parse_datetime(f.read().strip())
+
+
+def _write_exported_at(exported_at):
+    os.makedirs(settings.VECTOR_TILE_ROOT, exist_ok=True)
+    path = os.path.join(settings.VECTOR_TILE_ROOT, EXPORTED_AT_FILENAME)
+    with open(path, "w") as fw:
+        fw.write(exported_at.isoformat())
+
+
+def get_vector_tile(z, x, y):
+    """Return the exported vector tile, rendering and storing it if it is missing."""
+    path = vector_tile_path(z, x, y)
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    if vector_tiles_exported_at() is None:
+        # the changes made from now on are rendered into the stored tile by
+        # the next incremental export
+        _write_exported_at(timezone.now())
+    content = render_vector_tile(z, x, y)
+    _write_vector_tile(z, x, y, content)
+    return content
+
+
+def export_all_vector_tiles(zooms):
+    """Render every non-empty tile of the given zoom levels with a single pass over factories."""
+    factories = _vector_tile_factories(Factory.objects.order_by("display_number"))
+
+    features = defaultdict(list)
+    cell_rows = defaultdict(list)
+    for factory in factories.iterator():
+        for z in zooms:
+            x, y = lat_lng_to_tile(factory["lat"], factory["lng"], z)
+            if z < settings.FACTORY_TILE_POINT_ZOOM:
+                cell_rows[(z, x, y)].append(_cell_row(factory, z, x, y))
+            else:
+                features[(z, x, y)].append(_vector_tile_feature(factory, z, x, y))
+    for (z, x, y), rows in cell_rows.items():
+        features[(z, x, y)] = _vector_tile_cell_features(_fold_cells(rows), z, x, y)
+
+    for (z, x, y), tile_features in features.items():
+        _write_vector_tile(z, x, y, _encode_vector_tile(z, tile_features))
+
+    # tiles whose factories are all gone
+    for z in zooms:
+        for x, y in tiles_covering_taiwan(z):
+            if (z, x, y) not in features:
+                _write_vector_tile(z, x, y, None)
+
+    return len(features)
+
+
+def export_changed_vector_tiles(zooms, since):
+    """Render again the tiles containing factories or documents changed after `since`.
+
+    That is the tiles of their current positions and of the positions
+    factories left. The tiles of `zooms` are written whether they existed or
+    not, the tiles of the other exported zoom levels only when they were
+    stored on demand.
+    """
+    positions = set(
+        Factory.raw_objects.filter(updated_at__gt=since).values_list("lat", "lng")
+    )
+    positions.update(
+        Document.raw_objects.filter(updated_at__gt=since, factory__isnull=False).values_list(
+            "factory__lat", "factory__lng"
+        )
+    )
+    positions.update(
+        VacatedPosition.objects.filter(created_at__gt=since).values_list("lat", "lng")
+    )
+
+    all_zooms = set(zooms).union(vector_tile_export_zooms())
+    dirty_tiles = {(z, *lat_lng_to_tile(lat, lng, z)) for lat, lng in positions for z in all_zooms}
+    n_tiles = 0
+    for z, x, y in dirty_tiles:
+        if z in zooms or os.path.exists(vector_tile_path(z, x, y)):
+            _write_vector_tile(z, x, y, render_vector_tile(z, x, y))
+            n_tiles += 1
+
+    # the exports from now on start after them
+    VacatedPosition.objects.filter(created_at__lte=since).delete()
+    return n_tiles
+
+
+def export_vector_tiles(zooms, full=False):
+    """Export the tiles changed since the last export, or every tile if there was none.
+
+    Returns the number of tiles written.
+    """
+    since = None if full else vector_tiles_exported_at()
+    # taken before reading any row, so changes made during the export are picked up next time
+    started_at = timezone.now()
+    if since is None:
+        n_tiles = export_all_vector_tiles(zooms)
+    else:
+        n_tiles = export_changed_vector_tiles(zooms, since)
+    _write_exported_at(started_at)
+    return n_tiles
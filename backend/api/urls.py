@@ -19,23 +19,31 @@ from django.urls import path
 from .views import (
     get_nearby_or_create_factories,
     update_factory_attribute,
+    post_factories_import,
     get_factory_report,
     post_image_url,
     post_factory_image_url,
+    post_factory_images_batch,
     get_factories_count_by_townname,
     get_images_count_by_townname,
     get_report_records_count_by_townname,
     get_statistics_total,
     get_factory_location,
     get_action_change,
+    get_factory_tile,
+    get_factory_vector_tile,
 )
 
 urlpatterns = [
     path("factories", get_nearby_or_create_factories),
+    path("factories/import", post_factories_import),
     path("sectcode", get_factory_by_sectcode),
+    path("factories/tiles/<int:z>/<int:x>/<int:y>", get_factory_tile),
+    path("factories/tiles/<int:z>/<int:x>/<int:y>.mvt", get_factory_vector_tile),
     path("factories/<factory_id>", update_factory_attribute),
     path("factories/<factory_id>/report_records", get_factory_report),
     path("factories/<factory_id>/images", post_factory_image_url),
+    path("factories/<factory_id>/images:batch", post_factory_images_batch),
     path("factories/<factory_id>/location", get_factory_location),
     path("statistics/factories", get_factories_count_by_townname),
     path("statistics/images", get_images_count_by_townname),
@@ -8,14 +8,21 @@ from django.utils.datastructures import MultiValueDictKeyError
 from django.db import transaction
 from django_q.tasks import async_task
 from rest_framework.decorators import api_view
-from django.db.models import Max, Q
+from django.db.models import Q
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from .utils import _get_nearby_factories, _get_client_ip
-from ..models import Factory, Image, ReportRecord
+from ..models import (
+    Factory,
+    Image,
+    ReportRecord,
+    allocate_display_numbers,
+    refresh_factory_summary,
+)
 from ..serializers import FactorySerializer
+from ..statistics import mark_towns_stale
 
 LOGGER = logging.getLogger("django")
 FactoryDoesNotExist = Factory.DoesNotExist
@@ -100,15 +107,12 @@ def _handle_create_factory(request):
             status=400,
         )
 
-    num = Factory.raw_objects.aggregate(Max("display_number"))
-
     new_factory_field = {
         "name": post_body["name"],
         "lat": post_body["lat"],
         "lng": post_body["lng"],
         "factory_type": post_body.get("type"),
         "status_time": datetime.datetime.now(),
-        "display_number": num["display_number__max"] + 1,
     }
 
     new_report_record_field = {
@@ -120,7 +124,10 @@ def _handle_create_factory(request):
     }
 
     with transaction.atomic():
-        new_factory = Factory.objects.create(**new_factory_field)
+        new_factory = Factory.objects.create(
+            display_number=allocate_display_numbers()[0],
+            **new_factory_field,
+        )
         report_record = ReportRecord.objects.create(
             factory=new_factory,
             **new_report_record_field,
@@ -128,6 +135,9 @@ def _handle_create_factory(request):
         Image.objects.filter(id__in=image_ids).update(
             factory=new_factory, report_record=report_record
         )
+        refresh_factory_summary([new_factory.id])
+        mark_towns_stale([new_factory.townname])
+        new_factory.refresh_from_db()
     serializer = FactorySerializer(new_factory)
     LOGGER.info(
         f"{user_ip}: <Create new factory> at {(post_body['lng'], post_body['lat'])} "
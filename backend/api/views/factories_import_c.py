@@ -0,0 +1,77 @@
+import logging
+
+from django.http import HttpResponse, JsonResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+
+from ..factory_import import CSV, NDJSON, import_factories, iter_rows
+from .utils import _get_client_ip
+
+LOGGER = logging.getLogger("django")
+
+CONTENT_TYPE_FORMATS = {
+    "application/x-ndjson": NDJSON,
+    "text/csv": CSV,
+}
+
+
+@swagger_auto_schema(
+    method="post",
+    operation_summary="批次匯入工廠（限管理員）",
+    operation_description=(
+        "body 為 NDJSON（Content-Type: application/x-ndjson）或有標題列的 CSV"
+        "（Content-Type: text/csv），每列一間工廠，欄位同新增工廠"
+    ),
+    manual_parameters=[
+        openapi.Parameter(
+            name="source",
+            in_=openapi.IN_QUERY,
+            description="沒有 source 欄位的工廠的來源，G 為政府、U 為使用者",
+            type=openapi.TYPE_STRING,
+        ),
+    ],
+    responses={
+        200: openapi.Response(
+            "匯入結果",
+            openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "created": openapi.Schema(type=openapi.TYPE_INTEGER),
+                    "errors": openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(type=openapi.TYPE_OBJECT),
+                    ),
+                },
+            ),
+        ),
+        400: "request failed",
+    },
+)
+@api_view(["POST"])
+@permission_classes([IsAdminUser])
+def post_factories_import(request):
+    content_type = request.content_type.split(";")[0].strip()
+    format = CONTENT_TYPE_FORMATS.get(content_type)
+    if format is None:
+        return HttpResponse(
+            f"Content-Type should be one of {', '.join(CONTENT_TYPE_FORMATS)}",
+            status=400,
+        )
+
+    defaults = {}
+    if "source" in request.GET:
+        defaults["source"] = request.GET["source"]
+
+    try:
+        result = import_factories(iter_rows(request.stream or [], format), defaults=defaults)
+    except ValueError as e:
+        return HttpResponse(f"malformed {format} body: {e}", status=400)
+
+    LOGGER.info(
+        f"{_get_client_ip(request)}: <Import factories> created {result['created']}, "
+        f"rejected {len(result['errors'])}"
+    )
+    return JsonResponse(result)
@@ -5,14 +5,17 @@ from rest_framework.decorators import api_view
 
 from django.db import transaction
 from django.http import JsonResponse, HttpResponse
+from django.utils import timezone
+from django.views.decorators.http import condition
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from ..models import Factory, ReportRecord
 from ..serializers import FactorySerializer
+from ..response_cache import cache_response, get_factory_scopes
 
-from .utils import _get_client_ip
+from .utils import _get_client_ip, _get_factory_etag, _prefetch_factory_relations
 
 from django.core.exceptions import ObjectDoesNotExist
 
@@ -21,7 +24,7 @@ LOGGER = logging.getLogger("django")
 
 def _handle_get_factory_attributes(request, factory_id):
     try:
-        factory = Factory.objects.get(pk=factory_id)
+        factory = _prefetch_factory_relations(Factory.objects).get(pk=factory_id)
         serializer = FactorySerializer(factory)
         return JsonResponse(serializer.data, safe=False)
     except ObjectDoesNotExist:
@@ -58,6 +61,8 @@ def _handle_update_factory_attributes(request, factory_id):
 
     if "status" in put_body:
         updated_factory_fields["status_time"] = datetime.now()
+    # `update()` skips auto_now, but the ETag of the factory relies on it
+    updated_factory_fields["updated_at"] = timezone.now()
 
     new_report_record_fields = {
         "factory_id": factory_id,
@@ -90,6 +95,8 @@ def _handle_update_factory_attributes(request, factory_id):
     auto_schema=None,
 )
 @api_view(["PUT", "GET"])
+@condition(etag_func=_get_factory_etag)
+@cache_response(get_factory_scopes, conditional=False)
 def update_factory_attribute(request, factory_id):
     if request.method == "PUT":
         return _handle_update_factory_attributes(request, factory_id)
@@ -2,8 +2,10 @@ import json
 import logging
 from datetime import datetime
 
+from django.conf import settings
 from django.http import HttpResponse, JsonResponse
 from django.db import transaction
+from django_q.tasks import async_task
 from rest_framework.decorators import api_view
 
 from api.models import Image, Factory, ReportRecord
@@ -100,5 +102,8 @@ def post_factory_image_url(request, factory_id):
             deletehash=post_body.get("deletehash"),
         )
 
+    async_task("api.tasks.make_image_variants", [image.id])
+    if settings.IMAGE_EXIF_FROM_SERVER:
+        async_task("api.tasks.update_images_exif", [image.id])
     img_serializer = ImageSerializer(image)
     return JsonResponse(img_serializer.data, safe=False)
@@ -0,0 +1,138 @@
+import json
+import logging
+from datetime import datetime
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.db import transaction
+from django.utils import timezone
+from django_q.tasks import async_task
+from rest_framework.decorators import api_view
+
+from api.models import Image, Factory, ReportRecord, refresh_factory_summary
+from api.response_cache import invalidate_responses
+from api.serializers import ImageSerializer
+from api.statistics import mark_towns_stale
+from .utils import _get_client_ip
+
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+
+LOGGER = logging.getLogger("django")
+
+MAX_BATCH_IMAGES = 50
+
+
+def _parse_orig_time(image_body):
+    if "DateTimeOriginal" not in image_body:
+        return None
+    orig_time_str = image_body["DateTimeOriginal"]
+    try:
+        return timezone.make_aware(datetime.strptime(orig_time_str, "%Y:%m:%d %H:%M:%S"))
+    except (TypeError, ValueError):
+        LOGGER.warning(f"post_factory_images_batch cannot parse DateTimeOriginal {orig_time_str}")
+        return None
+
+
+@swagger_auto_schema(
+    method="post",
+    operation_summary="上傳指定 id 的工廠的多張圖片",
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "images": openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                description=f"at most {MAX_BATCH_IMAGES} images",
+                items=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        "url": openapi.Schema(
+                            type=openapi.TYPE_STRING,
+                            description="image url",
+                        ),
+                        "deletehash": openapi.Schema(
+                            type=openapi.TYPE_STRING,
+                            description="image delete hash",
+                        ),
+                        "DateTimeOriginal": openapi.Schema(
+                            type=openapi.TYPE_STRING,
+                            description="YYYY:mm:dd HH:MM:SS",
+                        ),
+                    },
+                ),
+            ),
+            "nickname": openapi.Schema(type=openapi.TYPE_STRING),
+            "contact": openapi.Schema(type=openapi.TYPE_STRING),
+        },
+    ),
+    responses={
+        200: openapi.Response("圖片資料", ImageSerializer(many=True)),
+        400: "request failed",
+    },
+    auto_schema=None,
+)
+@api_view(["POST"])
+def post_factory_images_batch(request, factory_id):
+    user_ip = _get_client_ip(request)
+
+    try:
+        post_body = request.data
+    except json.JSONDecodeError:
+        LOGGER.error(f"post_factory_images_batch received non-json body from {user_ip}")
+        return HttpResponse("Post body should be JSON", status=400)
+
+    images_body = post_body.get("images")
+    if not isinstance(images_body, list) or not images_body:
+        LOGGER.error(f"post_factory_images_batch received no images from {user_ip}")
+        return HttpResponse("`images` should be a non-empty list in post body", status=400)
+
+    if len(images_body) > MAX_BATCH_IMAGES:
+        return HttpResponse(f"At most {MAX_BATCH_IMAGES} images can be posted at once", status=400)
+
+    if not all(isinstance(image_body, dict) and "url" in image_body for image_body in images_body):
+        LOGGER.error(f"post_factory_images_batch received an image without url from {user_ip}")
+        return HttpResponse("`url` should be in every image", status=400)
+
+    if not Factory.objects.filter(pk=factory_id).exists():
+        LOGGER.warning(
+            f"post_factory_images_batch receiving {factory_id} that does not exist from {user_ip}"
+        )
+        return HttpResponse(
+            f"Factory ID {factory_id} does not exist.",
+            status=400,
+        )
+
+    LOGGER.info(f"post_factory_images_batch {len(images_body)} images from {user_ip}")
+
+    with transaction.atomic():
+        factory = Factory.objects.only("id", "townname").get(pk=factory_id)
+        report_record = ReportRecord.objects.create(
+            factory=factory,
+            action_type="POST_IMAGE",
+            action_body={},
+            nickname=post_body.get("nickname"),
+            contact=post_body.get("contact"),
+        )
+        images = Image.objects.bulk_create([
+            Image(
+                image_path=image_body["url"],
+                orig_lat=image_body.get("Latitude"),
+                orig_lng=image_body.get("Longitude"),
+                orig_time=_parse_orig_time(image_body),
+                report_record=report_record,
+                factory=factory,
+                deletehash=image_body.get("deletehash"),
+            )
+            for image_body in images_body
+        ])
+        # `bulk_create` doesn't send the signals keeping the summaries
+        refresh_factory_summary([factory.id])
+        mark_towns_stale([factory.townname])
+        invalidate_responses([factory.id], [factory.townname])
+
+    image_ids = [image.id for image in images]
+    async_task("api.tasks.make_image_variants", image_ids)
+    if settings.IMAGE_EXIF_FROM_SERVER:
+        async_task("api.tasks.update_images_exif", image_ids)
+    img_serializer = ImageSerializer(images, many=True)
+    return JsonResponse(img_serializer.data, safe=False)
@@ -6,6 +6,7 @@ from django.core.exceptions import ObjectDoesNotExist
 
 from ..models import Factory
 from ..serializers import FactoryLocationSerializer
+from ..response_cache import cache_response, get_factory_scopes
 
 
 @swagger_auto_schema(
@@ -15,6 +16,7 @@ from ..serializers import FactoryLocationSerializer
         "工廠位置資料", FactoryLocationSerializer), 400: "request failed"},
 )
 @api_view(["GET"])
+@cache_response(get_factory_scopes)
 def get_factory_location(request, factory_id: str):
     try:
         factory = Factory.objects.get(pk=factory_id)
@@ -1,12 +1,15 @@
 from rest_framework.decorators import api_view
 
 from django.http import JsonResponse
+from django.views.decorators.http import condition
 
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 from ..models import ReportRecord
 from ..serializers import ReportRecordSerializer
+from ..response_cache import cache_response, get_factory_scopes
+from .utils import _get_factory_etag
 
 
 @swagger_auto_schema(
@@ -17,6 +20,8 @@ from ..serializers import ReportRecordSerializer
     },
 )
 @api_view(["GET"])
+@condition(etag_func=_get_factory_etag)
+@cache_response(get_factory_scopes, conditional=False)
 def get_factory_report(request, factory_id):
     if request.method == "GET":
         report_records = ReportRecord.objects.filter(factory__id=factory_id).order_by("created_at")
@@ -0,0 +1,90 @@
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control
+from rest_framework.decorators import api_view
+
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+
+from .. import tiles
+
+
+@swagger_auto_schema(
+    method="get",
+    operation_summary="取得地圖圖磚範圍內的工廠 (低縮放等級為網格統計，高縮放等級為工廠位置)",
+    responses={
+        200: openapi.Response(
+            "圖磚資料",
+            openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "type": openapi.Schema(
+                        type=openapi.TYPE_STRING,
+                        description=f"cells: 網格統計, points: 工廠位置 (z >= {settings.FACTORY_TILE_POINT_ZOOM})",
+                    ),
+                    "cells": openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        description="每格的工廠數量、最多的工廠類型與公文狀態統計",
+                        items=openapi.Schema(type=openapi.TYPE_OBJECT),
+                    ),
+                    "points": openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        description="工廠位置",
+                        items=openapi.Schema(type=openapi.TYPE_OBJECT),
+                    ),
+                },
+            ),
+        ),
+        400: "request failed",
+    },
+    manual_parameters=[
+        openapi.Parameter(
+            name="source",
+            in_=openapi.IN_QUERY,
+            description="U: 使用者新增的工廠, G: 政府公開資料, 不輸入的話兩者都包含",
+            type=openapi.TYPE_STRING,
+            required=False,
+        ),
+    ],
+)
+@api_view(["GET"])
+def get_factory_tile(request, z, x, y):
+    if not tiles.is_valid_tile(z, x, y):
+        return HttpResponse(f"Invalid tile {z}/{x}/{y}.", status=400)
+
+    source = request.GET.get("source", None)
+    if source and source not in ["G", "U"]:
+        return HttpResponse("source: ['G' or 'U']", status=400)
+
+    tile = tiles.get_factory_tile(z, x, y, source)
+    response = JsonResponse(tile)
+    # writes drop the cached tile, clients have to come back for it
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+@swagger_auto_schema(
+    method="get",
+    operation_summary="取得地圖圖磚範圍內的工廠 (Mapbox Vector Tile)",
+    responses={
+        200: "application/vnd.mapbox-vector-tile",
+        204: "圖磚內沒有工廠",
+        400: "request failed",
+        404: "不提供此縮放等級",
+    },
+)
+@api_view(["GET"])
+def get_factory_vector_tile(request, z, x, y):
+    if not tiles.is_valid_tile(z, x, y):
+        return HttpResponse(f"Invalid tile {z}/{x}/{y}.", status=400)
+
+    if z not in tiles.vector_tile_export_zooms():
+        return HttpResponse(f"No vector tiles of zoom {z}.", status=404)
+
+    content = tiles.get_vector_tile(z, x, y)
+    if content is None:
+        response = HttpResponse(status=204)
+    else:
+        response = HttpResponse(content, content_type="application/vnd.mapbox-vector-tile")
+    patch_cache_control(response, public=True, max_age=settings.FACTORY_TILE_CACHE_TIMEOUT)
+    return response
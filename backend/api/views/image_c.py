@@ -2,7 +2,9 @@ import json
 import logging
 from datetime import datetime
 
+from django.conf import settings
 from django.http import HttpResponse, JsonResponse
+from django_q.tasks import async_task
 from rest_framework.decorators import api_view
 
 from drf_yasg.utils import swagger_auto_schema
@@ -82,4 +84,7 @@ def post_image_url(request):
         deletehash=post_body.get("deletehash"),
     )
 
+    async_task("api.tasks.make_image_variants", [image.id])
+    if settings.IMAGE_EXIF_FROM_SERVER:
+        async_task("api.tasks.update_images_exif", [image.id])
     return JsonResponse({"token": image.id})
@@ -2,53 +2,36 @@ from django.http import HttpResponse, JsonResponse
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.decorators import api_view
-from django.db.models import Q
+from django.db.models import Sum
 
-from ..models import Factory, Document, Image, ReportRecord
+from ..models import Document, ReportRecord, TownStatistics
 from ..models.const import DocumentDisplayStatusConst
 from ..models.document import DocumentDisplayStatusEnum
+from ..response_cache import cache_response, get_global_scopes, get_townname_scopes
+from ..statistics import count_factories_by_city, split_townname
 from ..utils import normalize_townname
 from .zipcode import ZIP_CODE
 
 
-def _generate_factories_query_set(townname, source, display_status):
-    # display_status
-    if display_status is not None:
+def _display_status_error():
+    display_status_choices = ",".join(DocumentDisplayStatusConst.STATUS_LIST_ENRICHMENT)
+    return HttpResponse(f"display_status: [{display_status_choices}]", status=400)
 
-        docs = (
-            Document.objects.only("id", "factory_id")
-            .order_by("factory_id", "-created_at")
-            .distinct("factory_id")
-        )
 
-        display_status_options = map(
-            (lambda item: item[1]), DocumentDisplayStatusEnum.CHOICES)
-        if display_status == DocumentDisplayStatusConst.IN_PROGRESS:
-            display_status = [
-                DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.AUDIT_SCHEDULED],
-                DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.COMMUNICATION_PERIOD],
-                DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.WORK_STOPPED],
-                DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.DEMOLITION_SCHEDULED],
-            ]
-            docs = docs.filter(display_status__in=display_status)
-        else:
-            if display_status not in display_status_options:
-                display_status_choices = ",".join(display_status_options)
-                return HttpResponse(f"display_status: [{display_status_choices}]", status=400)
-            display_status = DocumentDisplayStatusEnum.INDICES[display_status]
-            docs = docs.filter(display_status=display_status)
-
-        factory_id_list = list(map(lambda item: item.factory_id, docs))
-        queryset = Factory.objects.filter(id__in=factory_id_list)
-    else:
-        queryset = Factory.objects
+def _generate_town_statistics_query_set(townname, source, display_status):
+    queryset = TownStatistics.objects.all()
+
+    # display_status, rows without one count all the factories
+    queryset = queryset.filter(
+        display_status=TownStatistics.DISPLAY_STATUS_INDICES.get(display_status)
+    )
 
     # townname
     if townname:
-        queryset = queryset.filter(
-            Q(townname__startswith=townname) | Q(
-                townname__startswith=f"臺灣省{townname}")
-        )
+        city, town = split_townname(townname)
+        queryset = queryset.filter(city=city)
+        if town:
+            queryset = queryset.filter(town=town)
 
     # source
     if source is not None:
@@ -146,6 +129,7 @@ def _generate_factories_query_set(townname, source, display_status):
     ],
 )
 @api_view(["GET"])
+@cache_response(get_global_scopes)
 def get_factories_count_by_townname(request):
     townname = request.GET.get("townname", None)
     if townname:
@@ -156,6 +140,9 @@ def get_factories_count_by_townname(request):
         return HttpResponse("source: ['G' or 'U']", status=400)
 
     display_status = request.GET.get("display_status", None)
+    if display_status is not None and display_status not in TownStatistics.DISPLAY_STATUS_INDICES:
+        return _display_status_error()
+
     level = request.GET.get("level", None)
     if level and (level != "city" and level != "town"):
         return HttpResponse(400, "level should be city or town")
@@ -180,65 +167,48 @@ def get_factories_count_by_townname(request):
             if town:
                 level = "town"
 
-    # all
-    result = _get_factories_information(None, source, display_status)
-    if level is None:
-        return JsonResponse(result)
+    counts = (
+        _generate_town_statistics_query_set(None, source, display_status)
+        .values("city", "town")
+        .annotate(
+            n_factories=Sum("factories"),
+            n_documents=Sum("documents"),
+            n_report_records=Sum("report_records"),
+        )
+    )
 
-    # cities
-    result["cities"] = {}
-    for city in cities:
-        result["cities"][city] = _get_factories_information(
-            city, source, display_status)
+    def _empty():
+        return {"factories": 0, "documents": 0, "report_records": 0}
 
-    if level == "city":
-        return JsonResponse(result)
+    def _add(data, row):
+        data["factories"] += row["n_factories"]
+        # Because the factories are filtered by document, so the number of factories should be equal to number of documents
+        data["documents"] += row["n_factories"] if display_status else row["n_documents"]
+        data["report_records"] += row["n_report_records"]
 
-    # towns
-    for city in cities:
-        if town:
-            towns = [town]
-        elif not town:
-            towns = ZIP_CODE[city].keys()
-        else:
-            towns = []
-
-        # towns
-        result["cities"][city]["towns"] = {}
-        for item in towns:
-            full_town_name = f"{city}{item}"
-            data = _get_factories_information(
-                full_town_name, source, display_status)
-            result["cities"][city]["towns"][item] = data
+    # all
+    result = _empty()
+    if level is not None:
+        # cities
+        result["cities"] = {city: _empty() for city in cities}
+        if level == "town":
+            # towns
+            for city in cities:
+                towns = [town] if town else ZIP_CODE[city].keys()
+                result["cities"][city]["towns"] = {item: _empty() for item in towns}
+
+    for row in counts:
+        _add(result, row)
+        if level is None or row["city"] not in result["cities"]:
+            continue
+        city_data = result["cities"][row["city"]]
+        _add(city_data, row)
+        if level == "town" and row["town"] in city_data["towns"]:
+            _add(city_data["towns"][row["town"]], row)
 
     return JsonResponse(result)
 
 
-def _get_factories_information(townname, source, display_status):
-    factories_queryset = _generate_factories_query_set(
-        townname, source, display_status)
-    n_factories = factories_queryset.count()
-
-    id_list = factories_queryset.values_list("id", flat=True)
-    report_records_queryset = ReportRecord.objects.prefetch_related("factory").filter(
-        factory__in=id_list
-    )
-    if display_status:
-        # Because the factories are filtered by document, so the number of factories should be equal to number of documents
-        n_documents = n_factories
-    else:
-        documents_queryset = Document.objects.prefetch_related("factory").filter(
-            factory__in=id_list
-        )
-        n_documents = documents_queryset.count()
-
-    return {
-        "factories": n_factories,
-        "documents": n_documents,
-        "report_records": report_records_queryset.count(),
-    }
-
-
 @swagger_auto_schema(
     method="get",
     operation_summary="取得某個地區的照片的數量",
@@ -287,6 +257,7 @@ def _get_factories_information(townname, source, display_status):
     ],
 )
 @api_view(["GET"])
+@cache_response(get_townname_scopes)
 def get_images_count_by_townname(request):
     townname = request.GET.get("townname", None)
     if townname:
@@ -294,13 +265,13 @@ def get_images_count_by_townname(request):
     source = request.GET.get("source", None)
     display_status = request.GET.get("display_status", None)
 
-    factories_queryset = _generate_factories_query_set(
-        townname, source, display_status)
-    id_list = factories_queryset.values_list("id", flat=True)
-    queryset = Image.objects.prefetch_related(
-        "factory").filter(factory__id__in=id_list)
+    if display_status is not None and display_status not in TownStatistics.DISPLAY_STATUS_INDICES:
+        return _display_status_error()
 
-    return JsonResponse({"count": queryset.count()})
+    queryset = _generate_town_statistics_query_set(townname, source, display_status)
+    count = queryset.aggregate(count=Sum("images"))["count"] or 0
+
+    return JsonResponse({"count": count})
 
 
 @swagger_auto_schema(
@@ -351,6 +322,7 @@ def get_images_count_by_townname(request):
     ],
 )
 @api_view(["GET"])
+@cache_response(get_townname_scopes)
 def get_report_records_count_by_townname(request):
     townname = request.GET.get("townname", None)
     if townname:
@@ -358,13 +330,13 @@ def get_report_records_count_by_townname(request):
     source = request.GET.get("source", None)
     display_status = request.GET.get("display_status", None)
 
-    factories_queryset = _generate_factories_query_set(
-        townname, source, display_status)
-    id_list = factories_queryset.values_list("id", flat=True)
-    queryset = ReportRecord.objects.prefetch_related(
-        "factory").filter(factory__in=id_list)
+    if display_status is not None and display_status not in TownStatistics.DISPLAY_STATUS_INDICES:
+        return _display_status_error()
+
+    queryset = _generate_town_statistics_query_set(townname, source, display_status)
+    count = queryset.aggregate(count=Sum("report_records"))["count"] or 0
 
-    return JsonResponse({"count": queryset.count()})
+    return JsonResponse({"count": count})
 
 
 @swagger_auto_schema(
@@ -422,61 +394,10 @@ def get_report_records_count_by_townname(request):
     },
 )
 @api_view(["GET"])
+@cache_response(get_global_scopes)
 def get_statistics_total(request):
-    result = {}
-    cities = ZIP_CODE.keys()
-    for city in cities:
-        city = city.replace("台", "臺")
-        result[city] = {}
-
-        # factories
-        factories = Factory.objects.filter(
-            Q(townname__startswith=city) | Q(townname__startswith=f"臺灣省{city}")
-        )
-        result[city]["factories"] = factories.count()
-
-        # report records
-        factory_id_list = factories.values_list("id", flat=True)
-        report_records = (
-            ReportRecord.objects.prefetch_related("factory")
-            .filter(factory__id__in=factory_id_list)
-            .distinct("factory_id")
-        )
-        result[city]["report_records"] = report_records.count()
-
-        # display_status
-        docs = (
-            Document.objects.prefetch_related("factory")
-            .order_by("factory__id", "-created_at")
-            .distinct("factory__id")
-            .filter(factory__id__in=factory_id_list)
-        )
-
-        result[city]["documents"] = docs.count()
-
-        # 處理中
-        result[city][DocumentDisplayStatusConst.OPEN] = 0
-        result[city][DocumentDisplayStatusConst.IN_PROGRESS] = 0
-        result[city][DocumentDisplayStatusConst.POWER_OUTED] = 0
-        result[city][DocumentDisplayStatusConst.DEMOLISHED] = 0
-
-        for doc in docs:
-            if doc.display_status == DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.REPORTED]:
-                result[city][DocumentDisplayStatusConst.OPEN] += 1
-            elif (
-                doc.display_status == DocumentDisplayStatusEnum.INDICES[
-                    DocumentDisplayStatusConst.AUDIT_SCHEDULED]
-                or doc.display_status == DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.COMMUNICATION_PERIOD]
-                or doc.display_status == DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.WORK_STOPPED]
-                or doc.display_status == DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.DEMOLITION_SCHEDULED]
-            ):
-                result[city][DocumentDisplayStatusConst.IN_PROGRESS] += 1
-            elif doc.display_status == DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.POWER_OUTING]:
-                result[city][DocumentDisplayStatusConst.POWER_OUTED] += 1
-            elif doc.display_status == DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.DEMOLISHED]:
-                result[city][DocumentDisplayStatusConst.DEMOLISHED] += 1
-
-    return JsonResponse(result)
+    cities = [normalize_townname(city) for city in ZIP_CODE.keys()]
+    return JsonResponse(count_factories_by_city(cities))
 
 
 @swagger_auto_schema(
@@ -505,6 +426,7 @@ def get_statistics_total(request):
     },
 )
 @api_view(["GET"])
+@cache_response(get_global_scopes)
 def get_action_change(request):
     result = {}
 
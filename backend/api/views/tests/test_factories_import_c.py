@@ -0,0 +1,120 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from api.factory_import import import_factories
+from api.models import Factory, TownStatistics
+from api.statistics import refresh_stale_town_statistics
+from towninfo.boundaries import TownBoundaries
+
+
+pytestmark = pytest.mark.django_db
+
+
+def _ndjson(rows):
+    return "\n".join(json.dumps(row, ensure_ascii=False) for row in rows)
+
+
+def test_import_ndjson(admin_client):
+    rows = [
+        {"name": "工廠 A", "lat": 23.234, "lng": 120.1, "type": "2-3", "townname": "臺東縣池上鄉"},
+        {"name": "工廠 B", "lat": 23.235, "lng": 120.1, "type": "6", "townname": "臺東縣池上鄉"},
+        {"name": "工廠 C", "lat": 50, "lng": 120.1},
+    ]
+    resp = admin_client.post(
+        "/api/factories/import?source=G",
+        data=_ndjson(rows),
+        content_type="application/x-ndjson",
+    )
+
+    assert resp.status_code == 200
+    result = resp.json()
+    assert result["created"] == 2
+    assert [error["row"] for error in result["errors"]] == [3]
+    assert "lat" in result["errors"][0]["errors"]
+
+    factories = Factory.objects.filter(name__in=["工廠 A", "工廠 B"]).order_by("display_number")
+    assert [(f.name, f.factory_type, f.source) for f in factories] == [
+        ("工廠 A", "2-3", "G"),
+        ("工廠 B", "6", "G"),
+    ]
+    assert factories[1].display_number == factories[0].display_number + 1
+
+    refresh_stale_town_statistics()
+    row = TownStatistics.objects.get(city="臺東縣", town="池上鄉", source="G", display_status=None)
+    assert row.factories == 2
+
+
+def test_import_csv(admin_client):
+    body = "name,lat,lng,type,source\n工廠 A,23.234,120.1,,U\n工廠 B,23.234,120.1,2-1,G\n"
+    resp = admin_client.post("/api/factories/import", data=body, content_type="text/csv")
+
+    assert resp.status_code == 200
+    assert resp.json() == {"created": 2, "errors": []}
+    assert Factory.objects.get(name="工廠 A").factory_type is None
+    assert Factory.objects.get(name="工廠 B").source == "G"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_import_enqueues_landcode_tasks_per_chunk():
+    rows = [{"name": f"工廠 {idx}", "lat": 23.234, "lng": 120.1} for idx in range(3)]
+    rows[0]["landcode"] = "03750000"
+
+    with patch("api.factory_import.async_task") as mock_async_task:
+        result = import_factories(rows, chunk_size=2)
+
+    assert result["created"] == 3
+    assert [call.args[0] for call in mock_async_task.call_args_list] == [
+        "api.tasks.update_landcodes",
+        "api.tasks.update_landcodes",
+    ]
+    assert [len(call.args[1]) for call in mock_async_task.call_args_list] == [1, 1]
+
+
+def test_import_names_towns_offline():
+    towns = TownBoundaries([{
+        "type": "Feature",
+        "properties": {"TOWNCODE": "10014060"},
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [[[121.2, 23.0], [121.3, 23.0], [121.3, 23.2], [121.2, 23.2], [121.2, 23.0]]],
+        },
+    }])
+    rows = [
+        {"name": "工廠 A", "lat": 23.1, "lng": 121.25, "source": "G"},
+        {"name": "工廠 B", "lat": 23.1, "lng": 121.25, "source": "G", "townname": "臺南市善化區"},
+    ]
+    with patch("api.factory_import.easymap.get_default_client") as mock_client:
+        mock_client.return_value.towns = towns
+        assert import_factories(rows)["created"] == 2
+
+    factory = Factory.objects.get(name="工廠 A")
+    assert (factory.towncode, factory.townname) == ("V10", "臺灣省臺東縣池上鄉")
+    assert Factory.objects.get(name="工廠 B").townname == "臺南市善化區"
+    refresh_stale_town_statistics()
+    row = TownStatistics.objects.get(city="臺東縣", town="池上鄉", source="G", display_status=None)
+    assert row.factories == 1
+
+
+def test_import_is_for_admins_only(client):
+    resp = client.post("/api/factories/import", data="", content_type="application/x-ndjson")
+    assert resp.status_code == 403
+
+
+def test_import_rejects_unknown_content_type(admin_client):
+    resp = admin_client.post("/api/factories/import", data={}, content_type="application/json")
+    assert resp.status_code == 400
+
+
+def test_import_rejects_malformed_body(admin_client):
+    resp = admin_client.post(
+        "/api/factories/import", data="{not json", content_type="application/x-ndjson"
+    )
+    assert resp.status_code == 400
+
+
+@pytest.mark.parametrize("body", ["[1, 2]", "null", "5"])
+def test_import_rejects_rows_other_than_objects(admin_client, body):
+    resp = admin_client.post("/api/factories/import", data=body, content_type="application/x-ndjson")
+    assert resp.status_code == 400
@@ -4,7 +4,7 @@ from uuid import uuid4
 import pytest
 from freezegun import freeze_time
 
-from api.models import Factory, ReportRecord
+from api.models import Factory, ReportRecord, Image
 
 
 pytestmark = pytest.mark.django_db
@@ -119,6 +119,26 @@ def test_get_single_factory(client, factory):
     assert resp_data["cet_report_status"] == factory.cet_report_status
 
 
+def test_conditional_get_single_factory(client, factory, django_assert_num_queries):
+    url = f"/api/factories/{factory.id}"
+    etag = client.get(url)["ETag"]
+
+    with django_assert_num_queries(1):
+        resp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 304
+
+    image = Image.objects.create(image_path="https://i.imgur.com/RxArJUc.png", factory=factory)
+    resp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert len(resp.json()["images"]) == 1
+
+    etag = resp["ETag"]
+    image.delete()
+    resp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert not resp.json()["images"]
+
+
 def test_get_single_factory_not_exist(client):
     not_existed_code = uuid4()
     resp = client.get(f"/api/factories/{not_existed_code}")
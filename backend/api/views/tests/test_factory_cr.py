@@ -2,14 +2,16 @@ from api.views.tests.test_factories_u import factory
 import datetime
 from unittest.mock import patch
 from uuid import uuid4
+from django.db import connection
 from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
 
 import pytest
 from freezegun import freeze_time
 
 from conftest import Unordered
 
-from ...models import Factory, ReportRecord, Image
+from ...models import Factory, ReportRecord, Image, Document, FollowUp
 
 
 pytestmark = pytest.mark.django_db
@@ -84,6 +86,93 @@ def test_get_nearby_factory_called_on_test_data(client):
     assert all(f["source"] == "G" for f in factories)
 
 
+def test_get_nearby_factory_only_within_range(client):
+    lat = 23.5
+    lng = 121.0
+    positions = {
+        "north_inside": (lat + 0.0081, lng),  # ~0.9 km
+        "north_outside": (lat + 0.0099, lng),  # ~1.1 km
+        "east_inside": (lat, lng + 0.0088),  # ~0.9 km
+        "east_outside": (lat, lng + 0.0108),  # ~1.1 km
+        "corner_outside": (lat + 0.0085, lng + 0.0092),  # inside bounding box, ~1.3 km
+    }
+    for idx, (name, (f_lat, f_lng)) in enumerate(positions.items()):
+        Factory.objects.create(
+            name=name,
+            lat=f_lat,
+            lng=f_lng,
+            display_number=9000 + idx,
+        )
+
+    resp = client.get(f"/api/factories?lat={lat}&lng={lng}&range=1")
+    assert resp.status_code == 200
+    assert [f["name"] for f in resp.json()] == Unordered(["north_inside", "east_inside"])
+
+
+def test_get_nearby_factory_samples_in_database(client, settings, django_assert_num_queries):
+    settings.MAX_FACTORY_PER_GET = 3
+    for idx in range(5):
+        Factory.objects.create(
+            name=f"factory_{idx}",
+            lat=23.5 + idx * 0.01,
+            lng=121.0,
+            display_number=9000 + idx,
+        )
+
+    # one query for the factories and one for each prefetched relation
+    with django_assert_num_queries(3):
+        resp = client.get(
+            f"/api/factories?lat=23.5&lng=121.0&range={settings.MAX_FACTORY_RADIUS_PER_GET + 1}"
+        )
+
+    assert resp.status_code == 200
+    assert len(resp.json()) == 3
+
+
+def test_get_nearby_factory_constant_number_of_queries(client):
+    def create_factory_with_follow_ups(idx):
+        new_factory = Factory.objects.create(
+            name=f"factory_{idx}",
+            lat=23.5 + idx * 0.001,
+            lng=121.0,
+            display_number=9000 + idx,
+        )
+        ReportRecord.objects.create(factory=new_factory, action_type="POST", action_body={})
+        Image.objects.create(factory=new_factory, image_path="https://i.imgur.com/RxArJUc.png")
+        for code in range(2):
+            document = Document.objects.create(factory=new_factory, code=idx * 10 + code)
+            FollowUp.objects.create(document=document, note="for user", for_user=True)
+            FollowUp.objects.create(document=document, note="internal", for_user=False)
+
+    def count_queries():
+        with CaptureQueriesContext(connection) as context:
+            resp = client.get("/api/factories?lat=23.5&lng=121.0&range=1")
+        assert resp.status_code == 200
+        return len(context.captured_queries), resp.json()
+
+    create_factory_with_follow_ups(0)
+    n_queries, factories = count_queries()
+    assert [f["note"] for f in factories[0]["follow_ups_for_user"]] == ["for user", "for user"]
+
+    for idx in range(1, 5):
+        create_factory_with_follow_ups(idx)
+    assert count_queries()[0] == n_queries
+
+
+def test_get_nearby_factory_ordered_by_distance(client):
+    for idx in (2, 0, 1):
+        Factory.objects.create(
+            name=f"factory_{idx}",
+            lat=23.5 + idx * 0.001,
+            lng=121.0,
+            display_number=9000 + idx,
+        )
+
+    resp = client.get("/api/factories?lat=23.5&lng=121.0&range=1")
+    assert resp.status_code == 200
+    assert [f["name"] for f in resp.json()] == ["factory_0", "factory_1", "factory_2"]
+
+
 def test_create_new_factory_db_status_correct(client):
     lat = 23.234
     lng = 120.1
@@ -0,0 +1,101 @@
+from uuid import UUID, uuid4
+from datetime import datetime, timezone, timedelta
+from unittest.mock import patch
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.models import Factory, Image, ReportRecord
+from api.views.factory_images_batch_c import MAX_BATCH_IMAGES
+
+
+@pytest.mark.django_db
+class TestPostFactoryImagesBatchView:
+
+    @pytest.fixture(autouse=True)
+    def setUp(self, client):
+        self.cli = client
+        self.factory = Factory.objects.create(
+            name="test_factory",
+            lat=24,
+            lng=121,
+            display_number=666,
+        )
+        self.url = f"/api/factories/{self.factory.id}/images:batch"
+        self.post_body = {
+            "images": [
+                {
+                    "url": f"https://i.imgur.com/{idx}.png",
+                    "Latitude": 23.12,
+                    "Longitude": 121.5566,
+                    "DateTimeOriginal": "2020:03:21 12:33:59",
+                    "deletehash": f"hash{idx}",
+                }
+                for idx in range(3)
+            ],
+            "nickname": "somebody",
+            "contact": "0900000000",
+        }
+
+    def test_images_share_one_report_record(self):
+        with patch("api.views.factory_images_batch_c.async_task") as mock_async_task:
+            resp = self.cli.post(self.url, self.post_body, content_type="application/json")
+
+        assert resp.status_code == 200
+        resp_data = resp.json()
+        assert [image["url"] for image in resp_data] == [
+            f"https://i.imgur.com/{idx}.png" for idx in range(3)
+        ]
+
+        images = Image.objects.filter(pk__in=[image["id"] for image in resp_data])
+        assert len(images) == 3
+        assert {image.report_record_id for image in images} == {images[0].report_record_id}
+        assert images[0].orig_time == datetime(
+            2020, 3, 21, 12, 33, 59, tzinfo=timezone(timedelta(hours=8))
+        )
+
+        report_record = ReportRecord.objects.get(pk=images[0].report_record_id)
+        assert report_record.factory_id == self.factory.id
+        assert report_record.action_type == "POST_IMAGE"
+        assert report_record.nickname == "somebody"
+        assert Factory.objects.get(pk=self.factory.id).image_count == 3
+
+        mock_async_task.assert_called_once_with(
+            "api.tasks.make_image_variants", [UUID(image["id"]) for image in resp_data]
+        )
+
+    def test_queries_do_not_grow_with_the_images(self):
+        query_counts = []
+        for count in [1, 10]:
+            self.post_body["images"] = [{"url": "https://i.imgur.com/0.png"}] * count
+            with patch("api.views.factory_images_batch_c.async_task"), \
+                    CaptureQueriesContext(connection) as queries:
+                resp = self.cli.post(self.url, self.post_body, content_type="application/json")
+            assert resp.status_code == 200
+            query_counts.append(len(queries))
+        assert query_counts[0] == query_counts[1]
+
+    def test_return_400_if_an_image_has_no_url(self):
+        del self.post_body["images"][1]["url"]
+        resp = self.cli.post(self.url, self.post_body, content_type="application/json")
+
+        assert resp.status_code == 400
+        assert not ReportRecord.objects.filter(factory_id=self.factory.id).exists()
+
+    def test_return_400_if_too_many_images(self):
+        self.post_body["images"] = [{"url": "https://i.imgur.com/0.png"}] * (MAX_BATCH_IMAGES + 1)
+        resp = self.cli.post(self.url, self.post_body, content_type="application/json")
+
+        assert resp.status_code == 400
+
+    def test_return_400_if_factory_id_not_exist(self):
+        not_exist_factory_id = uuid4()
+        resp = self.cli.post(
+            f"/api/factories/{not_exist_factory_id}/images:batch",
+            self.post_body,
+            content_type="application/json",
+        )
+
+        assert resp.status_code == 400
+        assert resp.content == f"Factory ID {not_exist_factory_id} does not exist.".encode("utf8")
@@ -78,3 +78,23 @@ def test_get_empty_if_strange_factory_id(client):
     resp = client.get(f"/api/factories/{uuid4()}/report_records")
     assert resp.status_code == 200
     assert not resp.json()
+
+
+def test_conditional_get_report_records(client, factory_factory, report_factory, django_assert_num_queries):
+    factory = factory_factory.create()
+    report_factory.create(factory=factory)
+    url = f"/api/factories/{factory.id}/report_records"
+
+    resp = client.get(url)
+    assert resp.status_code == 200
+    etag = resp["ETag"]
+
+    with django_assert_num_queries(1):
+        resp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 304
+
+    report_factory.create(factory=factory)
+    resp = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert resp["ETag"] != etag
+    assert len(resp.json()) == 2
@@ -0,0 +1,217 @@
+import os
+
+import pytest
+from django.core.management import call_command
+
+from api import tasks
+from api.models import Factory, Document, VacatedPosition
+from api.tiles import lat_lng_to_tile, render_vector_tile, vector_tile_path
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def factories(db):
+    positions = [
+        (23.501, 121.001, "2-1", "U"),
+        (23.502, 121.002, "2-1", "U"),
+        (23.503, 121.003, "3", "G"),
+    ]
+    return [
+        Factory.objects.create(
+            name=f"factory_{idx}",
+            lat=lat,
+            lng=lng,
+            factory_type=factory_type,
+            source=source,
+            display_number=9000 + idx,
+        )
+        for idx, (lat, lng, factory_type, source) in enumerate(positions)
+    ]
+
+
+def test_get_factory_tile_invalid(client):
+    resp = client.get("/api/factories/tiles/3/8/0")
+    assert resp.status_code == 400
+
+    resp = client.get("/api/factories/tiles/3/0/0?source=X")
+    assert resp.status_code == 400
+
+
+def test_get_factory_tile_cells(client, factories):
+    Document.objects.create(factory=factories[0], code=1090001, display_status=1)
+
+    z = 8
+    x, y = lat_lng_to_tile(23.5, 121.0, z)
+    resp = client.get(f"/api/factories/tiles/{z}/{x}/{y}")
+    assert resp.status_code == 200
+    assert "no-cache" in resp["Cache-Control"]
+
+    tile = resp.json()
+    assert tile["type"] == "cells"
+    assert len(tile["cells"]) == 1
+
+    cell = tile["cells"][0]
+    assert cell["count"] == 3
+    assert cell["factory_type"] == "2-1"
+    assert cell["document_display_status"] == {"已排程稽查": 1}
+    assert cell["lat"] == pytest.approx(23.502)
+    assert cell["lng"] == pytest.approx(121.002)
+
+    resp = client.get(f"/api/factories/tiles/{z}/{x}/{y}?source=G")
+    assert resp.json()["cells"][0]["count"] == 1
+
+
+def test_get_factory_tile_points(client, factories, settings):
+    z = settings.FACTORY_TILE_POINT_ZOOM
+    x, y = lat_lng_to_tile(23.501, 121.001, z)
+    resp = client.get(f"/api/factories/tiles/{z}/{x}/{y}")
+    assert resp.status_code == 200
+
+    tile = resp.json()
+    assert tile["type"] == "points"
+    assert [point["id"] for point in tile["points"]] == [str(f.id) for f in factories]
+    assert tile["points"][0]["document_display_status"] is None
+
+
+def test_get_factory_tile_is_cached(client, factories, django_assert_num_queries):
+    z = 8
+    x, y = lat_lng_to_tile(23.5, 121.0, z)
+    client.get(f"/api/factories/tiles/{z}/{x}/{y}")
+
+    with django_assert_num_queries(0):
+        resp = client.get(f"/api/factories/tiles/{z}/{x}/{y}")
+    assert resp.json()["cells"][0]["count"] == 3
+
+
+def test_get_factory_tile_drops_on_writes(client, factories):
+    z = 8
+    x, y = lat_lng_to_tile(23.5, 121.0, z)
+    client.get(f"/api/factories/tiles/{z}/{x}/{y}")
+
+    Factory.objects.create(name="new factory", lat=23.504, lng=121.004, display_number=9100)
+    resp = client.get(f"/api/factories/tiles/{z}/{x}/{y}")
+    assert resp.json()["cells"][0]["count"] == 4
+
+
+@pytest.fixture
+def vector_tile_root(settings, tmp_path):
+    settings.VECTOR_TILE_ROOT = str(tmp_path)
+    return tmp_path
+
+
+def test_get_factory_vector_tile(client, factories, vector_tile_root, settings):
+    z = settings.FACTORY_TILE_POINT_ZOOM
+    x, y = lat_lng_to_tile(23.5, 121.0, z)
+    resp = client.get(f"/api/factories/tiles/{z}/{x}/{y}.mvt")
+    assert resp.status_code == 200
+    assert resp["Content-Type"] == "application/vnd.mapbox-vector-tile"
+    assert all(str(factory.id).encode() in resp.content for factory in factories)
+
+    # stored for the following requests
+    with open(vector_tile_path(z, x, y), "rb") as f:
+        assert f.read() == resp.content
+
+    resp = client.get(f"/api/factories/tiles/{z}/{x + 1}/{y}.mvt")
+    assert resp.status_code == 204
+
+
+def test_get_factory_vector_tile_cells(client, factories, vector_tile_root):
+    z = 10
+    x, y = lat_lng_to_tile(23.5, 121.0, z)
+    resp = client.get(f"/api/factories/tiles/{z}/{x}/{y}.mvt")
+    assert resp.status_code == 200
+    assert b"cells" in resp.content
+    assert not any(str(factory.id).encode() in resp.content for factory in factories)
+
+    # rendered on the fly from the whole table otherwise
+    z = 3
+    x, y = lat_lng_to_tile(23.5, 121.0, z)
+    resp = client.get(f"/api/factories/tiles/{z}/{x}/{y}.mvt")
+    assert resp.status_code == 404
+    assert not os.path.exists(vector_tile_path(z, x, y))
+
+
+def test_export_vector_tiles_cells(factories, vector_tile_root):
+    z = 10
+    x, y = lat_lng_to_tile(23.5, 121.0, z)
+    call_command("export_vector_tiles", "--min-zoom", z, "--max-zoom", z)
+    # the single pass of the full export clusters like the grouped query
+    with open(vector_tile_path(z, x, y), "rb") as f:
+        assert f.read() == render_vector_tile(z, x, y)
+
+
+def test_export_vector_tiles(factories, vector_tile_root, settings):
+    z = settings.FACTORY_TILE_POINT_ZOOM
+    x, y = lat_lng_to_tile(23.5, 121.0, z)
+
+    call_command("export_vector_tiles", "--min-zoom", z, "--max-zoom", z)
+    with open(vector_tile_path(z, x, y), "rb") as f:
+        assert str(factories[0].id).encode() in f.read()
+    assert (vector_tile_root / ".exported_at").exists()
+
+    # only the tiles of changed factories are rendered again
+    factories[0].delete()
+    call_command("export_vector_tiles", "--min-zoom", z, "--max-zoom", z)
+    with open(vector_tile_path(z, x, y), "rb") as f:
+        content = f.read()
+    assert str(factories[0].id).encode() not in content
+    assert str(factories[1].id).encode() in content
+
+
+def test_export_vector_tiles_redraws_left_positions(factories, vector_tile_root, settings):
+    z = settings.FACTORY_TILE_POINT_ZOOM
+    x, y = lat_lng_to_tile(23.5, 121.0, z)
+    call_command("export_vector_tiles", "--min-zoom", z, "--max-zoom", z)
+
+    factories[0].lat, factories[0].lng = 24.5, 121.5
+    factories[0].save()
+    Factory.raw_objects.filter(pk=factories[1].pk).delete()
+    call_command("export_vector_tiles", "--min-zoom", z, "--max-zoom", z)
+    with open(vector_tile_path(z, x, y), "rb") as f:
+        content = f.read()
+    assert str(factories[0].id).encode() not in content
+    assert str(factories[1].id).encode() not in content
+    assert str(factories[2].id).encode() in content
+    with open(vector_tile_path(z, *lat_lng_to_tile(24.5, 121.5, z)), "rb") as f:
+        assert str(factories[0].id).encode() in f.read()
+
+    # the positions are kept until an export started after them
+    assert VacatedPosition.objects.count() == 2
+    call_command("export_vector_tiles", "--min-zoom", z, "--max-zoom", z)
+    assert not VacatedPosition.objects.exists()
+
+
+def test_task_exports_into_stored_tiles(client, factories, vector_tile_root, settings):
+    tasks.export_vector_tiles()
+    assert not (vector_tile_root / ".exported_at").exists()
+
+    z = settings.FACTORY_TILE_POINT_ZOOM
+    x, y = lat_lng_to_tile(23.5, 121.0, z)
+    client.get(f"/api/factories/tiles/{z}/{x}/{y}.mvt")
+    assert (vector_tile_root / ".exported_at").exists()
+
+    factory = Factory.objects.create(
+        name="new factory", lat=23.5025, lng=121.0025, source="U", display_number=9100
+    )
+    tasks.export_vector_tiles()
+    with open(vector_tile_path(z, x, y), "rb") as f:
+        assert str(factory.id).encode() in f.read()
+
+
+def test_export_vector_tiles_after_bulk_delete_and_restore(factories, vector_tile_root, settings):
+    z = settings.FACTORY_TILE_POINT_ZOOM
+    x, y = lat_lng_to_tile(23.5, 121.0, z)
+    call_command("export_vector_tiles", "--min-zoom", z, "--max-zoom", z)
+
+    # what the admin delete and restore actions run
+    Factory.objects.filter(pk=factories[0].pk).delete()
+    call_command("export_vector_tiles", "--min-zoom", z, "--max-zoom", z)
+    with open(vector_tile_path(z, x, y), "rb") as f:
+        assert str(factories[0].id).encode() not in f.read()
+
+    Factory.recycle_objects.filter(pk=factories[0].pk).undelete()
+    call_command("export_vector_tiles", "--min-zoom", z, "--max-zoom", z)
+    with open(vector_tile_path(z, x, y), "rb") as f:
+        assert str(factories[0].id).encode() in f.read()
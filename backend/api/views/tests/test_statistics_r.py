@@ -6,6 +6,8 @@ from freezegun import freeze_time
 from ...models import Image, Factory, Document
 from ...models.const import DocumentDisplayStatusConst
 from ...models.document import DocumentDisplayStatusEnum
+from ...statistics import refresh_town_statistics
+from ...tasks import update_stale_town_statistics
 
 
 pytestmark = pytest.mark.django_db
@@ -19,6 +21,8 @@ def update_landcode_with_custom_factory_model(factory_id):
         towncode="D24",
         townname="臺北市中山區",
     )
+    # like `api.tasks.update_landcode`, which the view queues
+    refresh_town_statistics([None, "臺北市中山區"])
 
 
 def create_factory(cli):
@@ -89,6 +93,7 @@ def test_get_factory_statistics(client):
         factory=Factory.objects.get(id=id_list[0]),
         display_status=0
     )
+    update_stale_town_statistics()
     resp = client.get("/api/statistics/factories?townname=臺北市")
     assert resp.json()["cities"]["臺北市"]["factories"] == 10
     assert resp.json()["cities"]["臺北市"]["documents"] == 1
@@ -114,6 +119,7 @@ def test_get_factory_statistics(client):
         factory=Factory.objects.get(id=id_list[0]),
         display_status=1
     )
+    update_stale_town_statistics()
     resp = client.get(f"/api/statistics/factories?townname=台北市&display_status={DocumentDisplayStatusConst.REPORTED}")
     assert resp.json()["factories"] == 1
     assert resp.json()["cities"]["臺北市"]["factories"] == 1
@@ -149,6 +155,7 @@ def test_get_factory_statistics(client):
         factory=Factory.objects.get(id=id_list[2]),
         display_status=DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.WORK_STOPPED]
     )
+    update_stale_town_statistics()
 
     resp = client.get("/api/statistics/factories?townname=台北市")
     assert resp.json()["documents"] == 5
@@ -170,6 +177,7 @@ def test_get_factory_statistics(client):
         factory=Factory.objects.get(id=id_list[3]),
         display_status=DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.DEMOLITION_SCHEDULED]
     )
+    update_stale_town_statistics()
 
     resp = client.get(f"/api/statistics/factories?townname=台北市&display_status={DocumentDisplayStatusConst.IN_PROGRESS}")
     assert resp.json()["documents"] == 4
@@ -288,3 +296,36 @@ def test_get_total(client):
     count = resp.json()["臺北市"][DocumentDisplayStatusConst.POWER_OUTED]
     assert count == 10, f"expect 10 but {count}"
 
+
+def test_get_factory_statistics_by_town_in_one_query(client, django_assert_num_queries):
+    create_factory(client)
+
+    with django_assert_num_queries(1):
+        resp = client.get("/api/statistics/factories?level=town")
+
+    assert resp.json()["cities"]["臺北市"]["towns"]["中山區"]["factories"] == 1
+    assert resp.json()["cities"]["臺南市"]["factories"] == 101
+
+
+def test_get_total_in_one_query(client, django_assert_num_queries):
+    factory_id = create_factory(client)
+    Document.objects.create(
+        cet_staff="AAA",
+        code="123456",
+        factory=Factory.objects.get(id=factory_id),
+        display_status=DocumentDisplayStatusEnum.INDICES[DocumentDisplayStatusConst.POWER_OUTING],
+    )
+
+    with django_assert_num_queries(1):
+        resp = client.get("/api/statistics/total")
+
+    assert resp.json()["臺北市"] == {
+        "factories": 1,
+        "report_records": 1,
+        "documents": 1,
+        DocumentDisplayStatusConst.OPEN: 0,
+        DocumentDisplayStatusConst.IN_PROGRESS: 0,
+        DocumentDisplayStatusConst.POWER_OUTED: 1,
+        DocumentDisplayStatusConst.DEMOLISHED: 0,
+    }
+    assert resp.json()["基隆市"]["factories"] == 0
@@ -1,24 +1,74 @@
-import random
+import hashlib
+import math
 
 from django.conf import settings
-from django.db.models import Prefetch
+from django.core.exceptions import ValidationError
+from django.db.models import (
+    Count, DateTimeField, IntegerField, Max, OuterRef, Prefetch, Subquery,
+)
 from django.db.models.functions.math import Radians, Cos, ACos, Sin
 from django.db.models.functions import Greatest, Least
 
-from ..models import Factory, ReportRecord, Image, Document
+from ..models import Factory, ReportRecord, Image, Document, FollowUp
 
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
 
-def _sample(objs, k):
-    list_of_objs = list(objs)
-    random.shuffle(list_of_objs)
-    return list_of_objs[:k]
+
+def _prefetch_factory_relations(factories):
+    """Prefetch what `FactorySerializer` reads, so a list costs a constant number of queries.
+
+    Report dates and document statuses come from the summary columns of
+    Factory, only images and follow-ups are still loaded from their tables.
+    """
+    return (
+        factories.prefetch_related(
+            Prefetch(
+                "images",
+                queryset=Image.objects.only(
+                    "factory_id", "image_path", "thumbnail_path", "medium_path"
+                ).all(),
+            )
+        )
+        .prefetch_related(
+            Prefetch(
+                "documents",
+                queryset=Document.objects.only("factory_id")
+                .prefetch_related(
+                    Prefetch(
+                        "follow_ups",
+                        queryset=FollowUp.objects.filter(for_user=True).order_by("created_at"),
+                        to_attr="follow_ups_for_user",
+                    )
+                )
+                .all(),
+            )
+        )
+    )
+
+
+def _get_bounding_box(latitude, longitude, radius):
+    """Return (min_lat, max_lat, min_lng, max_lng) which encloses the search circle."""
+    lat_delta = radius / KM_PER_DEGREE
+    # a degree of longitude is the shortest at the edge farthest from the equator
+    farthest_lat = min(abs(latitude) + lat_delta, 89.9)
+    lng_delta = radius / (KM_PER_DEGREE * math.cos(math.radians(farthest_lat)))
+    return (
+        latitude - lat_delta,
+        latitude + lat_delta,
+        longitude - lng_delta,
+        longitude + lng_delta,
+    )
 
 
 def _get_nearby_factories(latitude, longitude, radius, source=None):
     """Return nearby factories based on position and search range."""
 
+    # cheap indexed prefilter, only the candidates inside it get the exact distance check
+    min_lat, max_lat, min_lng, max_lng = _get_bounding_box(latitude, longitude, radius)
+
     # ref: https://stackoverflow.com/questions/574691/mysql-great-circle-distance-haversine-formula
-    distance = 6371 * ACos(
+    distance = EARTH_RADIUS_KM * ACos(
         Greatest(
             Least(
                 Cos(Radians(latitude)) * Cos(Radians("lat")) * Cos(Radians("lng") - Radians(longitude))
@@ -27,34 +77,27 @@ def _get_nearby_factories(latitude, longitude, radius, source=None):
         ,-1.0)
     )
 
-    radius_km = radius
-    ids = (
-        Factory.objects.annotate(distance=distance)
-        .only("id")
-        .filter(distance__lt=radius_km)
-        .filter(source=source)
-        .order_by("id")
+    factories = (
+        Factory.objects.filter(lat__range=(min_lat, max_lat), lng__range=(min_lng, max_lng))
+        .annotate(distance=distance)
+        .filter(distance__lt=radius)
     )
 
     if source:
-        ids = ids.filter(source=source)
+        factories = factories.filter(source=source)
 
-    if radius_km > settings.MAX_FACTORY_RADIUS_PER_GET:
-        ids = _sample(ids, settings.MAX_FACTORY_PER_GET)
+    if radius > settings.MAX_FACTORY_RADIUS_PER_GET:
+        # ORDER BY random() LIMIT n, so only the sampled rows leave the database
+        factories = factories.order_by("?")
+    else:
+        factories = factories.order_by("distance")
 
-    return (
-        Factory.objects.filter(id__in=[obj.id for obj in ids])
-        .prefetch_related(
-            Prefetch("report_records", queryset=ReportRecord.objects.only("created_at").all())
-        )
-        .prefetch_related(Prefetch("images", queryset=Image.objects.only("id").all()))
-        .prefetch_related(
-            Prefetch(
-                "documents", queryset=Document.objects.only("created_at", "display_status").prefetch_related("follow_ups").all()
-            )
-        )
-        .all()
-    )
+    factories = _prefetch_factory_relations(factories)
+
+    if radius > settings.MAX_FACTORY_RADIUS_PER_GET:
+        factories = factories[: settings.MAX_FACTORY_PER_GET]
+
+    return factories
 
 
 def _get_client_ip(request):
@@ -66,3 +109,51 @@ def _get_client_ip(request):
         return request.META.get("HTTP_X_REAL_IP")
     else:
         return request.META.get("REMOTE_ADDR")
+
+
+def _aggregate_of_factory(queryset, factory_field, aggregate, output_field):
+    return Subquery(
+        queryset.filter(**{factory_field: OuterRef("pk")})
+        .order_by()
+        .values(factory_field)
+        .annotate(value=aggregate)
+        .values("value"),
+        output_field=output_field,
+    )
+
+
+def _get_factory_etag(request, factory_id):
+    """ETag of a factory and its relations, for `django.views.decorators.http.condition`.
+
+    It changes with any write reaching the factory detail or its report
+    records: the latest timestamps catch creates and updates, the counts
+    catch (soft) deletes. All of it comes from a single query.
+    """
+    relations = [
+        (ReportRecord.objects.all(), "factory", "created_at"),
+        (Image.objects.all(), "factory", "updated_at"),
+        (Document.objects.all(), "factory", "updated_at"),
+        (FollowUp.objects.filter(for_user=True), "document__factory", "updated_at"),
+    ]
+    annotations = {}
+    for idx, (queryset, factory_field, timestamp_field) in enumerate(relations):
+        annotations[f"latest_{idx}"] = _aggregate_of_factory(
+            queryset, factory_field, Max(timestamp_field), DateTimeField()
+        )
+        annotations[f"count_{idx}"] = _aggregate_of_factory(
+            queryset, factory_field, Count("pk"), IntegerField()
+        )
+
+    try:
+        values = (
+            Factory.raw_objects.filter(pk=factory_id)
+            .annotate(**annotations)
+            .values_list("updated_at", "deleted_at", *annotations)
+            .first()
+        )
+    except ValidationError:
+        # not an UUID, let the view answer it
+        return None
+    if values is None:
+        return None
+    return hashlib.md5(repr(values).encode("utf8")).hexdigest()
@@ -2,12 +2,29 @@ import json
 from collections import Counter
 from typing import Union
 
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+
+
+def pytest_configure(config):
+    # a cache per test process, without the table of the database cache
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
 
 def pytest_assertrepr_compare(config, op, left, right):
     if (isinstance(left, Unordered) or isinstance(right, Unordered)) and op == "==":
         return Unordered.assert_repr(left, right, config.getoption('verbose'))
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # tiles and responses are cached, don't let them leak between tests
+    cache.clear()
+    yield
+    cache.clear()
+
+
 class Unordered:
     # TODO docstring
 
@@ -1,12 +1,50 @@
 #!/usr/bin/env python
+"""Land number lookup of a location through the easymap proxy.
 
-import requests
+`EasymapClient` reuses its connections, requests the town and the section
+of a location concurrently and keeps the answers in a `LandInfoCache`, a
+sqlite file keyed by the rounded coordinates, with a TTL and LRU eviction.
+The module level functions go through a shared client configured from the
+environment, so scripts get the same cache as the backend:
+
+- EASYMAP_CACHE_PATH: sqlite file of the cache, empty to disable it
+- EASYMAP_CACHE_TTL: seconds an answer is kept
+- EASYMAP_CACHE_MAX_ENTRIES: answers kept before evicting the least recently used
+- EASYMAP_TOWN_BOUNDARIES_PATH: GeoJSON of the town boundaries, see
+  `towninfo.boundaries`; the towns are then found offline and only the
+  section is requested
+
+It doesn't depend on Django.
+"""
+
+import json
+import logging
+import os
 import re
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from towninfo.boundaries import DEFAULT_BOUNDARIES_PATH, load_boundaries
+
+LOGGER = logging.getLogger("easymap")
 
 DEFAULT_TIMEOUT = 30  # 5 seconds
 
 EASYMAP_BASE_URL = "http://oracle.code-life.info:3000"
 
+# about a meter, well below the size of a land parcel
+COORDINATE_DIGITS = 5
+
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), "easymap_cache.sqlite3")
+DEFAULT_CACHE_TTL = 30 * 24 * 60 * 60
+DEFAULT_CACHE_MAX_ENTRIES = 100000
+
 
 class SectLandInfo:
 
@@ -24,60 +62,227 @@ class TownInfo:
         self.towncode = towncode
 
 
-def get_town_info(lat, lng):
-    url = EASYMAP_BASE_URL + "/api/town"
-    params = {"lat": lat, "lng": lng}
-    try:
-        result = requests.get(url, params=params, timeout=DEFAULT_TIMEOUT)
-        if result.status_code == 200:
+class LandInfoCache:
+    """Land infos in a sqlite file, shared by the threads and processes using it."""
+
+    def __init__(self, path, ttl=DEFAULT_CACHE_TTL, max_entries=DEFAULT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS land_info ("
+                "  key TEXT PRIMARY KEY,"
+                "  value TEXT NOT NULL,"
+                "  created_at REAL NOT NULL,"
+                "  accessed_at REAL NOT NULL"
+                ")"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS land_info_accessed_at ON land_info (accessed_at)"
+            )
+
+    def _connect(self):
+        # a connection per call, sqlite connections can't be shared by threads
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM land_info WHERE key = ? AND created_at > ?",
+                (key, now - self.ttl),
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE land_info SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count(row is not None)
+        return None if row is None else json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO land_info (key, value, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            # drop the expired answers, then the least recently used ones
+            conn.execute("DELETE FROM land_info WHERE created_at <= ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM land_info WHERE key IN ("
+                "  SELECT key FROM land_info ORDER BY accessed_at DESC LIMIT -1 OFFSET ?"
+                ")",
+                (self.max_entries,),
+            )
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+
+class EasymapClient:
+
+    def __init__(self, base_url=EASYMAP_BASE_URL, timeout=DEFAULT_TIMEOUT, cache=None,
+                 pool_size=10, towns=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.cache = cache
+        # a `TownBoundaries` answering the towns without requests
+        self.towns = towns
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # the town requests, issued while the section is requested
+        self._executor = ThreadPoolExecutor(max_workers=pool_size)
+
+    def _get(self, path, lat, lng, **kwargs):
+        return self.session.get(
+            self.base_url + path,
+            params={"lat": lat, "lng": lng},
+            timeout=kwargs.pop("timeout", None) or self.timeout,
+            **kwargs,
+        )
+
+    def _resolve_town(self, lat, lng):
+        town = self.towns.resolve(lat, lng) if self.towns is not None else None
+        return TownInfo(*town) if town is not None else None
+
+    def get_town_info(self, lat, lng, **kwargs):
+        """The town of the location, or None if the request failed."""
+        town_info = self._resolve_town(lat, lng)
+        if town_info is not None:
+            return town_info
+        try:
+            result = self._get("/api/town", lat, lng, **kwargs)
+            if result.status_code != 200:
+                return None
+            data = result.json()
+            return TownInfo(data.get("cityname") or "", data.get("townname") or "",
+                            data.get("towncode") or "")
+        except Exception as e:
+            LOGGER.error(f"Can't get the town of ({lat}, {lng}): {e}")
+            return None
+
+    def get_sectland_info(self, lat, lng, **kwargs):
+        """The section and land number of the location, or None if the request failed."""
+        try:
+            result = self._get("/api/sectland", lat, lng, **kwargs)
+            if result.status_code != 200:
+                return None
+
             data = result.json()
-            return TownInfo(data.get("cityname"), data.get("townname"),
-                            data.get("towncode"))
-    except Exception as e:
-        print("Error: {}".format(e))
-        return TownInfo("", "", "")
+            if data.get("features") is None or len(data.get("features")) == 0:
+                return SectLandInfo("", "", "")
+
+            feature = data.get("features")[0]
+            properties = feature.get("properties")
+            section = properties.get("section")
+            # e.g. section = (0410)鹽埔段
+            m = re.match(r"\((\d+)\)(.*)", section)
+            if m is None:
+                return SectLandInfo("", "", "")
+
+            sectcode = m.group(1)
+            sectname = m.group(2)
+            landcode = properties.get("land_number")
+            return SectLandInfo(sectname, sectcode, landcode)
+        except Exception as e:
+            LOGGER.error(f"Can't get the section of ({lat}, {lng}): {e}")
+            return None
+
+    def get_land_number(self, lat, lng, **kwargs):
+        lat = round(float(lat), COORDINATE_DIGITS)
+        lng = round(float(lng), COORDINATE_DIGITS)
+        key = f"{lat:.{COORDINATE_DIGITS}f},{lng:.{COORDINATE_DIGITS}f}"
+        if self.cache is not None:
+            land_info = self.cache.get(key)
+            if land_info is not None:
+                return land_info
+
+        town_info = self._resolve_town(lat, lng)
+        if town_info is None:
+            town_future = self._executor.submit(self.get_town_info, lat, lng, **kwargs)
+        sectland_info = self.get_sectland_info(lat, lng, **kwargs)
+        if town_info is None:
+            town_info = town_future.result()
+
+        failed = town_info is None or sectland_info is None
+        town_info = town_info or TownInfo("", "", "")
+        sectland_info = sectland_info or SectLandInfo("", "", "")
+        land_info = {
+            "landno": sectland_info.landcode,
+            "sectno": sectland_info.sectcode,
+            "sectname": sectland_info.sectname,
+            "towncode": town_info.towncode,
+            "townno": town_info.towncode,
+            "townname": town_info.cityname + town_info.townname,
+        }
+        # a failed request is retried next time rather than remembered
+        if self.cache is not None and not failed:
+            self.cache.set(key, land_info)
+        return land_info
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    """The client shared by the module level functions, configured from the environment."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            cache_path = os.environ.get("EASYMAP_CACHE_PATH", DEFAULT_CACHE_PATH)
+            cache = None
+            if cache_path:
+                cache = LandInfoCache(
+                    cache_path,
+                    ttl=int(os.environ.get("EASYMAP_CACHE_TTL", DEFAULT_CACHE_TTL)),
+                    max_entries=int(
+                        os.environ.get("EASYMAP_CACHE_MAX_ENTRIES", DEFAULT_CACHE_MAX_ENTRIES)
+                    ),
+                )
+            towns = load_boundaries(
+                os.environ.get("EASYMAP_TOWN_BOUNDARIES_PATH") or DEFAULT_BOUNDARIES_PATH
+            )
+            _default_client = EasymapClient(cache=cache, towns=towns)
+        return _default_client
+
+
+def get_town_info(lat, lng):
+    return get_default_client().get_town_info(lat, lng) or TownInfo("", "", "")
 
 
 def get_sectland_info(lat, lng):
-    url = EASYMAP_BASE_URL + "/api/sectland"
-    params = {"lat": lat, "lng": lng}
-    try:
-        result = requests.get(url, params=params, timeout=DEFAULT_TIMEOUT)
-        if result.status_code != 200:
-            return SectLandInfo("", "", "")
-
-        data = result.json()
-        if data.get("features") is None or len(data.get("features")) == 0:
-            return SectLandInfo("", "", "")
-
-        feature = data.get("features")[0]
-        properties = feature.get("properties")
-        section = properties.get("section")
-        # e.g. section = (0410)鹽埔段
-        m = re.match(r"\((\d+)\)(.*)", section)
-        if m is None:
-            return SectLandInfo("", "", "")
-
-        sectcode = m.group(1)
-        sectname = m.group(2)
-        landcode = properties.get("land_number")
-        return SectLandInfo(sectname, sectcode, landcode)
-    except Exception as e:
-        print("Error: {}".format(e))
-        return TownInfo("", "", "")
-
-
-def get_land_number(lat, lng, timeout=DEFAULT_TIMEOUT):
-    town_info = get_town_info(lat, lng)
-    sectland_info = get_sectland_info(lat, lng)
-
-    return {
-        "landno": sectland_info.landcode,
-        "sectno": sectland_info.sectcode,
-        "sectname": sectland_info.sectname,
-        "townno": town_info.towncode,
-        "townname": town_info.cityname + town_info.townname,
-    }
+    return get_default_client().get_sectland_info(lat, lng) or SectLandInfo("", "", "")
+
+
+def get_land_number(lat, lng, timeout=DEFAULT_TIMEOUT, **kwargs):
+    return get_default_client().get_land_number(lat, lng, timeout=timeout, **kwargs)
+
+
+def cache_stats():
+    """Hits and misses of the shared cache in this process."""
+    cache = get_default_client().cache
+    return cache.stats() if cache is not None else None
 
 
 if __name__ == "__main__":
@@ -88,3 +293,4 @@ if __name__ == "__main__":
         sys.exit(-1)
     lng, lat = sys.argv[1:3]
     print(get_land_number(lat=lat, lng=lng))
+    print(cache_stats())
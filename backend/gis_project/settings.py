@@ -149,6 +149,31 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+# The database cache is shared by the web workers and the django-q cluster, so
+# a write invalidates the cached responses of every process. Its table is made
+# by a migration, run `python manage.py createcachetable` after changing the
+# location. The local-memory cache is per process, for development and tests.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "DISFACTORY_BACKEND_CACHE_BACKEND",
+            "django.core.cache.backends.db.DatabaseCache",
+        ),
+        "LOCATION": os.environ.get("DISFACTORY_BACKEND_CACHE_LOCATION", "disfactory_cache"),
+        # a third of the entries are culled past it, Django's default of 300
+        # is too small for the responses, tiles and legislators it holds
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("DISFACTORY_BACKEND_CACHE_MAX_ENTRIES", 50000)),
+        },
+    }
+}
+
+# cached responses of the read endpoints, see api/response_cache.py
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get("DISFACTORY_BACKEND_RESPONSE_CACHE_TIMEOUT", 300))
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -184,6 +209,22 @@ STATICFILES_DIRS = []
 AUTH_USER_MODEL = "users.CustomUser"
 
 IMGUR_CLIENT_ID = os.environ.get("DISFACTORY_IMGUR_CLIENT_ID")
+# where the uploaded images are stored, "imgur" or "local", see api/image_upload.py
+IMAGE_UPLOAD_BACKEND = os.environ.get("DISFACTORY_BACKEND_IMAGE_UPLOAD_BACKEND", "imgur")
+IMAGE_UPLOAD_WORKERS = int(os.environ.get("DISFACTORY_BACKEND_IMAGE_UPLOAD_WORKERS", 4))
+IMAGE_UPLOAD_TIMEOUT = float(os.environ.get("DISFACTORY_BACKEND_IMAGE_UPLOAD_TIMEOUT", 30))
+# retries of a failed upload, after 1, 2, 4... times the back-off in seconds, as
+# long as one more attempt fits in the django-q timeout
+IMAGE_UPLOAD_RETRIES = int(os.environ.get("DISFACTORY_BACKEND_IMAGE_UPLOAD_RETRIES", 3))
+IMAGE_UPLOAD_BACKOFF = float(os.environ.get("DISFACTORY_BACKEND_IMAGE_UPLOAD_BACKOFF", 1))
+# longest sides in pixels of the downscaled copies, see api/image_variants.py
+IMAGE_THUMBNAIL_SIZE = int(os.environ.get("DISFACTORY_BACKEND_IMAGE_THUMBNAIL_SIZE", 320))
+IMAGE_MEDIUM_SIZE = int(os.environ.get("DISFACTORY_BACKEND_IMAGE_MEDIUM_SIZE", 1024))
+IMAGE_VARIANT_WORKERS = int(os.environ.get("DISFACTORY_BACKEND_IMAGE_VARIANT_WORKERS", 4))
+# read orig_lat, orig_lng and orig_time of new images from their EXIF, see api/image_exif.py
+IMAGE_EXIF_FROM_SERVER = (
+    os.environ.get("DISFACTORY_BACKEND_IMAGE_EXIF_FROM_SERVER", "false").lower() == "true"
+)
 
 DEFAULT_CORS_ORIGIN_WHITELIST = [
     "https://dev.disfactory.tw",
@@ -204,6 +245,11 @@ TAIWAN_MIN_LONGITUDE = 120.035141
 MAX_FACTORY_PER_GET = int(os.environ.get("DISFACTORY_BACKEND_MAX_FACTORY_PER_GET", 50))
 MAX_FACTORY_RADIUS_PER_GET = int(os.environ.get("DISFACTORY_BACKEND_MAX_FACTORY_RADIUS_PER_GET", 10))
 
+# map tiles, see api/tiles.py
+FACTORY_TILE_POINT_ZOOM = int(os.environ.get("DISFACTORY_BACKEND_FACTORY_TILE_POINT_ZOOM", 14))
+FACTORY_TILE_GRID_SIZE = int(os.environ.get("DISFACTORY_BACKEND_FACTORY_TILE_GRID_SIZE", 8))
+FACTORY_TILE_CACHE_TIMEOUT = int(os.environ.get("DISFACTORY_BACKEND_FACTORY_TILE_CACHE_TIMEOUT", 600))
+
 Q_CLUSTER = {
     "name": "disfactory",
     "workers": 4,
@@ -230,4 +276,32 @@ MAP_WIDGETS = {
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.environ.get("DISFACTORY_BACKEND_MEDIA_ROOT", "/tmp")
 pathlib.Path(MEDIA_ROOT).mkdir(parents=True, exist_ok=True)
+VECTOR_TILE_ROOT = os.environ.get(
+    "DISFACTORY_BACKEND_VECTOR_TILE_ROOT", os.path.join(MEDIA_ROOT, "tiles")
+)
+# images of the exported documents, see api/admin/actions/export_docx.py
+DOCX_IMAGE_CACHE_ROOT = os.environ.get(
+    "DISFACTORY_BACKEND_DOCX_IMAGE_CACHE_ROOT", os.path.join(MEDIA_ROOT, "docx_images")
+)
+DOCX_IMAGE_FETCH_WORKERS = int(os.environ.get("DISFACTORY_BACKEND_DOCX_IMAGE_FETCH_WORKERS", 8))
+DOCX_IMAGE_FETCH_TIMEOUT = float(os.environ.get("DISFACTORY_BACKEND_DOCX_IMAGE_FETCH_TIMEOUT", 10))
+# longest side in pixels of the embedded images, 0 keeps them as they are
+DOCX_IMAGE_MAX_SIZE = int(os.environ.get("DISFACTORY_BACKEND_DOCX_IMAGE_MAX_SIZE", 1600))
+# Find Taiwan Legislator API, see api/legislators.py
+LEGISLATOR_API_WORKERS = int(os.environ.get("DISFACTORY_BACKEND_LEGISLATOR_API_WORKERS", 8))
+LEGISLATOR_API_TIMEOUT = float(os.environ.get("DISFACTORY_BACKEND_LEGISLATOR_API_TIMEOUT", 5))
+LEGISLATOR_CACHE_TIMEOUT = int(
+    os.environ.get("DISFACTORY_BACKEND_LEGISLATOR_CACHE_TIMEOUT", 30 * 24 * 60 * 60)
+)
+# land codes resolved through easymap, see api/landcodes.py; the rate is in
+# requests per second of each process, 0 for no limit
+LANDCODE_WORKERS = int(os.environ.get("DISFACTORY_BACKEND_LANDCODE_WORKERS", 4))
+LANDCODE_RATE_LIMIT = float(os.environ.get("DISFACTORY_BACKEND_LANDCODE_RATE_LIMIT", 10))
+# larger selections are exported by a background job, see api.models.ExportJob
+DOCX_EXPORT_SYNC_MAX_DOCUMENTS = int(
+    os.environ.get("DISFACTORY_BACKEND_DOCX_EXPORT_SYNC_MAX_DOCUMENTS", 5)
+)
+# seconds without progress after which a job is shown as failed, its task
+# was likely killed by the timeout of the django-q cluster
+DOCX_EXPORT_STALE_AFTER = int(os.environ.get("DISFACTORY_BACKEND_DOCX_EXPORT_STALE_AFTER", 600))
 DOMAIN = os.environ.get("DISFACTORY_BACKEND_DOMAIN", "https://api.disfactory.tw/")
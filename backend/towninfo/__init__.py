@@ -29,6 +29,8 @@ city_name = {
 HERE = pathlib.Path(__file__).parent
 code2name = {}
 name2code = {}
+# both codes of a town to its (city, town, code01), code01 being what easymap answers
+code2town = {}
 
 for xml_path in HERE.glob("*.xml"):
     with xml_path.open("r") as f:
@@ -40,6 +42,9 @@ for xml_path in HERE.glob("*.xml"):
                 name = city_name[code01[:1]] + child.find("townname").text
                 code2name[code] = name
                 name2code[name] = code
+                code2town[code] = code2town[code01] = (
+                    city_name[code01[:1]], child.find("townname").text, code01
+                )
 
                 code01_node = child.find("towncode01")
                 if code01_node is not None:
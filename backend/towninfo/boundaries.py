@@ -0,0 +1,178 @@
+"""Offline lookup of the town of a location from the town boundaries.
+
+The boundaries are a GeoJSON FeatureCollection in WGS84 with a feature per
+town holding its TOWNCODE, e.g. the 鄉鎮市區界線 of the Ministry of the
+Interior converted with
+
+    ogr2ogr -f GeoJSON -t_srs EPSG:4326 towns.geojson TOWN_MOI_*.shp
+
+They weigh tens of megabytes, so they aren't in the repository and are
+read from `DEFAULT_BOUNDARIES_PATH` or the path given to `load_boundaries`.
+
+The polygons are cut by a grid: a cell keeps the edges crossing it and the
+town of its center, found by a scanline when the index is built. A point
+is in the town of the center if the segment between them crosses no
+boundary of it, so a lookup only tests the few edges of one cell, however
+detailed the polygons are. It doesn't depend on Django.
+"""
+
+import json
+import logging
+import math
+import pathlib
+import threading
+import time
+from collections import defaultdict, namedtuple
+
+from . import code2town
+
+LOGGER = logging.getLogger("easymap")
+
+DEFAULT_BOUNDARIES_PATH = pathlib.Path(__file__).parent / "towns.geojson"
+DEFAULT_CELL_SIZE = 0.01  # degrees, about a kilometer
+
+Town = namedtuple("Town", ["cityname", "townname", "towncode"])
+
+
+def _rings(geometry):
+    if geometry is None:
+        return []
+    if geometry["type"] == "Polygon":
+        return geometry["coordinates"]
+    if geometry["type"] == "MultiPolygon":
+        return [ring for polygon in geometry["coordinates"] for ring in polygon]
+    return []
+
+
+def _town(properties):
+    """The town of a feature, named like easymap does when its code is known."""
+    code = str(properties.get("TOWNCODE") or "")
+    if code in code2town:
+        return Town(*code2town[code])
+    return Town(properties.get("COUNTYNAME") or "", properties.get("TOWNNAME") or "", code)
+
+
+def _side(ax, ay, bx, by, px, py):
+    # a point on the line counts on one side, so a segment passing through a
+    # vertex crosses exactly one of its edges, or none when it only touches it
+    return (bx - ax) * (py - ay) - (by - ay) * (px - ax) > 0
+
+
+def _crossings(edges, px, py, qx, qy):
+    count = 0
+    for ax, ay, bx, by in edges:
+        if (_side(ax, ay, bx, by, px, py) != _side(ax, ay, bx, by, qx, qy)
+                and _side(px, py, qx, qy, ax, ay) != _side(px, py, qx, qy, bx, by)):
+            count += 1
+    return count
+
+
+class TownBoundaries:
+    """Grid index of town polygons, see the module docstring."""
+
+    def __init__(self, features, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.towns = []
+        # town index -> edges (ax, ay, bx, by), in longitude and latitude
+        town_edges = []
+        for feature in features:
+            edges = []
+            for ring in _rings(feature.get("geometry")):
+                edges.extend(
+                    (a[0], a[1], b[0], b[1]) for a, b in zip(ring, ring[1:] + ring[:1]) if a != b
+                )
+            if edges:
+                self.towns.append(_town(feature.get("properties") or {}))
+                town_edges.append(edges)
+
+        all_edges = [edge for edges in town_edges for edge in edges]
+        self.min_lng = min(min(edge[0], edge[2]) for edge in all_edges) if all_edges else 0
+        self.min_lat = min(min(edge[1], edge[3]) for edge in all_edges) if all_edges else 0
+
+        # (column, row) -> town index -> edges crossing the cell
+        self._cell_edges = defaultdict(lambda: defaultdict(list))
+        # row -> town index -> edges spanning the latitudes of the row
+        row_edges = defaultdict(lambda: defaultdict(list))
+        for town, edges in enumerate(town_edges):
+            for edge in edges:
+                ax, ay, bx, by = edge
+                i0, j0 = self._cell(min(ay, by), min(ax, bx))
+                i1, j1 = self._cell(max(ay, by), max(ax, bx))
+                for j in range(j0, j1 + 1):
+                    row_edges[j][town].append(edge)
+                    for i in range(i0, i1 + 1):
+                        self._cell_edges[i, j][town].append(edge)
+
+        # (column, row) -> index of the town containing the center of the cell
+        self._center_towns = {}
+        for j, edges_of_towns in row_edges.items():
+            y = self._center(0, j)[1]
+            for town, edges in edges_of_towns.items():
+                xs = sorted(
+                    ax + (y - ay) * (bx - ax) / (by - ay)
+                    for ax, ay, bx, by in edges
+                    if (ay > y) != (by > y)
+                )
+                # the centers between the 1st and 2nd crossings, 3rd and 4th...
+                for x0, x1 in zip(xs[::2], xs[1::2]):
+                    first = math.ceil((x0 - self.min_lng) / cell_size - 0.5)
+                    last = math.ceil((x1 - self.min_lng) / cell_size - 0.5)
+                    for i in range(first, last):
+                        self._center_towns[i, j] = town
+
+        self._cell_edges = {cell: dict(edges) for cell, edges in self._cell_edges.items()}
+
+    def _cell(self, lat, lng):
+        return (
+            math.floor((lng - self.min_lng) / self.cell_size),
+            math.floor((lat - self.min_lat) / self.cell_size),
+        )
+
+    def _center(self, i, j):
+        return (
+            self.min_lng + (i + 0.5) * self.cell_size,
+            self.min_lat + (j + 0.5) * self.cell_size,
+        )
+
+    def resolve(self, lat, lng):
+        """The `Town` of the location, or None outside of every town."""
+        lat, lng = float(lat), float(lng)
+        cell = self._cell(lat, lng)
+        center_town = self._center_towns.get(cell)
+        cell_edges = self._cell_edges.get(cell, {})
+        cx, cy = self._center(*cell)
+        for town, edges in cell_edges.items():
+            crosses = _crossings(edges, lng, lat, cx, cy) % 2 == 1
+            if crosses != (town == center_town):
+                return self.towns[town]
+        if center_town is not None and center_town not in cell_edges:
+            return self.towns[center_town]
+        return None
+
+    def resolve_many(self, locations):
+        """The `Town`s of (lat, lng) `locations`, None for the ones outside of every town."""
+        return [self.resolve(lat, lng) for lat, lng in locations]
+
+    @classmethod
+    def from_file(cls, path, cell_size=DEFAULT_CELL_SIZE):
+        started_at = time.time()
+        with open(path, encoding="utf8") as f:
+            features = json.load(f)["features"]
+        boundaries = cls(features, cell_size=cell_size)
+        LOGGER.info(
+            f"Indexed {len(boundaries.towns)} towns of {path} in {time.time() - started_at:.1f}s"
+        )
+        return boundaries
+
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def load_boundaries(path=DEFAULT_BOUNDARIES_PATH):
+    """The boundaries of the file, indexed once per process, or None without the file."""
+    path = pathlib.Path(path)
+    with _loaded_lock:
+        if path not in _loaded:
+            _loaded[path] = TownBoundaries.from_file(path) if path.is_file() else None
+        return _loaded[path]
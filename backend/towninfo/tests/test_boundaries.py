@@ -0,0 +1,78 @@
+import math
+import random
+
+from ..boundaries import Town, TownBoundaries
+
+
+def _feature(code, *polygons):
+    return {
+        "type": "Feature",
+        "properties": {"TOWNCODE": code},
+        "geometry": {"type": "MultiPolygon", "coordinates": [list(polygon) for polygon in polygons]},
+    }
+
+
+def _square(lng, lat, size):
+    return [[lng, lat], [lng + size, lat], [lng + size, lat + size], [lng, lat + size], [lng, lat]]
+
+
+def _star(lng, lat, radius, points=40):
+    ring = [
+        [
+            lng + radius * (1 if k % 2 else 0.4) * math.cos(2 * math.pi * k / points),
+            lat + radius * (1 if k % 2 else 0.4) * math.sin(2 * math.pi * k / points),
+        ]
+        for k in range(points)
+    ]
+    return ring + ring[:1]
+
+
+def _contains(rings, lng, lat):
+    inside = False
+    for ring in rings:
+        for (ax, ay), (bx, by) in zip(ring, ring[1:]):
+            if (ay > lat) != (by > lat) and lng < ax + (lat - ay) * (bx - ax) / (by - ay):
+                inside = not inside
+    return inside
+
+
+BEIMEN = Town("臺南市", "北門區", "D24")
+NANHUA = Town("臺南市", "南化區", "D38")
+
+
+def test_resolve_adjacent_towns_with_holes():
+    boundaries = TownBoundaries([
+        # 北門區 with a hole, where an island of 南化區 lies
+        _feature("67000170", [_square(120.0, 23.0, 0.1), _square(120.04, 23.04, 0.02)]),
+        _feature("67000250", [_square(120.1, 23.0, 0.1)], [_square(120.045, 23.045, 0.01)]),
+        {"type": "Feature", "properties": {"TOWNCODE": "0", "COUNTYNAME": "某縣", "TOWNNAME": "某鄉"},
+         "geometry": {"type": "Polygon", "coordinates": [_square(121.0, 24.0, 0.1)]}},
+    ], cell_size=0.03)
+
+    assert boundaries.resolve(23.01, 120.01) == BEIMEN
+    assert boundaries.resolve(23.05, 120.05) == NANHUA
+    assert boundaries.resolve(23.041, 120.041) is None
+    assert boundaries.resolve(23.099, 120.101) == NANHUA
+    assert boundaries.resolve(23.099, 120.099) == BEIMEN
+    assert boundaries.resolve(22.9, 120.05) is None
+    assert boundaries.resolve(24.05, 121.05) == Town("某縣", "某鄉", "0")
+    assert boundaries.resolve_many([(23.01, 120.01), (23.05, 120.15), (25, 121)]) == [
+        BEIMEN, NANHUA, None,
+    ]
+
+
+def test_resolve_agrees_with_ray_casting():
+    stars = [_star(120.2, 23.2, 0.1), _star(120.45, 23.2, 0.12, points=64)]
+    boundaries = TownBoundaries(
+        [_feature("67000170", [stars[0]]), _feature("67000250", [stars[1]])], cell_size=0.01
+    )
+
+    rand = random.Random(0)
+    for _ in range(5000):
+        lat, lng = rand.uniform(23.05, 23.35), rand.uniform(120.05, 120.6)
+        expected = None
+        if _contains([stars[0]], lng, lat):
+            expected = BEIMEN
+        elif _contains([stars[1]], lng, lat):
+            expected = NANHUA
+        assert boundaries.resolve(lat, lng) == expected, (lat, lng)